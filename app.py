@@ -1,10 +1,15 @@
 # app.py
 from flask import Flask, jsonify
 from flask_cors import CORS
+from flask_migrate import Migrate # Migraciones del esquema (flask db upgrade)
 from config import config # Importa el diccionario de configuración
 # from models import init_db, db # COMENTA o ELIMINA esta línea por ahora para depuración
 from models import db # SOLO importa la instancia 'db' si la necesitas, NO la función init_db aquí
 from routes.sales_routes import sales_bp # Importa el Blueprint de rutas de ventas
+from utils.cache import init_cache # Caché de respuestas de las rutas de analítica
+from utils.db_pool import init_db_engine # Pool de conexiones y statement_timeout
+from utils.metrics import init_metrics # Latencia, consultas SQL y /api/metrics
+from utils.query_plans import init_query_plan_check # Comando 'flask explain-check'
 import os
 # from sqlalchemy import text # No es necesario aquí si movemos la verificación de DB
 
@@ -25,7 +30,17 @@ def create_app(config_name=None):
 
     # Asegúrate de que Flask-SQLAlchemy se inicialice *después* de cargar la configuración
     # y *antes* de registrar Blueprints si esos Blueprints usan la instancia 'db'.
-    db.init_app(app) # <--- Mueve la inicialización de 'db' aquí si no está ya.
+    # init_db_engine ajusta la URL y las opciones del pool y luego llama a db.init_app(app).
+    init_db_engine(app)
+
+    # Caché de respuestas (backend según CACHE_BACKEND)
+    init_cache(app)
+
+    # Métricas por petición y log de consultas lentas
+    init_metrics(app)
+
+    # Comprobación de los planes de las rutas de analítica (flask explain-check)
+    init_query_plan_check(app)
 
     CORS(app, origins=[
         'http://localhost:5173',
@@ -37,9 +52,8 @@ def create_app(config_name=None):
 
     app.register_blueprint(sales_bp)
 
-    # Si planeas usar Flask-Migrate, inicialízalo aquí también:
-    # from flask_migrate import Migrate
-    # migrate = Migrate(app, db)
+    # Migraciones del esquema en migrations/ (flask db upgrade, flask db migrate)
+    Migrate(app, db)
 
 
     # Elimina cualquier bloque de app_context() o db.create_all() de aquí.
@@ -55,24 +69,43 @@ def create_app(config_name=None):
                 '/api/health',
                 '/api/test/connection', # Puedes usar /api/database/info para info más detallada
                 '/api/data/load (POST)',
+                '/api/data/load/<job_id>',
                 '/api/data/all',
+                '/api/data/export',
                 '/api/analytics/summary',
+                '/api/analytics/query',
+                '/api/analytics/timeseries',
+                '/api/cache/stats',
+                '/api/metrics',
                 '/api/database/info'
             ]
         })
 
     return app
 
-# Esta línea asegura que la instancia 'app' esté disponible
-# cuando Gunicorn importe este módulo para iniciar el servicio.
-# No queremos que se ejecute la parte de db.create_all() o db.session.execute() en este punto.
-app = create_app()
-CORS(app, resources={r"/*": {"origins": "*"}})
+def create_served_app():
+    """
+    Instancia que se sirve (wsgi.py y asgi.py): la de create_app más el CORS abierto a cualquier
+    origen que app.py aplicaba a la instancia servida con 'gunicorn app:app'.
+    """
+    app = create_app()
+    CORS(app, resources={r"/*": {"origins": "*"}})
+    return app
+
+def __getattr__(name):
+    """
+    'gunicorn app:app' (el comando de inicio de Render) sigue funcionando: la instancia es la de
+    wsgi.py, el único sitio donde se crea. Importar create_app desde aquí no crea ninguna.
+    """
+    if name == 'app':
+        from wsgi import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 if __name__ == '__main__':
     # Puedes ejecutar app.run() aquí para desarrollo local.
     # Para db.create_all() local, usarías:
     # with app.app_context():
     #    db.create_all()
     #    print("Tablas creadas localmente.")
-    app.run(debug=True, host='0.0.0.0', port=5000)
-    
\ No newline at end of file
+    create_served_app().run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,8 @@
+# asgi.py
+# Modo ASGI: las rutas de analítica de routes/async_sales_routes.py se sirven con asyncpg y
+# el resto con la aplicación Flask. Se ejecuta con uvicorn, p. ej.:
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000 --workers 4
+from app import create_served_app
+from routes.async_sales_routes import create_asgi_app
+
+app = create_asgi_app(create_served_app())
@@ -0,0 +1,2 @@
+# benchmarks/__init__.py
+# Este archivo hace que Python trate la carpeta 'benchmarks' como un paquete
\ No newline at end of file
@@ -0,0 +1,61 @@
+# benchmarks/compare.py
+# Compara dos resultados de benchmarks.run (p50 de cada medición y variación relativa).
+#
+# Uso:
+#   python -m benchmarks.compare base.json nuevo.json [--threshold 10]
+import argparse
+import json
+import sys
+
+SECTIONS = ('ingest', 'routes', 'serialization')
+
+def compare(base, new, threshold):
+    """Imprime la tabla comparativa y devuelve cuántas mediciones empeoraron más de threshold %."""
+    regressions = 0
+    for section in SECTIONS:
+        base_section = base.get(section) or {}
+        new_section = new.get(section) or {}
+        names = [name for name in new_section if name in base_section]
+        if not names:
+            continue
+        print(f"\n{section}")
+        print(f"  {'medición':<28} {'base p50 ms':>14} {'nuevo p50 ms':>14} {'cambio':>9}")
+        for name in names:
+            before = base_section[name]['p50_ms']
+            after = new_section[name]['p50_ms']
+            change = (after - before) / before * 100 if before else 0.0
+            flag = ''
+            if change > threshold:
+                flag = '  ⚠️'
+                regressions += 1
+            elif change < -threshold:
+                flag = '  ✅'
+            print(f"  {name:<28} {before:>14.2f} {after:>14.2f} {change:>+8.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Compara dos resultados de benchmarks.run.')
+    parser.add_argument('base', help='JSON de referencia')
+    parser.add_argument('new', help='JSON a comparar')
+    parser.add_argument('--threshold', type=float, default=10.0,
+                        help='Porcentaje de empeoramiento a partir del cual se marca una regresión')
+    args = parser.parse_args()
+
+    with open(args.base) as handle:
+        base = json.load(handle)
+    with open(args.new) as handle:
+        new = json.load(handle)
+
+    for label, results in (('base', base), ('nuevo', new)):
+        meta = results.get('meta', {})
+        print(f"{label}: commit {meta.get('git_commit')}, {meta.get('dialect')}, {meta.get('rows'):,} filas")
+    for key, label in (('rows', 'el número de filas'), ('dialect', 'la base de datos')):
+        if base.get('meta', {}).get(key) != new.get('meta', {}).get(key):
+            print(f"⚠️ Los resultados no coinciden en {label}; la comparación no es directa.")
+
+    regressions = compare(base, new, args.threshold)
+    # Código de salida distinto de cero si hay regresiones (útil en CI)
+    sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
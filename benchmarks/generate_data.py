@@ -0,0 +1,167 @@
+# benchmarks/generate_data.py
+# Generador de datos sintéticos con la misma forma que el CSV de Superstore (Config.CSV_URL).
+#
+# Uso:
+#   python -m benchmarks.generate_data --rows 1m --output /tmp/superstore_1m.csv
+import argparse
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# Mismas columnas y en el mismo orden que el CSV original
+CSV_COLUMNS = [
+    'No', 'RowID', 'OrderID', 'OrderDate', 'ShipDate', 'ShipMode', 'CustomerID',
+    'CustomerName', 'Segment', 'Country', 'City', 'State', 'Postal Code', 'Region',
+    'ProductID', 'Category', 'Sub-Category', 'ProductName', 'Sales', 'Quantity',
+    'Discount', 'Profit'
+]
+
+CATEGORIES = {
+    'Furniture': ['Bookcases', 'Chairs', 'Furnishings', 'Tables'],
+    'Office Supplies': ['Appliances', 'Art', 'Binders', 'Envelopes', 'Fasteners',
+                        'Labels', 'Paper', 'Storage', 'Supplies'],
+    'Technology': ['Accessories', 'Copiers', 'Machines', 'Phones'],
+}
+REGIONS = {
+    'East': [('New York City', 'New York'), ('Philadelphia', 'Pennsylvania'), ('Columbus', 'Ohio')],
+    'West': [('Los Angeles', 'California'), ('Seattle', 'Washington'), ('San Francisco', 'California')],
+    'Central': [('Chicago', 'Illinois'), ('Houston', 'Texas'), ('Detroit', 'Michigan')],
+    'South': [('Jacksonville', 'Florida'), ('Louisville', 'Kentucky'), ('Atlanta', 'Georgia')],
+}
+SEGMENTS = ['Consumer', 'Corporate', 'Home Office']
+SHIP_MODES = ['Standard Class', 'Second Class', 'First Class', 'Same Day']
+SHIP_DAYS = [5, 3, 2, 0]
+DISCOUNTS = [0.0, 0.0, 0.0, 0.1, 0.2, 0.2, 0.3, 0.4, 0.5, 0.7, 0.8]
+CSV_DATE_FORMAT = '%m/%d/%Y'
+FIRST_ORDER_DATE = np.datetime64('2014-01-03')
+ORDER_DATE_SPAN_DAYS = 1458 # Cuatro años, como el dataset original
+
+# Filas por bloque al escribir; acota la memoria incluso para 10M filas
+CHUNK_ROWS = 500000
+
+def parse_rows(value):
+    """Acepta '10000', '10k', '1m' o '10M'."""
+    text = str(value).strip().lower()
+    multiplier = 1
+    if text.endswith('k'):
+        multiplier, text = 1000, text[:-1]
+    elif text.endswith('m'):
+        multiplier, text = 1000000, text[:-1]
+    return int(float(text) * multiplier)
+
+def _catalogs(rows, rng):
+    """Clientes y productos proporcionales al tamaño (el original tiene ~800 y ~1.800 por 10k filas)."""
+    customer_count = max(50, rows // 12)
+    product_count = max(80, rows // 5)
+
+    customer_segment = rng.integers(0, len(SEGMENTS), customer_count)
+
+    subcategories = [(category, sub) for category, subs in CATEGORIES.items() for sub in subs]
+    product_subcategory = rng.integers(0, len(subcategories), product_count)
+    product_base_price = np.round(rng.lognormal(3.5, 1.2, product_count), 2)
+    return customer_segment, subcategories, product_subcategory, product_base_price
+
+def generate_chunk(start, rows, rng, catalogs):
+    """Genera las filas [start, start + rows) como DataFrame con las columnas del CSV."""
+    customer_segment, subcategories, product_subcategory, product_base_price = catalogs
+    row_ids = np.arange(start + 1, start + rows + 1)
+
+    # Pedidos de ~2 líneas de media; el id de pedido es estable para cada bloque de líneas
+    order_numbers = 100000 + row_ids // 2
+    # Las fechas se manejan como días desde FIRST_ORDER_DATE y se formatean con una tabla
+    # precalculada (hay pocos días distintos; strftime fila a fila domina el tiempo)
+    order_days = rng.integers(0, ORDER_DATE_SPAN_DAYS, rows)
+    ship_mode = rng.choice(len(SHIP_MODES), rows, p=[0.6, 0.2, 0.15, 0.05])
+    ship_days = order_days + np.array(SHIP_DAYS)[ship_mode]
+    calendar = FIRST_ORDER_DATE + np.arange(ORDER_DATE_SPAN_DAYS + max(SHIP_DAYS)).astype('timedelta64[D]')
+    date_strings = pd.Series(calendar).dt.strftime(CSV_DATE_FORMAT).to_numpy()
+    year_strings = (calendar.astype('datetime64[Y]').astype(int) + 1970).astype(str)
+
+    customers = rng.integers(0, len(customer_segment), rows)
+    products = rng.integers(0, len(product_base_price), rows)
+    region_names = list(REGIONS)
+    regions = rng.integers(0, len(region_names), rows)
+    # Índice en la lista plana de (ciudad, estado): tres ciudades por región
+    city_index = regions * 3 + rng.integers(0, 3, rows)
+    city_names = np.array([city for region in region_names for city, _ in REGIONS[region]])
+    state_names = np.array([state for region in region_names for _, state in REGIONS[region]])
+
+    quantity = rng.integers(1, 15, rows)
+    discount = np.array(DISCOUNTS)[rng.integers(0, len(DISCOUNTS), rows)]
+    sales = np.round(product_base_price[products] * quantity * (1 - discount), 4)
+    profit = np.round(sales * rng.normal(0.12, 0.25, rows) - sales * discount * 0.5, 4)
+
+    subcategory_index = product_subcategory[products]
+    category_names = np.array([category for category, _ in subcategories])
+    subcategory_names = np.array([sub for _, sub in subcategories])
+    customer_numbers = pd.Series(customers).astype(str)
+    product_numbers = pd.Series(products).astype(str)
+
+    return pd.DataFrame({
+        'No': row_ids,
+        'RowID': row_ids,
+        'OrderID': 'CA-' + pd.Series(year_strings[order_days]) + '-' + pd.Series(order_numbers).astype(str),
+        'OrderDate': date_strings[order_days],
+        'ShipDate': date_strings[ship_days],
+        'ShipMode': np.array(SHIP_MODES)[ship_mode],
+        'CustomerID': 'CU-' + customer_numbers.str.zfill(6),
+        'CustomerName': 'Customer ' + customer_numbers,
+        'Segment': np.array(SEGMENTS)[customer_segment[customers]],
+        'Country': 'United States',
+        'City': city_names[city_index],
+        'State': state_names[city_index],
+        # Códigos postales con ceros a la izquierda, como en el CSV original
+        'Postal Code': pd.Series(rng.integers(1000, 99999, rows)).astype(str).str.zfill(5),
+        'Region': np.array(region_names)[regions],
+        'ProductID': 'PR-' + product_numbers.str.zfill(7),
+        'Category': category_names[subcategory_index],
+        'Sub-Category': subcategory_names[subcategory_index],
+        'ProductName': 'Product ' + product_numbers + ', "model" ' + (pd.Series(products) % 97).astype(str),
+        'Sales': sales,
+        'Quantity': quantity,
+        'Discount': discount,
+        'Profit': profit,
+    }, columns=CSV_COLUMNS)
+
+def generate_csv(rows, output_path, seed=42):
+    """
+    Escribe un CSV sintético de rows filas en output_path, por bloques de CHUNK_ROWS.
+    Con la misma semilla el archivo es idéntico entre ejecuciones.
+    """
+    rng = np.random.default_rng(seed)
+    catalogs = _catalogs(rows, rng)
+    directory = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(directory, exist_ok=True)
+
+    temporary_path = output_path + '.tmp'
+    with open(temporary_path, 'w', newline='', encoding='utf-8') as handle:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = generate_chunk(start, min(CHUNK_ROWS, rows - start), rng, catalogs)
+            chunk.to_csv(handle, index=False, header=(start == 0))
+    os.replace(temporary_path, output_path)
+    return output_path
+
+def ensure_dataset(rows, data_dir, seed=42):
+    """Devuelve la ruta del CSV de rows filas, generándolo solo si no existe ya en data_dir."""
+    output_path = os.path.join(data_dir, f'superstore_{rows}_{seed}.csv')
+    if not os.path.exists(output_path):
+        started = time.perf_counter()
+        generate_csv(rows, output_path, seed)
+        print(f"🧪 Generadas {rows:,} filas sintéticas en {time.perf_counter() - started:.1f}s: {output_path}")
+    return output_path
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera un CSV sintético con la forma de Superstore.')
+    parser.add_argument('--rows', default='10k', help='Número de filas (p. ej. 10k, 1m, 10m)')
+    parser.add_argument('--output', required=True, help='Ruta del CSV a escribir')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    started = time.perf_counter()
+    generate_csv(rows, args.output, args.seed)
+    print(f"✅ {rows:,} filas escritas en {args.output} ({time.perf_counter() - started:.1f}s)")
+
+if __name__ == '__main__':
+    main()
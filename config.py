@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv() # Carga las variables de entorno del archivo .env
@@ -33,8 +34,134 @@ class Config:
     # Deshabilita el seguimiento de modificaciones de SQLAlchemy (ahorra memoria)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
-    # URL del archivo CSV que cargaremos en la base de datos
-    CSV_URL = 'https://raw.githubusercontent.com/rudyluis/DashboardJS/refs/heads/main/superstore_data.csv'
+    # Pool de conexiones por proceso (cada worker de Gunicorn tiene el suyo):
+    # conexiones permanentes, extra en picos y segundos de espera por una conexión libre
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    # Segundos tras los que se renueva una conexión (antes de que el servidor o un proxy la corte)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 900))
+    # Comprueba cada conexión al sacarla del pool y reconecta si el servidor la cerró
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    DB_CONNECT_TIMEOUT = int(os.environ.get('DB_CONNECT_TIMEOUT', 10))
+    DB_APPLICATION_NAME = os.environ.get('DB_APPLICATION_NAME', 'sales-dashboard')
+    # true si hay un pooler externo (pgbouncer en modo transaction): sin pool local ni estado de sesión
+    DB_EXTERNAL_POOLER = os.environ.get('DB_EXTERNAL_POOLER', 'false').lower() in ('1', 'true', 'yes')
+    # Tiempo máximo (ms) de cada consulta hecha durante una petición HTTP (0 = sin límite)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 15000))
+    # Límite para las rutas de volcado masivo (/api/data/all, /api/data/export)
+    DB_BULK_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_BULK_STATEMENT_TIMEOUT_MS', 120000))
+
+    # Modo ASGI (asgi.py): pool asyncpg de las rutas de analítica asíncronas de cada worker
+    # de uvicorn (conexiones mínimas y máximas) e hilos que atienden las demás rutas con Flask.
+    # Las conexiones del pool asyncpg se suman a las de DB_POOL_SIZE + DB_MAX_OVERFLOW
+    ASYNC_DB_POOL_MIN_SIZE = int(os.environ.get('ASYNC_DB_POOL_MIN_SIZE', 2))
+    ASYNC_DB_POOL_MAX_SIZE = int(os.environ.get('ASYNC_DB_POOL_MAX_SIZE', 20))
+    ASGI_WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 10))
+
+    # URL del archivo CSV que cargaremos en la base de datos. También admite una ruta local
+    # o 'file://', y archivos comprimidos en gzip o zip
+    CSV_URL = os.environ.get(
+        'CSV_URL',
+        'https://raw.githubusercontent.com/rudyluis/DashboardJS/refs/heads/main/superstore_data.csv'
+    )
+
+    # Paginación por cursor de /api/data/all (tamaño de página por defecto y máximo permitido)
+    API_PAGE_SIZE_DEFAULT = int(os.environ.get('API_PAGE_SIZE_DEFAULT', 1000))
+    API_PAGE_SIZE_MAX = int(os.environ.get('API_PAGE_SIZE_MAX', 10000))
+
+    # Número de filas que se leen del cursor del servidor y se envían por bloque en el modo streaming
+    STREAM_CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 1000))
+
+    # Segundos sin reportar progreso tras los cuales un trabajo de carga se considera abandonado
+    LOAD_JOB_STALE_SECONDS = int(os.environ.get('LOAD_JOB_STALE_SECONDS', 1800))
+
+    # Motor de las rutas de analítica (summary, categories, regions, customers, products):
+    # 'sql' consulta la base de datos; 'columnar' responde desde una instantánea en memoria de
+    # 'sales' que se construye tras cada carga y que los workers comparten con mmap
+    ANALYTICS_ENGINE = os.environ.get('ANALYTICS_ENGINE', 'sql').lower()
+    # Directorio de las instantáneas columnares (una por versión de los datos)
+    COLUMNAR_SNAPSHOT_DIR = os.environ.get(
+        'COLUMNAR_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'sales_columnar')
+    )
+
+    # Carga en paralelo: procesos que limpian y tipan los bloques del CSV (1 = secuencial)
+    # y conexiones que los escriben a la vez con COPY en la tabla de staging (solo PostgreSQL;
+    # deben caber en DB_POOL_SIZE + DB_MAX_OVERFLOW junto con las de las peticiones)
+    LOAD_WORKERS = int(os.environ.get('LOAD_WORKERS', 1))
+    LOAD_DB_WRITERS = int(os.environ.get('LOAD_DB_WRITERS', 4))
+
+    # Directorio donde se escribe el CSV de filas rechazadas de cada carga (con fila y motivo)
+    LOAD_REJECTS_DIR = os.environ.get('LOAD_REJECTS_DIR', os.path.join(tempfile.gettempdir(), 'sales_load_rejects'))
+
+    # Directorio donde se guardan los CSV subidos a /api/data/load hasta que termina su carga
+    LOAD_UPLOAD_DIR = os.environ.get('LOAD_UPLOAD_DIR', tempfile.gettempdir())
+
+    # Caché de respuestas de las rutas de analítica
+    # CACHE_BACKEND: 'memory' (LRU por worker), 'sqlite' (archivo compartido entre workers),
+    # 'redis' (servidor compartido, requiere el paquete redis) o 'none' (desactivada)
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300)) # Segundos
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 512))
+    CACHE_SQLITE_PATH = os.environ.get('CACHE_SQLITE_PATH') or \
+        os.path.join(tempfile.gettempdir(), 'sales_dashboard_cache.sqlite')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Single-flight: si varias peticiones iguales no encuentran la respuesta en la caché, una la
+    # calcula y las demás la esperan hasta estos segundos (0 = cada una la calcula). Entre
+    # workers solo funciona con un backend compartido ('sqlite' o 'redis')
+    CACHE_SINGLE_FLIGHT_WAIT_SECONDS = float(os.environ.get('CACHE_SINGLE_FLIGHT_WAIT_SECONDS', 20))
+
+    # Calentamiento de la caché en cada carga: al publicar la nueva versión se calculan y guardan
+    # las respuestas de las rutas de analítica (customers y products con cada limit de
+    # CACHE_WARM_LIMITS). Requiere una caché compartida ('sqlite' o 'redis'): con
+    # CACHE_BACKEND='memory' no se calienta nada, porque los demás workers no verían las respuestas
+    CACHE_WARM_ENABLED = os.environ.get('CACHE_WARM_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    CACHE_WARM_LIMITS = [
+        int(value) for value in os.environ.get('CACHE_WARM_LIMITS', '5,10,20').split(',') if value.strip()
+    ]
+
+    # Cada cuántos segundos cada worker vuelve a consultar la versión de los datos
+    DATASET_VERSION_CHECK_SECONDS = float(os.environ.get('DATASET_VERSION_CHECK_SECONDS', 2))
+
+    # Tablas de agregados (rollups) recalculadas en cada carga y usadas por las rutas de analítica
+    ROLLUPS_ENABLED = os.environ.get('ROLLUPS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+
+    # 'flask explain-check' falla si una ruta de analítica lee de 'sales' más filas que esto con
+    # cualquier scan (o hace un Seq Scan así de grande en otra tabla; los rollups se leen enteros).
+    # EXPLAIN_MAX_SEQ_SCAN_ROWS es el nombre anterior y se sigue aceptando.
+    EXPLAIN_MAX_SCAN_ROWS = int(os.environ.get('EXPLAIN_MAX_SCAN_ROWS',
+                                               os.environ.get('EXPLAIN_MAX_SEQ_SCAN_ROWS', 20000)))
+
+    # Sketches de approx=true en summary, customers y products, recalculados en cada carga:
+    # precisión de HyperLogLog (2^p registros, error estándar ≈ 1.04/sqrt(2^p); 14 = 0.81 %)
+    # y contadores del top aproximado de clientes y productos (límite máximo de approx=true)
+    SKETCHES_ENABLED = os.environ.get('SKETCHES_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SKETCH_HLL_PRECISION = int(os.environ.get('SKETCH_HLL_PRECISION', 14))
+    SKETCH_TOP_CAPACITY = int(os.environ.get('SKETCH_TOP_CAPACITY', 1000))
+
+    # Máximo de filas que devuelve /api/analytics/query
+    ANALYTICS_QUERY_MAX_ROWS = int(os.environ.get('ANALYTICS_QUERY_MAX_ROWS', 10000))
+
+    # Máximo de puntos que devuelve /api/analytics/timeseries
+    ANALYTICS_TIMESERIES_MAX_POINTS = int(os.environ.get('ANALYTICS_TIMESERIES_MAX_POINTS', 5000))
+
+    # Filas por lote (y por row group de Parquet) en /api/data/export
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 50000))
+
+    # Compresión gzip/brotli de las respuestas (según Accept-Encoding)
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Las respuestas completas más pequeñas que esto (bytes) se envían sin comprimir
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+    # Nivel de gzip (1-9) y calidad de brotli (0-11); valores medios para respuestas dinámicas
+    COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+
+    # Métricas por petición (/api/metrics y cabecera Server-Timing)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    # Las consultas SQL que tarden más de esto (ms) se registran con su SQL y parámetros (0 = desactivado)
+    SLOW_QUERY_MS = int(os.environ.get('SLOW_QUERY_MS', 500))
 
 class DevelopmentConfig(Config):
     # En desarrollo, Flask mostrará información de depuración detallada
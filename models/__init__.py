@@ -5,4 +5,11 @@ db = SQLAlchemy()
 
 def init_db(app):
     """Inicializa la extensión SQLAlchemy con la aplicación Flask."""
-    db.init_app(app)
\ No newline at end of file
+    db.init_app(app)
+
+def import_all_models():
+    """
+    Importa todos los modelos para que db.metadata tenga el esquema completo (autogenerate de
+    las migraciones, db.create_all() de los benchmarks): la aplicación importa algunos solo al usarlos.
+    """
+    from . import dataset_sketch, dataset_version, load_job, rollups, sales  # noqa: F401
@@ -0,0 +1,20 @@
+# models/dataset_sketch.py
+from . import db # Importa 'db' desde models/__init__.py
+from datetime import datetime
+
+class DatasetSketch(db.Model):
+    """
+    Resumen aproximado (sketch) de la tabla 'sales': HyperLogLog de órdenes y clientes distintos,
+    top de clientes y productos por ventas y totales. DataLoader los recalcula en cada carga, en la
+    misma transacción que publica los datos, y las rutas los usan con approx=true.
+    """
+    __tablename__ = 'dataset_sketches'
+
+    name = db.Column(db.String(50), primary_key=True) # p. ej. 'unique_orders', 'top_customers'
+    version = db.Column(db.BigInteger, nullable=False) # Versión de los datos de la que sale
+    payload = db.Column(db.LargeBinary, nullable=False) # Sketch serializado (ver utils/sketches.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        """Representación amigable del sketch."""
+        return f'<DatasetSketch {self.name} v{self.version}>'
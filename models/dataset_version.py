@@ -0,0 +1,57 @@
+# models/dataset_version.py
+from . import db # Importa 'db' desde models/__init__.py
+from datetime import datetime
+
+class DatasetVersion(db.Model):
+    """
+    Versión de los datos de la tabla 'sales'. Es una tabla de una sola fila
+    que DataLoader incrementa en cada carga, dentro de la misma transacción que publica
+    los datos nuevos. Cachés y validadores HTTP la usan para saber si los datos cambiaron.
+    """
+    __tablename__ = 'dataset_version'
+
+    SINGLETON_ID = 1
+
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+    rollups_version = db.Column(db.BigInteger) # Versión para la que se calcularon los rollups
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def current(cls):
+        """Devuelve la fila de versión actual, o None si todavía no se ha cargado ningún dato."""
+        return db.session.get(cls, cls.SINGLETON_ID)
+
+    @classmethod
+    def bump(cls, rollups_built=False):
+        """
+        Incrementa la versión en la transacción actual de db.session (quien llama hace el commit).
+        rollups_built indica si los rollups se recalcularon en esa misma transacción.
+        Devuelve el nuevo número de versión.
+        """
+        now = datetime.utcnow()
+        updated = db.session.execute(
+            db.update(cls.__table__)
+            .where(cls.id == cls.SINGLETON_ID)
+            .values(
+                version=cls.version + 1,
+                rollups_version=(cls.version + 1) if rollups_built else None,
+                updated_at=now
+            )
+        )
+        if updated.rowcount == 0:
+            db.session.execute(
+                db.insert(cls.__table__).values(
+                    id=cls.SINGLETON_ID,
+                    version=1,
+                    rollups_version=1 if rollups_built else None,
+                    updated_at=now
+                )
+            )
+        return db.session.execute(
+            db.select(cls.version).where(cls.id == cls.SINGLETON_ID)
+        ).scalar()
+
+    def __repr__(self):
+        """Representación amigable de la versión de los datos."""
+        return f'<DatasetVersion {self.version}>'
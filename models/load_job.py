@@ -0,0 +1,59 @@
+# models/load_job.py
+from . import db # Importa 'db' desde models/__init__.py
+from datetime import datetime
+import uuid # Para generar identificadores únicos de trabajo
+
+class LoadJob(db.Model):
+    """
+    Trabajo de carga de datos ejecutado en segundo plano.
+    Se guarda en la base de datos para que cualquier worker de Gunicorn
+    pueda responder a las consultas de estado, no solo el que lanzó la carga.
+    """
+    __tablename__ = 'load_jobs'
+
+    # Estados posibles del trabajo
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+    # Modos de carga: 'full' (reemplazo completo) o 'delta' (incremental)
+    FULL = 'full'
+    DELTA = 'delta'
+    MODES = (FULL, DELTA)
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = db.Column(db.String(20), nullable=False, default=QUEUED, index=True)
+    phase = db.Column(db.String(50)) # Fase actual: descarga, inserción, ANALYZE, ...
+    source = db.Column(db.Text) # Origen de los datos (URL del CSV)
+    mode = db.Column(db.String(20), default='full') # 'full' (reemplazo completo) o 'delta' (incremental)
+    rows_processed = db.Column(db.Integer, default=0)
+    rows_per_second = db.Column(db.Float)
+    error = db.Column(db.Text)
+    result = db.Column(db.JSON) # Resumen final de la carga (conteos, segundos, filas/seg)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        """Convierte el trabajo a un diccionario para respuestas JSON."""
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'phase': self.phase,
+            'source': self.source,
+            'mode': self.mode,
+            'rows_processed': self.rows_processed or 0,
+            'rows_per_second': self.rows_per_second,
+            'error': self.error,
+            'result': self.result,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+    def __repr__(self):
+        """Representación amigable del trabajo de carga."""
+        return f'<LoadJob {self.id} {self.status}>'
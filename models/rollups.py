@@ -0,0 +1,54 @@
+# models/rollups.py
+from . import db # Importa 'db' desde models/__init__.py
+
+# Tablas de agregados precalculados que DataLoader reconstruye en cada carga.
+# Las rutas de analítica las leen en lugar de agregar la tabla 'sales' completa.
+
+class SalesMonthlyRollup(db.Model):
+    """Totales por categoría × subcategoría × región × segmento × mes de la orden."""
+    __tablename__ = 'sales_rollup_monthly'
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), index=True)
+    sub_category = db.Column(db.String(50))
+    region = db.Column(db.String(50), index=True)
+    segment = db.Column(db.String(50))
+    order_month = db.Column(db.Date, index=True) # Primer día del mes de order_date
+    total_sales = db.Column(db.Numeric(18, 2))
+    total_profit = db.Column(db.Numeric(18, 2))
+    total_quantity = db.Column(db.BigInteger)
+    row_count = db.Column(db.BigInteger) # Número de filas de 'sales' agregadas
+
+    def __repr__(self):
+        """Representación amigable del agregado mensual."""
+        return f'<SalesMonthlyRollup {self.category}/{self.region} {self.order_month}>'
+
+class CustomerRollup(db.Model):
+    """Total gastado y número de órdenes distintas por cliente."""
+    __tablename__ = 'sales_rollup_customers'
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.String(20))
+    customer_name = db.Column(db.String(100))
+    total_spent = db.Column(db.Numeric(18, 2), index=True) # Índice para el top N
+    total_orders = db.Column(db.BigInteger)
+
+    def __repr__(self):
+        """Representación amigable del agregado por cliente."""
+        return f'<CustomerRollup {self.customer_id}>'
+
+class ProductRollup(db.Model):
+    """Ventas y cantidad vendida por producto."""
+    __tablename__ = 'sales_rollup_products'
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.String(50))
+    product_name = db.Column(db.Text)
+    total_sales = db.Column(db.Numeric(18, 2), index=True) # Índice para el top N
+    total_quantity_sold = db.Column(db.BigInteger)
+
+    def __repr__(self):
+        """Representación amigable del agregado por producto."""
+        return f'<ProductRollup {self.product_id}>'
+
+ROLLUP_MODELS = (SalesMonthlyRollup, CustomerRollup, ProductRollup)
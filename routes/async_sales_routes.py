@@ -0,0 +1,482 @@
+# routes/async_sales_routes.py
+# Variantes asíncronas de las rutas de analítica de sales_bp para el modo ASGI (asgi.py).
+# Consultan PostgreSQL con asyncpg y lanzan a la vez las consultas independientes de cada ruta,
+# así un worker de uvicorn mantiene cientos de peticiones en curso sin un hilo por cada una.
+# Todo lo demás (el resto de rutas, approx=true y ANALYTICS_ENGINE='columnar') lo sirve la
+# aplicación Flask de siempre a través de a2wsgi, en un pool de hilos del mismo worker.
+import asyncio
+import time
+from datetime import timezone
+from urllib.parse import parse_qsl
+from a2wsgi import WSGIMiddleware
+from flask import Response
+from sqlalchemy import select, func, distinct, bindparam
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_etags, parse_date, http_date, quote_etag
+from models.sales import Sales
+from models.dataset_version import DatasetVersion
+from models.rollups import SalesMonthlyRollup, CustomerRollup, ProductRollup
+from utils.async_db import AsyncDatabase, async_db_available, compile_statement, track_db_stats, asyncpg
+from utils.cache import cache_key, FLIGHT_LOCK_PREFIX, FLIGHT_POLL_SECONDS
+from utils.compression import compress_body
+from utils.dataset_version import memoized_state, store_state
+from utils.metrics import record_request
+from utils.serialization import dumps
+
+# Consultas compiladas una sola vez, las mismas que hacen las rutas síncronas
+STATE_QUERY = compile_statement(
+    select(DatasetVersion.version, DatasetVersion.rollups_version, DatasetVersion.updated_at)
+    .where(DatasetVersion.id == DatasetVersion.SINGLETON_ID)
+)
+# El resumen se reparte en tres consultas independientes que se ejecutan a la vez,
+# cada una sobre su índice de cobertura
+SUMMARY_TOTALS_QUERY = compile_statement(
+    select(func.sum(Sales.sales), func.sum(Sales.profit), func.sum(Sales.quantity))
+)
+SUMMARY_ORDERS_QUERY = compile_statement(select(func.count(distinct(Sales.order_id))))
+SUMMARY_CUSTOMERS_QUERY = compile_statement(select(func.count(distinct(Sales.customer_id))))
+CATEGORIES_ROLLUP_QUERY = compile_statement(
+    select(
+        SalesMonthlyRollup.category,
+        func.sum(SalesMonthlyRollup.total_sales).label('total_sales'),
+        func.sum(SalesMonthlyRollup.total_profit).label('total_profit'),
+        func.sum(SalesMonthlyRollup.total_quantity).label('total_quantity_sold')
+    ).group_by(SalesMonthlyRollup.category).order_by(func.sum(SalesMonthlyRollup.total_sales).desc())
+)
+CATEGORIES_QUERY = compile_statement(
+    select(
+        Sales.category,
+        func.sum(Sales.sales).label('total_sales'),
+        func.sum(Sales.profit).label('total_profit'),
+        func.sum(Sales.quantity).label('total_quantity_sold')
+    ).group_by(Sales.category).order_by(func.sum(Sales.sales).desc())
+)
+REGIONS_ROLLUP_QUERY = compile_statement(
+    select(
+        SalesMonthlyRollup.region,
+        func.sum(SalesMonthlyRollup.total_sales).label('total_sales'),
+        func.sum(SalesMonthlyRollup.total_profit).label('total_profit')
+    ).group_by(SalesMonthlyRollup.region).order_by(func.sum(SalesMonthlyRollup.total_sales).desc())
+)
+REGIONS_QUERY = compile_statement(
+    select(
+        Sales.region,
+        func.sum(Sales.sales).label('total_sales'),
+        func.sum(Sales.profit).label('total_profit')
+    ).group_by(Sales.region).order_by(func.sum(Sales.sales).desc())
+)
+CUSTOMERS_ROLLUP_QUERY = compile_statement(
+    select(
+        CustomerRollup.customer_id,
+        CustomerRollup.customer_name,
+        CustomerRollup.total_spent,
+        CustomerRollup.total_orders
+    ).order_by(CustomerRollup.total_spent.desc()).limit(bindparam('limit'))
+)
+CUSTOMERS_QUERY = compile_statement(
+    select(
+        Sales.customer_id,
+        Sales.customer_name,
+        func.sum(Sales.sales).label('total_spent'),
+        func.count(distinct(Sales.order_id)).label('total_orders')
+    ).group_by(Sales.customer_id, Sales.customer_name)
+    .order_by(func.sum(Sales.sales).desc()).limit(bindparam('limit'))
+)
+PRODUCTS_ROLLUP_QUERY = compile_statement(
+    select(
+        ProductRollup.product_id,
+        ProductRollup.product_name,
+        ProductRollup.total_sales,
+        ProductRollup.total_quantity_sold
+    ).order_by(ProductRollup.total_sales.desc()).limit(bindparam('limit'))
+)
+PRODUCTS_QUERY = compile_statement(
+    select(
+        Sales.product_id,
+        Sales.product_name,
+        func.sum(Sales.sales).label('total_sales'),
+        func.sum(Sales.quantity).label('total_quantity_sold')
+    ).group_by(Sales.product_id, Sales.product_name)
+    .order_by(func.sum(Sales.sales).desc()).limit(bindparam('limit'))
+)
+
+# Intentos del resumen si una carga publica datos nuevos entre sus consultas en paralelo
+SUMMARY_MAX_ATTEMPTS = 3
+
+def _float(value):
+    return float(value) if value is not None else 0.0
+
+def _int(value):
+    return int(value) if value is not None else 0
+
+def _limit(args):
+    """limit como en request.args.get('limit', 10, type=int) (un valor no entero usa el defecto)."""
+    return args.get('limit', 10, type=int)
+
+async def _summary(app, args, state):
+    """
+    Resumen de ventas con las tres consultas a la vez. Cada una ve su propia instantánea, así
+    que se comprueba que la versión de los datos no cambió mientras se ejecutaban.
+    """
+    for _ in range(SUMMARY_MAX_ATTEMPTS):
+        version = (await app.read_state())['version']
+        totals, orders, customers = await asyncio.gather(
+            app.database.fetchrow(SUMMARY_TOTALS_QUERY),
+            app.database.fetchrow(SUMMARY_ORDERS_QUERY),
+            app.database.fetchrow(SUMMARY_CUSTOMERS_QUERY),
+        )
+        if (await app.read_state())['version'] == version:
+            break
+    total_sales, total_profit, total_quantity = totals
+    return {
+        'status': 'success',
+        'summary': {
+            'total_sales': _float(total_sales),
+            'total_profit': _float(total_profit),
+            'total_quantity_sold': _int(total_quantity),
+            'total_unique_orders': _int(orders[0]),
+            'total_unique_customers': _int(customers[0]),
+        }
+    }
+
+async def _categories(app, args, state):
+    rows = await app.database.fetch(CATEGORIES_ROLLUP_QUERY if app.rollups_ready(state) else CATEGORIES_QUERY)
+    return {
+        "status": "success",
+        "categories": [{
+            "category": row['category'],
+            "total_sales": _float(row['total_sales']),
+            "total_profit": _float(row['total_profit']),
+            "total_quantity_sold": _int(row['total_quantity_sold'])
+        } for row in rows]
+    }
+
+async def _regions(app, args, state):
+    rows = await app.database.fetch(REGIONS_ROLLUP_QUERY if app.rollups_ready(state) else REGIONS_QUERY)
+    return {
+        "status": "success",
+        "regions": [{
+            "region": row['region'],
+            "total_sales": _float(row['total_sales']),
+            "total_profit": _float(row['total_profit'])
+        } for row in rows]
+    }
+
+async def _customers(app, args, state):
+    rows = await app.database.fetch(
+        CUSTOMERS_ROLLUP_QUERY if app.rollups_ready(state) else CUSTOMERS_QUERY, limit=_limit(args)
+    )
+    return {
+        "status": "success",
+        "customers": [{
+            "customer_id": row['customer_id'],
+            "customer_name": row['customer_name'],
+            "total_spent": _float(row['total_spent']),
+            "total_orders": _int(row['total_orders'])
+        } for row in rows]
+    }
+
+async def _products(app, args, state):
+    rows = await app.database.fetch(
+        PRODUCTS_ROLLUP_QUERY if app.rollups_ready(state) else PRODUCTS_QUERY, limit=_limit(args)
+    )
+    return {
+        "status": "success",
+        "products": [{
+            "product_id": row['product_id'],
+            "product_name": row['product_name'],
+            "total_sales": _float(row['total_sales']),
+            "total_quantity_sold": _int(row['total_quantity_sold'])
+        } for row in rows]
+    }
+
+# Ruta -> (función, nombre y parámetros en la caché, endpoint de Flask en las métricas, mensaje de error).
+# Nombre y parámetros son los de @cached_route en sales_routes.py: ambos modos comparten la caché.
+ASYNC_ROUTES = {
+    '/api/analytics/summary': (
+        _summary, 'summary', {'approx': (str, 'false')}, 'sales_bp.get_sales_summary',
+        'Error al generar el resumen de ventas: {error}'
+    ),
+    '/api/analytics/categories': (
+        _categories, 'categories', None, 'sales_bp.get_sales_by_category',
+        'Error interno del servidor al obtener ventas por categoría.'
+    ),
+    '/api/analytics/regions': (
+        _regions, 'regions', None, 'sales_bp.get_regional_performance',
+        'Error interno del servidor al obtener rendimiento regional.'
+    ),
+    '/api/analytics/customers': (
+        _customers, 'customers', {'limit': (int, 10), 'approx': (str, 'false')}, 'sales_bp.get_top_customers',
+        'Error interno del servidor al obtener top clientes.'
+    ),
+    '/api/analytics/products': (
+        _products, 'products', {'limit': (int, 10), 'approx': (str, 'false')}, 'sales_bp.get_top_products',
+        'Error interno del servidor al obtener top productos.'
+    ),
+}
+
+def _request_headers(scope):
+    """Cabeceras de la petición ASGI como dict (nombres en minúsculas)."""
+    return {name.decode('latin-1'): value.decode('latin-1') for name, value in scope['headers']}
+
+def _is_not_modified(headers, etag, last_modified):
+    """Igual que utils.cache._is_not_modified, con las cabeceras de la petición ASGI."""
+    if headers.get('if-none-match'):
+        return parse_etags(headers['if-none-match']).contains_weak(etag)
+    if_modified_since = parse_date(headers.get('if-modified-since'))
+    if if_modified_since is not None and last_modified is not None:
+        return last_modified <= if_modified_since
+    return False
+
+class AsyncSalesApp:
+    """
+    Aplicación ASGI: sirve ASYNC_ROUTES con asyncpg y pasa todo lo demás a Flask.
+    Las respuestas llevan las mismas cabeceras que en Flask (ETag, Last-Modified, Cache-Control,
+    compresión, CORS y Server-Timing) y se cuentan en /api/metrics con el mismo endpoint.
+    """
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.config = flask_app.config
+        self.wsgi = WSGIMiddleware(flask_app, workers=self.config['ASGI_WSGI_THREADS'])
+        self.database = AsyncDatabase(self.config) if async_db_available(self.config) else None
+        if self.database is None:
+            print("⚠️ Modo ASGI sin rutas asíncronas (requiere PostgreSQL y asyncpg): todo lo sirve Flask")
+        self._cors_headers = {}
+        self._state_refresh = None # Lectura de la versión en curso (asyncio.Task)
+        self._flights = {} # Clave de caché -> cálculo en curso de esa respuesta (asyncio.Task)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        route = ASYNC_ROUTES.get(scope.get('path')) if scope['type'] == 'http' else None
+        if route is not None and self.database is not None and scope['method'] in ('GET', 'HEAD'):
+            args = MultiDict(parse_qsl(scope['query_string'].decode('latin-1'), keep_blank_values=True))
+            if self._handles(args):
+                await self._serve(route, scope, args, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    def _handles(self, args):
+        """approx=true y el motor columnar se quedan en Flask (sketches e instantánea viven allí)."""
+        if args.get('approx', 'false').lower() in ('1', 'true', 'yes'):
+            return False
+        return self.config['ANALYTICS_ENGINE'] != 'columnar'
+
+    async def _lifespan(self, receive, send):
+        """Abre el pool asyncpg al arrancar el worker y lo cierra al apagarlo."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    if self.database is not None:
+                        await self.database.start()
+                except Exception as e:
+                    # Sin pool al arrancar se reintenta con la primera petición
+                    print(f"⚠️ No se pudo abrir el pool asyncpg al arrancar: {e}")
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.database is not None:
+                    await self.database.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def read_state(self):
+        """Lee la fila de versión con asyncpg y la memoriza para todo el proceso."""
+        try:
+            row = await self.database.fetchrow(STATE_QUERY)
+        except asyncpg.UndefinedTableError:
+            row = None
+        if row is None:
+            return store_state(0, None, None)
+        return store_state(row['version'], row['rollups_version'], row['updated_at'])
+
+    async def dataset_state(self):
+        """
+        Estado de los datos memorizado durante DATASET_VERSION_CHECK_SECONDS, como en Flask.
+        Al caducar, las peticiones en curso comparten una sola lectura en lugar de lanzar
+        cientos a la vez y agotar el pool.
+        """
+        state = memoized_state(self.config['DATASET_VERSION_CHECK_SECONDS'])
+        if state is not None:
+            return state
+        if self._state_refresh is None:
+            self._state_refresh = asyncio.ensure_future(self.read_state())
+            self._state_refresh.add_done_callback(self._forget_state_refresh)
+        # shield: si se cancela una petición, la lectura compartida sigue para las demás
+        return await asyncio.shield(self._state_refresh)
+
+    def _forget_state_refresh(self, task):
+        self._state_refresh = None
+
+    def rollups_ready(self, state):
+        return self.config['ROLLUPS_ENABLED'] and state is not None and state['rollups_ready']
+
+    async def _cache_call(self, cache, method, *args):
+        # La caché en memoria responde al momento; sqlite y redis hacen E/S bloqueante
+        if cache.backend_name == 'memory':
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def _body(self, route, args, state):
+        """
+        Cuerpo de la respuesta (de la caché o calculado) y su código de estado. Las peticiones
+        iguales que llegan mientras se calcula esperan ese mismo cálculo (single-flight).
+        """
+        _, cache_name, arg_specs, _, _ = route
+        cache = self.flask_app.extensions.get('response_cache')
+        if cache is None or state is None:
+            return await self._compute(route, args, state)
+        try:
+            key = cache_key(cache_name, state['version'], arg_specs, args)
+            cached_body = await self._cache_call(cache, cache.get, key)
+        except Exception as e:
+            print(f"⚠️ Error leyendo la caché de respuestas: {e}")
+            return await self._compute(route, args, state)
+        if cached_body is not None:
+            return 200, cached_body
+        if not self.config['CACHE_SINGLE_FLIGHT_WAIT_SECONDS']:
+            return await self._compute(route, args, state, cache, key)
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(self._compute_once(route, args, state, cache, key))
+            self._flights[key] = flight
+            flight.add_done_callback(lambda _: self._flights.pop(key, None))
+        # shield: si se cancela una petición, el cálculo sigue para las demás
+        return await asyncio.shield(flight)
+
+    async def _compute_once(self, route, args, state, cache, key):
+        """
+        Con una caché compartida, toma el lock de la clave como cached_route para que los demás
+        workers esperen esta respuesta; si lo tiene otro worker, espera a que la guarde.
+        """
+        wait_seconds = self.config['CACHE_SINGLE_FLIGHT_WAIT_SECONDS']
+        if not cache.shared:
+            return await self._compute(route, args, state, cache, key)
+        lock_key = FLIGHT_LOCK_PREFIX + key
+        try:
+            acquired = await self._cache_call(cache, cache.add, lock_key, b'1', wait_seconds)
+        except Exception as e:
+            print(f"⚠️ Error tomando el lock de la caché de respuestas: {e}")
+            return await self._compute(route, args, state, cache, key)
+        if acquired:
+            try:
+                return await self._compute(route, args, state, cache, key)
+            finally:
+                try:
+                    await self._cache_call(cache, cache.delete, lock_key)
+                except Exception as e:
+                    print(f"⚠️ Error liberando el lock de la caché de respuestas: {e}")
+
+        deadline = time.monotonic() + wait_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(FLIGHT_POLL_SECONDS)
+            try:
+                in_progress = await self._cache_call(cache, cache.peek, lock_key) is not None
+                cached_body = await self._cache_call(cache, cache.peek, key)
+            except Exception as e:
+                print(f"⚠️ Error leyendo la caché de respuestas: {e}")
+                break
+            if cached_body is not None:
+                return 200, cached_body
+            if not in_progress:
+                break
+        # Quien calculaba falló o tardó demasiado: este worker la calcula por su cuenta
+        return await self._compute(route, args, state, cache, key)
+
+    async def _compute(self, route, args, state, cache=None, key=None):
+        """Ejecuta la ruta y, si hay caché, guarda el cuerpo de la respuesta 200."""
+        handler, cache_name, _, _, error_message = route
+        try:
+            body = dumps(await handler(self, args, state))
+        except Exception as e:
+            print(f"Error en la ruta asíncrona {cache_name}: {e!r}")
+            return 500, dumps({'status': 'error', 'message': error_message.format(error=e)})
+
+        if cache is not None:
+            try:
+                await self._cache_call(cache, cache.set, key, body)
+            except Exception as e:
+                print(f"⚠️ Error guardando en la caché de respuestas: {e}")
+        return 200, body
+
+    def _cors(self, path, origin):
+        """
+        Cabeceras CORS para el Origin de la petición, calculadas por Flask-CORS con la
+        configuración de la aplicación y memorizadas por origen.
+        """
+        if origin is None:
+            return []
+        headers = self._cors_headers.get(origin)
+        if headers is None:
+            response = Response()
+            with self.flask_app.test_request_context(path, headers={'Origin': origin}):
+                for after_request in self.flask_app.after_request_funcs.get(None, ()):
+                    if after_request.__name__ == 'cors_after_request':
+                        response = after_request(response)
+            headers = [
+                (name.lower().encode('latin-1'), value.encode('latin-1'))
+                for name, value in response.headers.items() if name.lower().startswith('access-control-')
+            ]
+            if len(self._cors_headers) < 256:
+                self._cors_headers[origin] = headers
+        return headers
+
+    async def _serve(self, route, scope, args, send):
+        started = time.perf_counter()
+        db_stats = track_db_stats()
+        headers = _request_headers(scope)
+        try:
+            state = await self.dataset_state()
+        except Exception as e:
+            print(f"⚠️ Error leyendo la versión de los datos: {e}")
+            state = None
+
+        validators = []
+        status = body = None
+        if state is not None:
+            etag = f"sales-v{state['version']}"
+            # HTTP solo tiene resolución de segundos
+            last_modified = (
+                state['updated_at'].replace(tzinfo=timezone.utc, microsecond=0)
+                if state['updated_at'] is not None else None
+            )
+            # Débil: el mismo ETag vale para la respuesta comprimida y sin comprimir
+            validators.append((b'etag', quote_etag(etag, weak=True).encode('latin-1')))
+            if last_modified is not None:
+                validators.append((b'last-modified', http_date(last_modified).encode('latin-1')))
+            # Los clientes pueden guardar la respuesta, pero deben revalidarla en cada uso
+            validators.append((b'cache-control', b'no-cache'))
+            if _is_not_modified(headers, etag, last_modified):
+                status, body = 304, b''
+        if status is None:
+            status, body = await self._body(route, args, state)
+
+        response_headers = [(b'content-type', b'application/json')]
+        if self.config['COMPRESS_ENABLED']:
+            response_headers.append((b'vary', b'Accept-Encoding'))
+        if status in (200, 304):
+            response_headers += validators
+        if status == 200:
+            body, encoding = compress_body(body, headers.get('accept-encoding', ''), self.config)
+            if encoding is not None:
+                response_headers.append((b'content-encoding', encoding.encode('latin-1')))
+        response_headers += self._cors(scope['path'], headers.get('origin'))
+        if self.config['SERVER_TIMING_ENABLED']:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            response_headers.append((b'server-timing', (
+                f'db;dur={db_stats["seconds"] * 1000:.1f};desc="{db_stats["queries"]} queries", '
+                f'app;dur={elapsed_ms:.1f}'
+            ).encode('latin-1')))
+        if status != 304:
+            response_headers.append((b'content-length', str(len(body)).encode('latin-1')))
+
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': body if scope['method'] != 'HEAD' else b''})
+        record_request(route[3], scope['method'], status, len(body), started,
+                       db_stats['queries'], db_stats['seconds'])
+
+def create_asgi_app(flask_app):
+    """Envuelve la aplicación Flask en la aplicación ASGI del modo asíncrono."""
+    return AsyncSalesApp(flask_app)
@@ -1,14 +1,36 @@
 # routes/sales_routes.py
 
-from flask import Blueprint, jsonify, request
+import os
+import shutil
+import tempfile
+from flask import Blueprint, jsonify, request, Response, current_app, stream_with_context, url_for
 from models import db # Importa la instancia de SQLAlchemy
 from models.sales import Sales # Importa el modelo Sales
-from utils.data_loader import DataLoader
+from models.load_job import LoadJob
+from utils.load_jobs import enqueue_load, get_job, LoadInProgressError
+from utils.cache import cached_route, conditional_route, get_cache
+from utils.compression import compress_response
+from utils.db_pool import statement_timeout, pool_status
+from utils.serialization import (
+    sales_select, format_rows, rows_to_records, encode_chunk, dumps, SALES_KEYS, RESPONSE_SHAPES
+)
+from utils.dataset_version import rollups_ready
+from models.rollups import SalesMonthlyRollup, CustomerRollup, ProductRollup
+from utils.analytics_query import (
+    parse_query_args, run_analytics_query, can_use_rollup, QueryValidationError,
+    parse_timeseries_args, run_timeseries_query, can_use_rollup_for_timeseries,
+    parse_filters, FILTER_COLUMNS
+)
+from utils.export import stream_export, EXPORT_FORMATS, ExportUnavailableError
+from utils.csv_source import READ_BLOCK_SIZE
 from config import Config
+from werkzeug.utils import secure_filename
 from sqlalchemy import text, func, distinct # Asegúrate de importar func y distinct
 
 # Crea un Blueprint para las rutas de ventas
 sales_bp = Blueprint('sales_bp', __name__)
+# Comprime las respuestas del blueprint según Accept-Encoding
+sales_bp.after_request(compress_response)
 
 @sales_bp.route('/api/health', methods=['GET'])
 def health_check():
@@ -20,41 +42,251 @@ def health_check():
         'message': 'API is healthy and running!'
     }), 200
 
+def _save_upload(upload):
+    """
+    Guarda el CSV subido en LOAD_UPLOAD_DIR (la carga corre en otro hilo, después de responder)
+    y devuelve la ruta. Se copia por bloques, sin leerlo entero en memoria.
+    """
+    suffix = '_' + (secure_filename(upload.filename) or 'upload.csv')
+    handle, path = tempfile.mkstemp(prefix='sales_load_', suffix=suffix,
+                                    dir=current_app.config['LOAD_UPLOAD_DIR'])
+    with os.fdopen(handle, 'wb') as destination:
+        shutil.copyfileobj(upload.stream, destination, READ_BLOCK_SIZE)
+    return path
+
+def _discard_upload(path):
+    """Borra el CSV subido si la carga no llegó a encolarse."""
+    if path is not None and os.path.exists(path):
+        os.remove(path)
+
 @sales_bp.route('/api/data/load', methods=['POST'])
 def load_data():
     """
     Endpoint para cargar datos desde el CSV remoto a la base de datos PostgreSQL.
     Se usa un método POST para indicar una acción que modifica el estado del servidor.
+    La carga se ejecuta en segundo plano: se devuelve el id del trabajo de inmediato
+    y su progreso se consulta en /api/data/load/<job_id>.
+    Con 'mode=delta' solo se insertan/actualizan las filas nuevas o modificadas (por RowID);
+    'delete_missing=true' borra además las filas que ya no están en el CSV.
+    Por defecto se carga Config.CSV_URL; si la petición es multipart con un campo 'file'
+    se carga el CSV subido (sin comprimir, gzip o zip). No se aceptan rutas ni URLs
+    arbitrarias desde la petición.
+    """
+    mode = request.args.get('mode', 'full').lower()
+    if mode not in LoadJob.MODES:
+        return jsonify({
+            'status': 'error',
+            'message': f"Modo de carga no soportado: '{mode}'. Usa {', '.join(LoadJob.MODES)}."
+        }), 400
+    delete_missing = request.args.get('delete_missing', 'false').lower() in ('1', 'true', 'yes')
+
+    upload = request.files.get('file')
+    upload_path = None
+    try:
+        if upload is not None and upload.filename:
+            upload_path = _save_upload(upload)
+            job = enqueue_load(current_app._get_current_object(), upload_path, mode, delete_missing,
+                               remove_source=True, source_label=f'upload:{secure_filename(upload.filename)}')
+        else:
+            job = enqueue_load(current_app._get_current_object(), Config.CSV_URL, mode, delete_missing)
+    except LoadInProgressError as e:
+        _discard_upload(upload_path)
+        return jsonify({
+            'status': 'error',
+            'message': 'Ya hay una carga de datos en curso. Espera a que termine.',
+            'job': e.job.to_dict()
+        }), 409
+    except Exception as e:
+        _discard_upload(upload_path)
+        print(f"Error al iniciar la carga de datos: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Error al iniciar la carga de los datos. Consulta los logs del servidor.'
+        }), 500
+
+    return jsonify({
+        'status': 'accepted',
+        'message': 'Carga de datos iniciada en segundo plano.',
+        'job_id': job.id,
+        'mode': mode,
+        'status_url': url_for('sales_bp.get_load_status', job_id=job.id)
+    }), 202
+
+@sales_bp.route('/api/data/load/<job_id>', methods=['GET'])
+def get_load_status(job_id):
+    """
+    Endpoint para consultar el estado de un trabajo de carga: fase actual,
+    registros procesados, filas por segundo y el error si lo hubo. Al terminar, 'result'
+    incluye el número de filas rechazadas y su resumen en 'rejects' (motivos, archivo y muestra).
     """
-    data_loader = DataLoader(Config.CSV_URL)
-    success, records_inserted = data_loader.load_csv_to_database()
+    try:
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({
+                'status': 'error',
+                'message': f'No existe el trabajo de carga {job_id}.'
+            }), 404
 
-    if success:
         return jsonify({
             'status': 'success',
-            'message': f'Datos cargados exitosamente. {records_inserted} registros insertados.',
-            'records_inserted': records_inserted
+            'job': job.to_dict()
         }), 200
-    else:
+    except Exception as e:
+        print(f"Error al consultar el trabajo de carga: {e}")
         return jsonify({
             'status': 'error',
-            'message': 'Error al cargar los datos en la base de datos. Consulta los logs del servidor.'
+            'message': f'Error al consultar el trabajo de carga: {str(e)}'
         }), 500
 
+def _approx_requested():
+    """True si la petición pide la respuesta aproximada (approx=true) basada en sketches."""
+    return request.args.get('approx', 'false').lower() in ('1', 'true', 'yes')
+
+def _approx_sketches():
+    """
+    Sketches de la versión actual si la petición pide approx=true, o None.
+    utils.sketches (NumPy y pandas) solo se importa entonces.
+    """
+    if not _approx_requested():
+        return None
+    from utils.sketches import get_sketches
+    return get_sketches()
+
+def _columnar_snapshot():
+    """
+    Instantánea columnar si ANALYTICS_ENGINE='columnar', o None para responder con SQL.
+    utils.columnar (NumPy y pandas) solo se importa con el motor activo.
+    """
+    if current_app.config['ANALYTICS_ENGINE'] != 'columnar':
+        return None
+    from utils.columnar import get_snapshot
+    return get_snapshot()
+
+def _get_bounded_int_arg(name, default, minimum, maximum):
+    """Lee un parámetro entero de la query string y lo acota a [minimum, maximum]."""
+    value = request.args.get(name, default, type=int)
+    if value is None:
+        value = default
+    return max(minimum, min(value, maximum))
+
+def _get_sales_page(after, limit, shape):
+    """
+    Devuelve una página de ventas usando paginación por cursor (keyset) sobre row_id.
+    A diferencia de OFFSET, el costo no crece con la posición de la página porque
+    PostgreSQL salta directamente al row_id indicado usando el índice único.
+    """
+    query = sales_select().where(Sales.row_id.isnot(None))
+    if after is not None:
+        query = query.where(Sales.row_id > after)
+    page = db.session.execute(query.limit(limit)).all()
+
+    rows = format_rows(page)
+    # Solo hay siguiente página si esta vino completa
+    next_cursor = page[-1].row_id if len(page) == limit else None
+
+    payload = {
+        'status': 'success',
+        'count': len(rows),
+        'limit': limit,
+        'after': after,
+        'next_cursor': next_cursor
+    }
+    if shape == 'columnar':
+        payload['columns'] = SALES_KEYS
+        payload['rows'] = rows
+    else:
+        payload['data'] = rows_to_records(rows)
+    return Response(dumps(payload), mimetype='application/json'), 200
+
+def _iter_sales_chunks(chunk_size):
+    """
+    Recorre toda la tabla 'sales' con un cursor del lado del servidor y devuelve bloques
+    de filas ya formateadas. yield_per hace que se pidan chunk_size filas cada vez
+    (stream_results), por lo que nunca hay más de un bloque en memoria.
+    """
+    result = db.session.execute(sales_select().execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield format_rows(partition)
+
+def _stream_sales_json(chunk_size, shape):
+    """Genera la respuesta JSON de forma incremental, codificando un bloque de filas a la vez."""
+    if shape == 'columnar':
+        yield b'{"status":"success","columns":' + dumps(SALES_KEYS) + b',"rows":['
+    else:
+        yield b'{"status":"success","data":['
+    count = 0
+    for rows in _iter_sales_chunks(chunk_size):
+        if not rows:
+            continue
+        if count:
+            yield b','
+        yield encode_chunk(rows, shape)
+        count += len(rows)
+    yield b'],"count":%d}' % count
+
+def _stream_sales_ndjson(chunk_size, shape):
+    """
+    Genera una fila JSON por línea (NDJSON), ideal para clientes que procesan en streaming.
+    En formato columnar la primera línea trae los nombres de las columnas y cada fila es un array.
+    """
+    if shape == 'columnar':
+        yield dumps({'columns': SALES_KEYS}) + b'\n'
+    for rows in _iter_sales_chunks(chunk_size):
+        items = rows if shape == 'columnar' else rows_to_records(rows)
+        if items:
+            yield b'\n'.join(dumps(item) for item in items) + b'\n'
+
 @sales_bp.route('/api/data/all', methods=['GET'])
+@conditional_route
+@statement_timeout('DB_BULK_STATEMENT_TIMEOUT_MS')
 def get_all_sales_data():
     """
-    Endpoint para obtener todos los registros de ventas desde la base de datos.
+    Endpoint para obtener los registros de ventas desde la base de datos.
+
+    Modos disponibles:
+    - Paginación por cursor: si se envía 'limit' o 'after', devuelve una página
+      ordenada por row_id junto con 'next_cursor' para pedir la siguiente.
+    - Streaming (por defecto): recorre toda la tabla con un cursor del lado del servidor
+      y envía el JSON por bloques. Con 'format=ndjson' envía una fila por línea.
+    En ambos casos la memoria por petición se mantiene constante sin importar el tamaño de la tabla.
+    Con 'shape=columnar' la respuesta es {"columns": [...], "rows": [[...]]}, sin repetir
+    las claves en cada fila (respuesta mucho más pequeña).
     """
     try:
-        all_sales = Sales.query.all()
-        sales_list = [sale.to_dict() for sale in all_sales]
+        shape = request.args.get('shape', 'records').lower()
+        if shape not in RESPONSE_SHAPES:
+            return jsonify({
+                'status': 'error',
+                'message': f"Forma de respuesta no soportada: '{shape}'. Usa {', '.join(RESPONSE_SHAPES)}."
+            }), 400
 
-        return jsonify({
-            'status': 'success',
-            'count': len(sales_list),
-            'data': sales_list
-        }), 200
+        if 'limit' in request.args or 'after' in request.args:
+            limit = _get_bounded_int_arg(
+                'limit',
+                current_app.config['API_PAGE_SIZE_DEFAULT'],
+                1,
+                current_app.config['API_PAGE_SIZE_MAX']
+            )
+            after = request.args.get('after', None, type=int)
+            return _get_sales_page(after, limit, shape)
+
+        chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+        output_format = request.args.get('format', 'json').lower()
+        if output_format == 'ndjson':
+            return Response(
+                stream_with_context(_stream_sales_ndjson(chunk_size, shape)),
+                mimetype='application/x-ndjson'
+            )
+        if output_format != 'json':
+            return jsonify({
+                'status': 'error',
+                'message': f"Formato no soportado: '{output_format}'. Usa 'json' o 'ndjson'."
+            }), 400
+
+        return Response(
+            stream_with_context(_stream_sales_json(chunk_size, shape)),
+            mimetype='application/json'
+        )
     except Exception as e:
         print(f"Error al obtener todos los datos de ventas: {e}")
         return jsonify({
@@ -63,16 +295,34 @@ def get_all_sales_data():
         }), 500
 
 @sales_bp.route('/api/analytics/summary', methods=['GET'])
+@conditional_route
+@cached_route('summary', {'approx': (str, 'false')})
 def get_sales_summary():
     """
     Endpoint para obtener un resumen de ventas (ej. total de ventas, total de ganancias).
+    Los cinco agregados se calculan en una sola consulta (un único recorrido de la tabla).
+    Con ANALYTICS_ENGINE='columnar' se responde desde la instantánea en memoria.
+    Con approx=true los totales salen de los sketches de la última carga (exactos) y los
+    distintos de HyperLogLog, con su intervalo de confianza del 95 % en 'error_bounds'
+    y 'approx': true. Si no hay sketches se responde en modo exacto, sin 'approx'.
     """
     try:
-        total_sales = db.session.query(func.sum(Sales.sales)).scalar()
-        total_profit = db.session.query(func.sum(Sales.profit)).scalar()
-        total_quantity = db.session.query(func.sum(Sales.quantity)).scalar()
-        total_orders = db.session.query(func.count(distinct(Sales.order_id))).scalar()
-        total_customers = db.session.query(func.count(distinct(Sales.customer_id))).scalar()
+        sketches = _approx_sketches()
+        if sketches is not None:
+            from utils.sketches import approx_summary
+            return jsonify({'status': 'success', 'approx': True, **approx_summary(sketches)}), 200
+
+        snapshot = _columnar_snapshot()
+        if snapshot is not None:
+            return jsonify({'status': 'success', 'summary': snapshot.summary()}), 200
+
+        total_sales, total_profit, total_quantity, total_orders, total_customers = db.session.query(
+            func.sum(Sales.sales),
+            func.sum(Sales.profit),
+            func.sum(Sales.quantity),
+            func.count(distinct(Sales.order_id)),
+            func.count(distinct(Sales.customer_id))
+        ).one()
 
         return jsonify({
             'status': 'success',
@@ -92,20 +342,38 @@ def get_sales_summary():
         }), 500
 
 @sales_bp.route('/api/analytics/categories', methods=['GET'])
+@conditional_route
+@cached_route('categories')
 def get_sales_by_category():
     """
     Endpoint para obtener las ventas, ganancias y cantidad vendida por categoría de producto.
+    Con ANALYTICS_ENGINE='columnar' se agregan desde la instantánea en memoria; si no, y los
+    rollups están al día, desde 'sales_rollup_monthly' en lugar de 'sales'.
     """
     try:
-        # Usando 'Sales.category' que es el nombre de la columna en tu modelo Sales
-        category_sales = db.session.query(
-            Sales.category, # ¡CORREGIDO!
-            func.sum(Sales.sales).label('total_sales'),
-            func.sum(Sales.profit).label('total_profit'),
-            func.sum(Sales.quantity).label('total_quantity_sold')
-        ).group_by(Sales.category) \
-        .order_by(func.sum(Sales.sales).desc()) \
-        .all()
+        snapshot = _columnar_snapshot()
+        if snapshot is not None:
+            return jsonify({"status": "success", "categories": snapshot.categories()}), 200
+
+        if rollups_ready():
+            category_sales = db.session.query(
+                SalesMonthlyRollup.category,
+                func.sum(SalesMonthlyRollup.total_sales).label('total_sales'),
+                func.sum(SalesMonthlyRollup.total_profit).label('total_profit'),
+                func.sum(SalesMonthlyRollup.total_quantity).label('total_quantity_sold')
+            ).group_by(SalesMonthlyRollup.category) \
+            .order_by(func.sum(SalesMonthlyRollup.total_sales).desc()) \
+            .all()
+        else:
+            # Usando 'Sales.category' que es el nombre de la columna en tu modelo Sales
+            category_sales = db.session.query(
+                Sales.category, # ¡CORREGIDO!
+                func.sum(Sales.sales).label('total_sales'),
+                func.sum(Sales.profit).label('total_profit'),
+                func.sum(Sales.quantity).label('total_quantity_sold')
+            ).group_by(Sales.category) \
+            .order_by(func.sum(Sales.sales).desc()) \
+            .all()
 
         results = []
         for category_row in category_sales:
@@ -129,19 +397,36 @@ def get_sales_by_category():
         }), 500
 
 @sales_bp.route('/api/analytics/regions', methods=['GET'])
+@conditional_route
+@cached_route('regions')
 def get_regional_performance():
     """
     Endpoint para obtener el rendimiento (ventas y ganancias) por región.
+    Con ANALYTICS_ENGINE='columnar' se agregan desde la instantánea en memoria; si no, y los
+    rollups están al día, desde 'sales_rollup_monthly' en lugar de 'sales'.
     """
     try:
-        # Usando 'Sales.region' que es el nombre de la columna en tu modelo Sales
-        regional_performance = db.session.query(
-            Sales.region, # ¡CORREGIDO!
-            func.sum(Sales.sales).label('total_sales'),
-            func.sum(Sales.profit).label('total_profit')
-        ).group_by(Sales.region) \
-        .order_by(func.sum(Sales.sales).desc()) \
-        .all()
+        snapshot = _columnar_snapshot()
+        if snapshot is not None:
+            return jsonify({"status": "success", "regions": snapshot.regions()}), 200
+
+        if rollups_ready():
+            regional_performance = db.session.query(
+                SalesMonthlyRollup.region,
+                func.sum(SalesMonthlyRollup.total_sales).label('total_sales'),
+                func.sum(SalesMonthlyRollup.total_profit).label('total_profit')
+            ).group_by(SalesMonthlyRollup.region) \
+            .order_by(func.sum(SalesMonthlyRollup.total_sales).desc()) \
+            .all()
+        else:
+            # Usando 'Sales.region' que es el nombre de la columna en tu modelo Sales
+            regional_performance = db.session.query(
+                Sales.region, # ¡CORREGIDO!
+                func.sum(Sales.sales).label('total_sales'),
+                func.sum(Sales.profit).label('total_profit')
+            ).group_by(Sales.region) \
+            .order_by(func.sum(Sales.sales).desc()) \
+            .all()
 
         results = []
         for region_row in regional_performance: # Renombrado para claridad
@@ -164,23 +449,53 @@ def get_regional_performance():
         }), 500
 
 @sales_bp.route('/api/analytics/customers', methods=['GET'])
+@conditional_route
+@cached_route('customers', {'limit': (int, 10), 'approx': (str, 'false')})
 def get_top_customers():
     """
     Endpoint para obtener los principales clientes por total gastado, con un límite opcional.
+    Con ANALYTICS_ENGINE='columnar' se agregan desde la instantánea en memoria; si no, y los
+    rollups están al día, se leen de 'sales_rollup_customers' (ya agregada por cliente).
+    Con approx=true se leen del sketch de heavy hitters (sin total_orders): cada cliente trae
+    total_spent (cota superior), total_spent_error y si está garantizado en el top real.
     """
     try:
         limit = request.args.get('limit', 10, type=int)
-        
-        # Usando 'Sales.customer_id' y 'Sales.customer_name' de tu modelo Sales
-        top_customers = db.session.query(
-            Sales.customer_id,
-            Sales.customer_name, # Incluido según tu modelo
-            func.sum(Sales.sales).label('total_spent'),
-            func.count(distinct(Sales.order_id)).label('total_orders')
-        ).group_by(Sales.customer_id, Sales.customer_name) \
-        .order_by(func.sum(Sales.sales).desc()) \
-        .limit(limit) \
-        .all()
+
+        sketches = _approx_sketches()
+        if sketches is not None:
+            from utils.sketches import approx_top
+            customers, error_bounds = approx_top(
+                sketches, 'top_customers', limit, 'customer_id', 'customer_name', 'total_spent'
+            )
+            return jsonify({
+                "status": "success", "approx": True, "customers": customers, "error_bounds": error_bounds
+            }), 200
+
+        snapshot = _columnar_snapshot()
+        if snapshot is not None:
+            return jsonify({"status": "success", "customers": snapshot.customers(limit)}), 200
+
+        if rollups_ready():
+            top_customers = db.session.query(
+                CustomerRollup.customer_id,
+                CustomerRollup.customer_name,
+                CustomerRollup.total_spent,
+                CustomerRollup.total_orders
+            ).order_by(CustomerRollup.total_spent.desc()) \
+            .limit(limit) \
+            .all()
+        else:
+            # Usando 'Sales.customer_id' y 'Sales.customer_name' de tu modelo Sales
+            top_customers = db.session.query(
+                Sales.customer_id,
+                Sales.customer_name, # Incluido según tu modelo
+                func.sum(Sales.sales).label('total_spent'),
+                func.count(distinct(Sales.order_id)).label('total_orders')
+            ).group_by(Sales.customer_id, Sales.customer_name) \
+            .order_by(func.sum(Sales.sales).desc()) \
+            .limit(limit) \
+            .all()
 
         results = []
         for customer_row in top_customers: # Renombrado para claridad
@@ -204,23 +519,53 @@ def get_top_customers():
         }), 500
 
 @sales_bp.route('/api/analytics/products', methods=['GET'])
+@conditional_route
+@cached_route('products', {'limit': (int, 10), 'approx': (str, 'false')})
 def get_top_products():
     """
     Endpoint para obtener los principales productos por ventas, con un límite opcional.
+    Con ANALYTICS_ENGINE='columnar' se agregan desde la instantánea en memoria; si no, y los
+    rollups están al día, se leen de 'sales_rollup_products' (ya agregada por producto).
+    Con approx=true se leen del sketch de heavy hitters (sin total_quantity_sold): cada producto
+    trae total_sales (cota superior), total_sales_error y si está garantizado en el top real.
     """
     try:
         limit = request.args.get('limit', 10, type=int)
 
-        # Usando 'Sales.product_id' y 'Sales.product_name' de tu modelo Sales
-        top_products = db.session.query(
-            Sales.product_id,
-            Sales.product_name, # Incluido según tu modelo
-            func.sum(Sales.sales).label('total_sales'),
-            func.sum(Sales.quantity).label('total_quantity_sold')
-        ).group_by(Sales.product_id, Sales.product_name) \
-        .order_by(func.sum(Sales.sales).desc()) \
-        .limit(limit) \
-        .all()
+        sketches = _approx_sketches()
+        if sketches is not None:
+            from utils.sketches import approx_top
+            products, error_bounds = approx_top(
+                sketches, 'top_products', limit, 'product_id', 'product_name', 'total_sales'
+            )
+            return jsonify({
+                "status": "success", "approx": True, "products": products, "error_bounds": error_bounds
+            }), 200
+
+        snapshot = _columnar_snapshot()
+        if snapshot is not None:
+            return jsonify({"status": "success", "products": snapshot.products(limit)}), 200
+
+        if rollups_ready():
+            top_products = db.session.query(
+                ProductRollup.product_id,
+                ProductRollup.product_name,
+                ProductRollup.total_sales,
+                ProductRollup.total_quantity_sold
+            ).order_by(ProductRollup.total_sales.desc()) \
+            .limit(limit) \
+            .all()
+        else:
+            # Usando 'Sales.product_id' y 'Sales.product_name' de tu modelo Sales
+            top_products = db.session.query(
+                Sales.product_id,
+                Sales.product_name, # Incluido según tu modelo
+                func.sum(Sales.sales).label('total_sales'),
+                func.sum(Sales.quantity).label('total_quantity_sold')
+            ).group_by(Sales.product_id, Sales.product_name) \
+            .order_by(func.sum(Sales.sales).desc()) \
+            .limit(limit) \
+            .all()
 
         results = []
         for product_row in top_products: # Renombrado para claridad
@@ -243,11 +588,150 @@ def get_top_products():
             "message": "Error interno del servidor al obtener top productos."
         }), 500
 
+@sales_bp.route('/api/analytics/query', methods=['GET'])
+@conditional_route
+@cached_route('query', {
+    name: (str, '') for name in
+    ('dimensions', 'measures', 'start_date', 'end_date', 'order_by', 'limit') + FILTER_COLUMNS
+})
+def get_analytics_query():
+    """
+    Endpoint de consulta genérica: agrupa por las dimensiones pedidas y calcula las medidas
+    sobre las filas que cumplen los filtros, todo en una sola consulta SQL.
+    Parámetros (query string):
+    - dimensions: category, sub_category, region, segment, state, ship_mode, month
+    - measures: sales, profit, quantity, orders, customers (por defecto: sales)
+    - start_date / end_date: rango de order_date (YYYY-MM-DD, inclusivo)
+    - category, sub_category, region, segment, state, ship_mode: valores separados por comas
+    - order_by: dimensión o medida, con '-' para orden descendente; limit: máximo de filas
+    """
+    try:
+        spec = parse_query_args(request.args, current_app.config['ANALYTICS_QUERY_MAX_ROWS'])
+    except QueryValidationError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    try:
+        use_rollup = can_use_rollup(spec) and rollups_ready()
+        rows = run_analytics_query(spec, use_rollup)
+
+        return jsonify({
+            'status': 'success',
+            'dimensions': spec['dimensions'],
+            'measures': spec['measures'],
+            'source': 'rollup' if use_rollup else 'sales',
+            'count': len(rows),
+            'rows': rows
+        }), 200
+    except Exception as e:
+        print(f"Error al ejecutar la consulta de analítica: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Error interno del servidor al ejecutar la consulta de analítica.'
+        }), 500
+
+@sales_bp.route('/api/analytics/timeseries', methods=['GET'])
+@conditional_route
+@cached_route('timeseries', {
+    name: (str, '') for name in
+    ('bucket', 'split_by', 'start_date', 'end_date', 'limit') + FILTER_COLUMNS
+})
+def get_analytics_timeseries():
+    """
+    Endpoint de series temporales sobre order_date: ventas, ganancias y cantidad por periodo,
+    con acumulados y crecimiento respecto al periodo anterior calculados en SQL.
+    Parámetros (query string):
+    - bucket: day, week, month, quarter, year (por defecto: month)
+    - split_by: dimensión opcional para obtener una serie por valor (p. ej. region)
+    - start_date / end_date y filtros por columna, igual que /api/analytics/query
+    """
+    try:
+        spec = parse_timeseries_args(request.args, current_app.config['ANALYTICS_TIMESERIES_MAX_POINTS'])
+    except QueryValidationError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    try:
+        use_rollup = can_use_rollup_for_timeseries(spec) and rollups_ready()
+        points = run_timeseries_query(spec, use_rollup)
+
+        return jsonify({
+            'status': 'success',
+            'bucket': spec['bucket'],
+            'split_by': spec['split_by'],
+            'source': 'rollup' if use_rollup else 'sales',
+            'count': len(points),
+            'points': points
+        }), 200
+    except Exception as e:
+        print(f"Error al calcular la serie temporal: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': 'Error interno del servidor al calcular la serie temporal.'
+        }), 500
+
+@sales_bp.route('/api/data/export', methods=['GET'])
+@conditional_route
+@statement_timeout('DB_BULK_STATEMENT_TIMEOUT_MS')
+def export_sales_data():
+    """
+    Endpoint para descargar la tabla 'sales' completa (o filtrada) como archivo.
+    Parámetros (query string):
+    - format: parquet, arrow (Arrow IPC stream) o csv (por defecto: parquet)
+    - start_date / end_date y filtros por columna, igual que /api/analytics/query
+    Parquet y Arrow conservan los tipos (fechas, decimales, enteros), por lo que el cliente
+    no tiene que volver a parsear texto. El archivo se genera y envía por lotes.
+    """
+    export_format = request.args.get('format', 'parquet').lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({
+            'status': 'error',
+            'message': f"Formato no soportado: '{export_format}'. Usa {', '.join(EXPORT_FORMATS)}."
+        }), 400
+
+    try:
+        filters, start_date, end_date = parse_filters(request.args)
+    except QueryValidationError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    try:
+        body = stream_export(
+            export_format, filters, start_date, end_date,
+            current_app.config['EXPORT_BATCH_SIZE']
+        )
+    except ExportUnavailableError as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        }), 501
+
+    try:
+        mimetype, extension = EXPORT_FORMATS[export_format]
+        return Response(
+            stream_with_context(body),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename=sales.{extension}'}
+        )
+    except Exception as e:
+        print(f"Error al exportar los datos de ventas: {e}")
+        return jsonify({
+            'status': 'error',
+            'message': f'Error al exportar los datos de ventas: {str(e)}'
+        }), 500
+
 @sales_bp.route('/api/database/info', methods=['GET'])
 def get_database_info():
     """
     Endpoint para obtener información de la base de datos PostgreSQL.
-    Muestra la versión de PostgreSQL, el conteo de registros y el tamaño de la tabla.
+    Muestra la versión de PostgreSQL, el conteo de registros y el tamaño de la tabla,
+    además del estado del pool de conexiones de este proceso (checkouts y tiempos de espera).
     """
     try:
         record_count = Sales.query.count()
@@ -271,7 +755,9 @@ def get_database_info():
             'total_records_in_sales_table': record_count,
             'sales_table_size': table_size,
             'recent_activity_last_hour': recent_activity_count,
-            'connection_status': 'active'
+            'connection_status': 'active',
+            'external_pooler': current_app.config['DB_EXTERNAL_POOLER'],
+            'pool': pool_status()
         }), 200
     except Exception as e:
         print(f"Error al obtener información de la base de datos: {e}")
@@ -279,4 +765,22 @@ def get_database_info():
             'status': 'error',
             'message': f'Error al obtener información de la base de datos: {str(e)}. Verifica la conexión a PostgreSQL.',
             'connection_status': 'failed'
-        }), 500
\ No newline at end of file
+        }), 500
+
+@sales_bp.route('/api/cache/stats', methods=['GET'])
+def get_cache_stats():
+    """
+    Endpoint para consultar el estado de la caché de respuestas:
+    backend en uso y aciertos/fallos de este worker.
+    """
+    cache = get_cache()
+    if cache is None:
+        return jsonify({
+            'status': 'success',
+            'cache': {'backend': 'none'}
+        }), 200
+
+    return jsonify({
+        'status': 'success',
+        'cache': cache.stats()
+    }), 200
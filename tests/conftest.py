@@ -0,0 +1,58 @@
+# tests/conftest.py
+# Fixtures comunes: aplicación sobre un SQLite temporal (la configuración se lee del entorno al
+# importar config.py, así que las variables se fijan antes de importar la aplicación).
+import os
+import tempfile
+import pandas as pd
+import pytest
+
+_data_dir = tempfile.mkdtemp(prefix='sales_tests_')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_data_dir, 'tests.sqlite')}"
+os.environ['CACHE_BACKEND'] = 'none'
+os.environ['CACHE_WARM_ENABLED'] = 'false'
+os.environ['ANALYTICS_ENGINE'] = 'sql'
+os.environ['LOAD_WORKERS'] = '1'
+os.environ['LOAD_REJECTS_DIR'] = os.path.join(_data_dir, 'rejects')
+
+from app import create_app  # noqa: E402
+from benchmarks.generate_data import generate_csv  # noqa: E402
+from models import db, import_all_models  # noqa: E402
+from utils.data_loader import DataLoader  # noqa: E402
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app()
+
+@pytest.fixture
+def database(app):
+    """Contexto de aplicación con todas las tablas vacías."""
+    with app.app_context():
+        import_all_models()
+        db.drop_all()
+        db.create_all()
+        yield db
+        db.session.remove()
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    """
+    Devuelve write(frame, name): escribe un CSV con la forma de Superstore en tmp_path.
+    El DataFrame base (sales_csv.frame) son 300 filas sintéticas leídas como texto.
+    """
+    source = generate_csv(300, str(tmp_path / 'superstore.csv'), seed=7)
+
+    def write(frame, name='data.csv'):
+        path = tmp_path / name
+        frame.to_csv(path, index=False)
+        return str(path)
+
+    write.frame = pd.read_csv(source, dtype=str, keep_default_na=False)
+    return write
+
+def load(path, mode='full', **options):
+    """Carga el CSV con DataLoader, comprueba que terminó bien y devuelve sus estadísticas."""
+    delete_missing = options.pop('delete_missing', False)
+    loader = DataLoader(path, **options)
+    success, _ = loader.load_csv_to_database(mode, delete_missing=delete_missing)
+    assert success, loader.error
+    return loader.stats
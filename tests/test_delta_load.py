@@ -0,0 +1,58 @@
+# tests/test_delta_load.py
+# Cargas incrementales (mode='delta'): detección de cambios por row_hash y delete_missing.
+from sqlalchemy import func, select
+from models.sales import Sales
+from tests.conftest import load
+
+def _row_ids(db):
+    return set(db.session.execute(select(Sales.row_id)).scalars())
+
+def test_unchanged_file_with_other_batch_size_updates_nothing(database, sales_csv):
+    frame = sales_csv.frame.copy()
+    # Un bloque con importes enteros se lee como int64 y no como float64
+    frame.loc[:4, ['Sales', 'Discount', 'Profit']] = ['100', '0', '5']
+    path = sales_csv(frame)
+    load(path)
+
+    for batch_size in (1, 5, 7, 50000):
+        stats = load(path, 'delta', batch_size=batch_size)
+        assert (stats['inserted'], stats['updated'], stats['unchanged']) == (0, 0, len(frame))
+
+def test_changed_and_new_rows_are_upserted(database, sales_csv):
+    frame = sales_csv.frame
+    load(sales_csv(frame.iloc[:-10]))
+
+    changed = frame.copy()
+    changed.loc[:2, 'Sales'] = '12345.67'
+    stats = load(sales_csv(changed, 'changed.csv'), 'delta')
+
+    assert (stats['inserted'], stats['updated'], stats['deleted']) == (10, 3, 0)
+    amount = database.session.execute(
+        select(Sales.sales).where(Sales.row_id == int(frame.loc[0, 'RowID']))
+    ).scalar()
+    assert float(amount) == 12345.67
+
+def test_delete_missing_keeps_rows_whose_line_was_rejected(database, sales_csv):
+    frame = sales_csv.frame
+    load(sales_csv(frame))
+
+    delta = frame.iloc[:-2].copy()
+    delta.loc[20, 'OrderDate'] = 'not-a-date'
+    stats = load(sales_csv(delta, 'delta.csv'), 'delta', delete_missing=True)
+
+    assert stats['rejected'] == 1
+    assert stats['deleted'] == 2
+    assert int(frame.loc[20, 'RowID']) in _row_ids(database)
+    assert _row_ids(database) == {int(row_id) for row_id in frame['RowID'].iloc[:-2]}
+
+def test_delete_missing_is_skipped_when_a_rejected_row_id_is_unreadable(database, sales_csv):
+    frame = sales_csv.frame
+    load(sales_csv(frame))
+
+    delta = frame.iloc[:-2].copy()
+    delta.loc[20, 'RowID'] = 'abc'
+    stats = load(sales_csv(delta, 'delta.csv'), 'delta', delete_missing=True)
+
+    assert stats['delete_skipped']
+    assert stats['deleted'] == 0
+    assert database.session.execute(select(func.count()).select_from(Sales)).scalar() == len(frame)
@@ -0,0 +1,20 @@
+# tests/test_validation.py
+# Validación vectorizada de cada bloque del CSV (DataLoader.validate_and_prepare).
+import pandas as pd
+from utils.data_loader import DataLoader
+
+def test_rows_with_invalid_values_are_rejected_with_their_reasons(sales_csv):
+    frame = sales_csv.frame.iloc[:6].copy()
+    frame.loc[1, 'Quantity'] = '2.5'
+    frame.loc[2, 'Quantity'] = ''
+    frame.loc[3, 'OrderDate'] = '13/45/2015'
+    frame.loc[4, 'City'] = 'x' * 60
+    chunk = pd.read_csv(sales_csv(frame), dtype={'Postal Code': str})
+
+    valid, rejects = DataLoader.validate_and_prepare(chunk)
+
+    assert valid['row_id'].tolist() == [int(frame.loc[0, 'RowID']), int(frame.loc[5, 'RowID'])]
+    assert rejects['reason'].tolist() == [
+        'non_integer_quantity', 'missing_quantity', 'invalid_order_date', 'too_long_city'
+    ]
+    assert rejects['csv_row'].tolist() == [2, 3, 4, 5]
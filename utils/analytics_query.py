@@ -0,0 +1,316 @@
+# utils/analytics_query.py
+# Consultas de analítica genéricas: dimensiones, medidas y filtros validados contra listas blancas
+# y compilados en una sola consulta GROUP BY.
+import calendar
+from datetime import datetime, date
+from decimal import Decimal
+from sqlalchemy import select, func, distinct, cast, Float
+from models import db
+from models.sales import Sales
+from models.rollups import SalesMonthlyRollup
+from utils.date_buckets import month_start, date_bucket, DATE_BUCKETS
+
+# Dimensiones por las que se puede agrupar. 'month' es el mes de order_date.
+DIMENSIONS = ('category', 'sub_category', 'region', 'segment', 'state', 'ship_mode', 'month')
+
+# Medidas disponibles y su agregación sobre la tabla 'sales'
+MEASURES = {
+    'sales': lambda: func.sum(Sales.sales),
+    'profit': lambda: func.sum(Sales.profit),
+    'quantity': lambda: func.sum(Sales.quantity),
+    'orders': lambda: func.count(distinct(Sales.order_id)),
+    'customers': lambda: func.count(distinct(Sales.customer_id)),
+}
+
+# Columnas que admiten filtro por igualdad (lista de valores separados por comas)
+FILTER_COLUMNS = ('category', 'sub_category', 'region', 'segment', 'state', 'ship_mode')
+
+# Equivalencias con la tabla de rollups mensuales (solo medidas sumables)
+ROLLUP_DIMENSIONS = {
+    'category': SalesMonthlyRollup.category,
+    'sub_category': SalesMonthlyRollup.sub_category,
+    'region': SalesMonthlyRollup.region,
+    'segment': SalesMonthlyRollup.segment,
+    'month': SalesMonthlyRollup.order_month,
+}
+ROLLUP_MEASURES = {
+    'sales': lambda: func.sum(SalesMonthlyRollup.total_sales),
+    'profit': lambda: func.sum(SalesMonthlyRollup.total_profit),
+    'quantity': lambda: func.sum(SalesMonthlyRollup.total_quantity),
+}
+
+# Medidas enteras (SUM de BIGINT devuelve NUMERIC en PostgreSQL)
+INTEGER_MEASURES = ('quantity', 'orders', 'customers')
+
+# Medidas de las series temporales (todas sumables)
+TIMESERIES_MEASURES = ('sales', 'profit', 'quantity')
+
+DATE_FORMAT = '%Y-%m-%d'
+DEFAULT_MEASURES = ('sales',)
+
+class QueryValidationError(ValueError):
+    """Parámetros de consulta no válidos (se responde con 400)."""
+
+def _split(value):
+    """Convierte 'a,b, c' en ['a', 'b', 'c'] ignorando elementos vacíos."""
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+def _parse_date(args, name):
+    """Lee una fecha YYYY-MM-DD de la query string."""
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date()
+    except ValueError:
+        raise QueryValidationError(f"'{name}' debe tener el formato YYYY-MM-DD")
+
+def parse_filters(args):
+    """Lee los filtros por columna y el rango de order_date comunes a todas las consultas."""
+    filters = {name: _split(args.get(name)) for name in FILTER_COLUMNS if _split(args.get(name))}
+
+    start_date = _parse_date(args, 'start_date')
+    end_date = _parse_date(args, 'end_date')
+    if start_date and end_date and start_date > end_date:
+        raise QueryValidationError("'start_date' no puede ser posterior a 'end_date'")
+
+    return filters, start_date, end_date
+
+def parse_query_args(args, max_limit):
+    """
+    Valida los parámetros de /api/analytics/query y devuelve la especificación de la consulta.
+    Solo se aceptan dimensiones, medidas y filtros de las listas blancas.
+    """
+    dimensions = _split(args.get('dimensions'))
+    measures = _split(args.get('measures')) or list(DEFAULT_MEASURES)
+
+    invalid = [d for d in dimensions if d not in DIMENSIONS]
+    if invalid:
+        raise QueryValidationError(
+            f"Dimensiones no válidas: {', '.join(invalid)}. Permitidas: {', '.join(DIMENSIONS)}"
+        )
+    invalid = [m for m in measures if m not in MEASURES]
+    if invalid:
+        raise QueryValidationError(
+            f"Medidas no válidas: {', '.join(invalid)}. Permitidas: {', '.join(MEASURES)}"
+        )
+    if len(set(dimensions)) != len(dimensions) or len(set(measures)) != len(measures):
+        raise QueryValidationError('Las dimensiones y medidas no pueden repetirse')
+
+    filters, start_date, end_date = parse_filters(args)
+
+    order_by = args.get('order_by') or ''
+    descending = order_by.startswith('-')
+    order_field = order_by.lstrip('-')
+    if order_field and order_field not in dimensions + measures:
+        raise QueryValidationError("'order_by' debe ser una de las dimensiones o medidas solicitadas")
+
+    limit = args.get('limit', max_limit, type=int) or max_limit
+    limit = max(1, min(limit, max_limit))
+
+    return {
+        'dimensions': dimensions,
+        'measures': measures,
+        'filters': filters,
+        'start_date': start_date,
+        'end_date': end_date,
+        'order_field': order_field,
+        'descending': descending,
+        'limit': limit,
+    }
+
+def apply_filters(query, filters, start_date, end_date, filter_columns=None, date_column=Sales.order_date):
+    """
+    Añade a la consulta los filtros por columna (IN) y el rango de fechas.
+    Por defecto se filtra sobre las columnas de la tabla 'sales'.
+    """
+    if filter_columns is None:
+        filter_columns = {name: getattr(Sales, name) for name in FILTER_COLUMNS}
+    for name, values in filters.items():
+        query = query.where(filter_columns[name].in_(values))
+    if start_date:
+        query = query.where(date_column >= start_date)
+    if end_date:
+        query = query.where(date_column <= end_date)
+    return query
+
+def _is_month_aligned(start_date, end_date):
+    """True si el rango de fechas cubre meses completos (condición para usar el rollup mensual)."""
+    if start_date and start_date.day != 1:
+        return False
+    if end_date and end_date.day != calendar.monthrange(end_date.year, end_date.month)[1]:
+        return False
+    return True
+
+def can_use_rollup(spec):
+    """Indica si la consulta se puede responder desde 'sales_rollup_monthly'."""
+    return (
+        all(d in ROLLUP_DIMENSIONS for d in spec['dimensions'])
+        and all(m in ROLLUP_MEASURES for m in spec['measures'])
+        and all(f in ROLLUP_DIMENSIONS for f in spec['filters'])
+        and _is_month_aligned(spec['start_date'], spec['end_date'])
+    )
+
+def build_query(spec, use_rollup=False):
+    """
+    Compila la especificación en una única sentencia SELECT ... GROUP BY.
+    Los filtros se aplican directamente sobre las columnas (sin funciones),
+    de modo que PostgreSQL puede usar los índices de order_date, region, segment y category.
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    if use_rollup:
+        dimension_columns = {name: ROLLUP_DIMENSIONS[name] for name in spec['dimensions']}
+        measure_columns = {name: ROLLUP_MEASURES[name]() for name in spec['measures']}
+        filter_columns = ROLLUP_DIMENSIONS
+        date_column = SalesMonthlyRollup.order_month
+    else:
+        dimension_columns = {
+            name: month_start(Sales.order_date, dialect_name) if name == 'month' else getattr(Sales, name)
+            for name in spec['dimensions']
+        }
+        measure_columns = {name: MEASURES[name]() for name in spec['measures']}
+        filter_columns = {name: getattr(Sales, name) for name in FILTER_COLUMNS}
+        date_column = Sales.order_date
+
+    labeled = {name: expression.label(name) for name, expression in {**dimension_columns, **measure_columns}.items()}
+    query = apply_filters(
+        select(*labeled.values()),
+        spec['filters'], spec['start_date'], spec['end_date'], filter_columns, date_column
+    )
+
+    if dimension_columns:
+        query = query.group_by(*dimension_columns.values())
+
+    if spec['order_field']:
+        order_column = labeled[spec['order_field']]
+        query = query.order_by(order_column.desc() if spec['descending'] else order_column.asc())
+    elif dimension_columns:
+        query = query.order_by(*dimension_columns.values())
+
+    return query.limit(spec['limit'])
+
+def _format_value(name, value):
+    """Convierte los valores de la base de datos en tipos serializables a JSON."""
+    if value is None:
+        return 0 if name in MEASURES else None
+    if name == 'month':
+        # PostgreSQL devuelve date; SQLite, un texto 'YYYY-MM-DD'
+        return value.strftime('%Y-%m') if isinstance(value, date) else str(value)[:7]
+    if name in INTEGER_MEASURES:
+        return int(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def run_analytics_query(spec, use_rollup=False):
+    """Ejecuta la consulta y devuelve una lista de diccionarios {dimension/medida: valor}."""
+    result = db.session.execute(build_query(spec, use_rollup))
+    columns = list(result.keys())
+    return [
+        {name: _format_value(name, value) for name, value in zip(columns, row)}
+        for row in result
+    ]
+
+def parse_timeseries_args(args, max_points):
+    """
+    Valida los parámetros de /api/analytics/timeseries: periodo (bucket), dimensión
+    opcional para separar series (split_by), filtros y rango de fechas.
+    """
+    bucket = (args.get('bucket') or 'month').lower()
+    if bucket not in DATE_BUCKETS:
+        raise QueryValidationError(f"'bucket' debe ser uno de: {', '.join(DATE_BUCKETS)}")
+
+    split_by = args.get('split_by') or None
+    split_dimensions = [d for d in DIMENSIONS if d != 'month']
+    if split_by is not None and split_by not in split_dimensions:
+        raise QueryValidationError(f"'split_by' debe ser uno de: {', '.join(split_dimensions)}")
+
+    filters, start_date, end_date = parse_filters(args)
+
+    limit = args.get('limit', max_points, type=int) or max_points
+    limit = max(1, min(limit, max_points))
+
+    return {
+        'bucket': bucket,
+        'split_by': split_by,
+        'dimensions': [split_by] if split_by else [],
+        'measures': list(TIMESERIES_MEASURES),
+        'filters': filters,
+        'start_date': start_date,
+        'end_date': end_date,
+        'limit': limit,
+    }
+
+def can_use_rollup_for_timeseries(spec):
+    """Las series por mes, trimestre o año se pueden calcular desde el rollup mensual."""
+    return spec['bucket'] in ('month', 'quarter', 'year') and can_use_rollup(spec)
+
+def build_timeseries_query(spec, use_rollup=False):
+    """
+    Agrupa por periodo (y por split_by si se pidió) en una subconsulta y, sobre ella,
+    calcula con funciones de ventana el acumulado de cada medida y su crecimiento
+    respecto al periodo anterior de la misma serie: (actual - anterior) / |anterior|.
+    """
+    dialect_name = db.session.get_bind().dialect.name
+    if use_rollup:
+        date_column = SalesMonthlyRollup.order_month
+        filter_columns = ROLLUP_DIMENSIONS
+        split_column = ROLLUP_DIMENSIONS[spec['split_by']] if spec['split_by'] else None
+        measure_columns = {name: ROLLUP_MEASURES[name]() for name in spec['measures']}
+    else:
+        date_column = Sales.order_date
+        filter_columns = {name: getattr(Sales, name) for name in FILTER_COLUMNS}
+        split_column = getattr(Sales, spec['split_by']) if spec['split_by'] else None
+        measure_columns = {name: MEASURES[name]() for name in spec['measures']}
+
+    period = date_bucket(date_column, spec['bucket'], dialect_name)
+    group_columns = [period.label('period')]
+    if split_column is not None:
+        group_columns.append(split_column.label(spec['split_by']))
+
+    grouped = select(
+        *group_columns,
+        *[expression.label(name) for name, expression in measure_columns.items()]
+    ).where(date_column.isnot(None))
+    grouped = apply_filters(
+        grouped, spec['filters'], spec['start_date'], spec['end_date'], filter_columns, date_column
+    )
+    grouped = grouped.group_by(period, *([split_column] if split_column is not None else [])).subquery()
+
+    partition = [grouped.c[spec['split_by']]] if spec['split_by'] else None
+    columns = [grouped.c.period]
+    if spec['split_by']:
+        columns.append(grouped.c[spec['split_by']])
+    for name in spec['measures']:
+        current = grouped.c[name]
+        previous = func.lag(current).over(partition_by=partition, order_by=grouped.c.period)
+        columns.append(current)
+        columns.append(func.sum(current).over(partition_by=partition, order_by=grouped.c.period)
+                       .label(f'running_{name}'))
+        columns.append((cast(current - previous, Float) / func.nullif(func.abs(cast(previous, Float)), 0))
+                       .label(f'{name}_growth'))
+
+    order = ([grouped.c[spec['split_by']]] if spec['split_by'] else []) + [grouped.c.period]
+    return select(*columns).order_by(*order).limit(spec['limit'])
+
+def _format_timeseries_value(name, value):
+    """Convierte los valores de una fila de la serie temporal en tipos serializables a JSON."""
+    if name == 'period':
+        # PostgreSQL devuelve date; SQLite, un texto 'YYYY-MM-DD'
+        return value.isoformat() if isinstance(value, date) else str(value)
+    if name.endswith('_growth'):
+        return round(float(value), 6) if value is not None else None
+    if name in INTEGER_MEASURES or name == 'running_quantity':
+        return int(value) if value is not None else 0
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+def run_timeseries_query(spec, use_rollup=False):
+    """Ejecuta la serie temporal y devuelve una lista de puntos (diccionarios)."""
+    result = db.session.execute(build_timeseries_query(spec, use_rollup))
+    columns = list(result.keys())
+    return [
+        {name: _format_timeseries_value(name, value) for name, value in zip(columns, row)}
+        for row in result
+    ]
@@ -0,0 +1,130 @@
+# utils/async_db.py
+# Pool de conexiones asíncrono (asyncpg) del modo ASGI. Cada worker de uvicorn tiene el suyo,
+# independiente del pool de SQLAlchemy que usan las rutas síncronas del mismo proceso.
+import asyncio
+import time
+from collections import namedtuple
+from contextvars import ContextVar
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects.postgresql.asyncpg import dialect as asyncpg_dialect
+
+try:
+    import asyncpg # Driver asíncrono de PostgreSQL (solo en el modo ASGI)
+except ImportError:
+    asyncpg = None
+
+# Sentencia ya compilada a SQL de asyncpg ($1, $2...), nombres de sus parámetros en orden
+# y valores de los parámetros fijados en la propia sentencia (p. ej. DatasetVersion.id == 1)
+CompiledStatement = namedtuple('CompiledStatement', ['sql', 'params', 'defaults'])
+
+_DIALECT = asyncpg_dialect()
+
+# Consultas y segundos en la base de datos de la petición en curso (las tareas de
+# asyncio.gather heredan el contexto, así que las consultas en paralelo también cuentan)
+_request_db_stats = ContextVar('request_db_stats', default=None)
+
+def compile_statement(statement):
+    """Compila una sentencia de SQLAlchemy Core una sola vez para ejecutarla con asyncpg."""
+    compiled = statement.compile(dialect=_DIALECT)
+    return CompiledStatement(str(compiled), tuple(compiled.positiontup or ()), compiled.params)
+
+def track_db_stats():
+    """Empieza a contar las consultas de la petición en curso y devuelve el contador."""
+    stats = {'queries': 0, 'seconds': 0.0}
+    _request_db_stats.set(stats)
+    return stats
+
+def async_db_available(config):
+    """True si el modo ASGI puede consultar la base de datos con asyncpg (solo PostgreSQL)."""
+    return asyncpg is not None and config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql')
+
+def build_pool_options(config):
+    """
+    Parámetros de asyncpg.create_pool a partir de SQLALCHEMY_DATABASE_URI y de las mismas
+    opciones DB_* que el pool síncrono. Admite sockets Unix con '?host=/ruta'.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    host = url.host or url.query.get('host')
+    if isinstance(host, tuple):
+        host = host[0]
+    server_settings = {'application_name': config['DB_APPLICATION_NAME']}
+    options = {
+        'host': host,
+        'port': url.port,
+        'user': url.username,
+        'password': url.password,
+        'database': url.database,
+        'timeout': config['DB_CONNECT_TIMEOUT'],
+        'min_size': config['ASYNC_DB_POOL_MIN_SIZE'],
+        'max_size': config['ASYNC_DB_POOL_MAX_SIZE'],
+        'max_inactive_connection_lifetime': config['DB_POOL_RECYCLE'],
+        'server_settings': server_settings,
+    }
+    if config['DB_EXTERNAL_POOLER']:
+        # pgbouncer (modo transaction) no conserva prepared statements con nombre entre
+        # transacciones ni acepta parámetros de sesión al conectar: statement_timeout va con SET LOCAL
+        options['statement_cache_size'] = 0
+    elif config['DB_STATEMENT_TIMEOUT_MS']:
+        server_settings['statement_timeout'] = str(config['DB_STATEMENT_TIMEOUT_MS'])
+    return options
+
+class AsyncDatabase:
+    """
+    Pool asyncpg del proceso. Se abre al arrancar el worker (evento lifespan de ASGI) o, si el
+    servidor no envía lifespan, con la primera consulta. Cada consulta toma una conexión solo
+    mientras se ejecuta, así que varias consultas de una petición pueden ir en paralelo.
+    """
+    def __init__(self, config):
+        self.options = build_pool_options(config)
+        self.acquire_timeout = config['DB_POOL_TIMEOUT']
+        # Con pooler externo el límite de tiempo se aplica en cada transacción
+        self.local_timeout_ms = config['DB_STATEMENT_TIMEOUT_MS'] if config['DB_EXTERNAL_POOLER'] else 0
+        self.pool = None
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        """Abre el pool si no está abierto."""
+        async with self._lock:
+            if self.pool is None:
+                started = time.perf_counter()
+                self.pool = await asyncpg.create_pool(**self.options)
+                print(f"🔌 Pool asyncpg listo en {(time.perf_counter() - started) * 1000:.0f} ms "
+                      f"({self.options['min_size']}-{self.options['max_size']} conexiones)")
+        return self.pool
+
+    async def close(self):
+        """Cierra el pool (al apagar el worker)."""
+        async with self._lock:
+            if self.pool is not None:
+                await self.pool.close()
+                self.pool = None
+
+    async def fetch(self, statement, **params):
+        """Ejecuta una CompiledStatement y devuelve sus filas (asyncpg.Record)."""
+        pool = self.pool or await self.start()
+        args = [params[name] if name in params else statement.defaults[name] for name in statement.params]
+        async with pool.acquire(timeout=self.acquire_timeout) as connection:
+            started = time.perf_counter()
+            try:
+                if not self.local_timeout_ms:
+                    return await connection.fetch(statement.sql, *args)
+                async with connection.transaction(readonly=True):
+                    await connection.execute(f'SET LOCAL statement_timeout = {int(self.local_timeout_ms)}')
+                    return await connection.fetch(statement.sql, *args)
+            finally:
+                stats = _request_db_stats.get()
+                if stats is not None:
+                    stats['queries'] += 1
+                    stats['seconds'] += time.perf_counter() - started
+
+    async def fetchrow(self, statement, **params):
+        """Primera fila de la consulta o None."""
+        rows = await self.fetch(statement, **params)
+        return rows[0] if rows else None
+
+    def status(self):
+        """Conexiones abiertas y libres del pool (o None si aún no se abrió)."""
+        if self.pool is None:
+            return None
+        return {'size': self.pool.get_size(), 'idle': self.pool.get_idle_size(),
+                'max_size': self.pool.get_max_size()}
@@ -0,0 +1,462 @@
+# utils/cache.py
+# Caché de respuestas para las rutas de analítica, con backends intercambiables.
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+from flask import current_app, request, Response
+from utils.dataset_version import (
+    current_dataset_version, dataset_updated_at, forget_dataset_version, is_pending_dataset_state
+)
+
+class BaseCache:
+    """
+    Interfaz común de los backends de caché. Guarda bytes bajo una clave de texto
+    con un tiempo de vida, y lleva la cuenta de aciertos y fallos de este proceso.
+    """
+    backend_name = 'base'
+    shared = False # True si la comparten todos los workers (sqlite, redis)
+
+    def __init__(self, default_ttl):
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Devuelve el valor guardado o None si no existe o expiró."""
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Guarda el valor durante ttl segundos (o el TTL por defecto)."""
+        self._set(key, value, ttl if ttl is not None else self.default_ttl)
+
+    def peek(self, key):
+        """Como get, pero sin contar acierto ni fallo (para esperar a otro cálculo)."""
+        return self._get(key)
+
+    def add(self, key, value, ttl):
+        """Guarda el valor solo si la clave no existe o expiró, de forma atómica. True si lo guardó."""
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Elimina una entrada (no falla si no existe)."""
+        raise NotImplementedError
+
+    def clear(self):
+        """Elimina todas las entradas."""
+        raise NotImplementedError
+
+    def stats(self):
+        """Contadores de aciertos y fallos de este proceso."""
+        total = self.hits + self.misses
+        return {
+            'backend': self.backend_name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None
+        }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value, ttl):
+        raise NotImplementedError
+
+class MemoryCache(BaseCache):
+    """
+    Caché LRU en memoria del proceso, con tamaño máximo y expiración por TTL.
+    Cada worker de Gunicorn tiene su propia copia.
+    """
+    backend_name = 'memory'
+
+    def __init__(self, default_ttl, max_entries):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict() # clave -> (valor, instante de expiración)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key) # Marca la entrada como usada recientemente
+            return value
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            # Expulsa las entradas menos usadas recientemente si se supera el tamaño máximo
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                return False
+        self._set(key, value, ttl)
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCache(BaseCache):
+    """
+    Caché compartida entre todos los workers de la máquina mediante un archivo SQLite local.
+    Sirve también como sustituto local de Redis cuando no hay uno disponible.
+    """
+    backend_name = 'sqlite'
+    shared = True
+
+    def __init__(self, default_ttl, max_entries, path):
+        super().__init__(default_ttl)
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _connect(self):
+        """Abre la conexión en cada proceso (las conexiones SQLite no sobreviven a un fork)."""
+        if self._connection is None or self._pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS response_cache '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)'
+            )
+            connection.commit()
+            self._connection = connection
+            self._pid = os.getpid()
+        return self._connection
+
+    def _get(self, key):
+        with self._lock:
+            row = self._connect().execute(
+                'SELECT value FROM response_cache WHERE key = ? AND expires_at > ?',
+                (key, time.time())
+            ).fetchone()
+        return bytes(row[0]) if row else None
+
+    def _set(self, key, value, ttl):
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                'INSERT OR REPLACE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, time.time() + ttl)
+            )
+            # Limpia lo expirado y, si se supera el tamaño máximo, lo que expira antes
+            connection.execute('DELETE FROM response_cache WHERE expires_at <= ?', (time.time(),))
+            connection.execute(
+                'DELETE FROM response_cache WHERE key IN ('
+                'SELECT key FROM response_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_entries,)
+            )
+            connection.commit()
+
+    def add(self, key, value, ttl):
+        with self._lock:
+            connection = self._connect()
+            # El DELETE abre la transacción de escritura: ningún otro proceso puede insertar en medio
+            connection.execute('DELETE FROM response_cache WHERE key = ? AND expires_at <= ?', (key, time.time()))
+            inserted = connection.execute(
+                'INSERT OR IGNORE INTO response_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, value, time.time() + ttl)
+            ).rowcount
+            connection.commit()
+        return inserted == 1
+
+    def delete(self, key):
+        with self._lock:
+            connection = self._connect()
+            connection.execute('DELETE FROM response_cache WHERE key = ?', (key,))
+            connection.commit()
+
+    def clear(self):
+        with self._lock:
+            connection = self._connect()
+            connection.execute('DELETE FROM response_cache')
+            connection.commit()
+
+class RedisCache(BaseCache):
+    """Caché compartida en Redis (o cualquier servidor compatible). Requiere el paquete 'redis'."""
+    backend_name = 'redis'
+    shared = True
+
+    def __init__(self, default_ttl, url, prefix='sales-dashboard:cache:'):
+        super().__init__(default_ttl)
+        import redis # Dependencia opcional: solo se importa si se usa este backend
+        self._client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _get(self, key):
+        return self._client.get(self.prefix + key)
+
+    def _set(self, key, value, ttl):
+        self._client.set(self.prefix + key, value, ex=max(1, int(ttl)))
+
+    def add(self, key, value, ttl):
+        return bool(self._client.set(self.prefix + key, value, ex=max(1, int(ttl)), nx=True))
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+def create_cache(config):
+    """Crea el backend de caché indicado en la configuración (o None si está desactivada)."""
+    backend = config['CACHE_BACKEND']
+    ttl = config['CACHE_DEFAULT_TTL']
+    if backend == 'memory':
+        return MemoryCache(ttl, config['CACHE_MAX_ENTRIES'])
+    if backend == 'sqlite':
+        return SQLiteCache(ttl, config['CACHE_MAX_ENTRIES'], config['CACHE_SQLITE_PATH'])
+    if backend == 'redis':
+        return RedisCache(ttl, config['CACHE_REDIS_URL'])
+    if backend in ('none', '', None):
+        return None
+    raise ValueError(f"Backend de caché no soportado: '{backend}'")
+
+def init_cache(app):
+    """Registra la caché de respuestas en la aplicación Flask."""
+    app.extensions['response_cache'] = create_cache(app.config)
+
+def get_cache():
+    """Devuelve la caché de la aplicación actual, o None si está desactivada."""
+    return current_app.extensions.get('response_cache')
+
+def invalidate_cache(clear=True):
+    """
+    Se llama tras cada carga de datos: vacía la caché y olvida la versión memorizada
+    en este proceso. Los demás workers verán la nueva versión en cuanto la vuelvan a consultar.
+    Con clear=False (la carga ya calentó la caché con la nueva versión) no se vacía: las
+    entradas de la versión anterior ya no se piden y expiran por su TTL.
+    """
+    forget_dataset_version()
+    cache = get_cache()
+    if cache is not None and clear:
+        try:
+            cache.clear()
+        except Exception as e:
+            print(f"⚠️ No se pudo vaciar la caché de respuestas: {e}")
+
+def cache_key(name, version, arg_specs, args):
+    """
+    Construye la clave de caché a partir del nombre de la ruta, la versión de los datos
+    y los parámetros de la query string (args, un MultiDict) listados en arg_specs
+    ({nombre: (tipo, defecto)}), ya normalizados. Los parámetros no listados se ignoran.
+    """
+    parts = [name, f'v{version}']
+    for arg_name in sorted(arg_specs or {}):
+        arg_type, default = arg_specs[arg_name]
+        parts.append(f'{arg_name}={args.get(arg_name, default, type=arg_type)}')
+    return ':'.join(parts)
+
+def make_cache_key(name, arg_specs):
+    """Clave de caché de la petición actual (ver cache_key)."""
+    return cache_key(name, current_dataset_version(), arg_specs, request.args)
+
+# Single-flight: peticiones simultáneas que no encuentran la misma clave en la caché.
+# La primera calcula la respuesta y las demás esperan a que aparezca en la caché.
+FLIGHT_LOCK_PREFIX = 'lock:'
+FLIGHT_POLL_SECONDS = 0.02
+_flights = {} # clave -> threading.Event del cálculo en curso en este proceso
+_flights_lock = threading.Lock()
+
+def start_flight(cache, key, wait_seconds):
+    """
+    Intenta ser quien calcula la respuesta de key. Dentro del proceso basta con el registro de
+    _flights; con una caché compartida además hay que tomar un lock en ella (dura wait_seconds
+    como máximo, por si el proceso que lo tiene muere). True si hay que calcularla y luego
+    llamar a finish_flight; False si ya la calcula otro hilo o proceso.
+    """
+    with _flights_lock:
+        if key in _flights:
+            return False
+        _flights[key] = threading.Event()
+    if cache.shared:
+        try:
+            if not cache.add(FLIGHT_LOCK_PREFIX + key, b'1', wait_seconds):
+                with _flights_lock:
+                    _flights.pop(key).set()
+                return False
+        except Exception as e:
+            print(f"⚠️ Error tomando el lock de la caché de respuestas: {e}")
+    return True
+
+def finish_flight(cache, key):
+    """Termina el cálculo de key y despierta a quienes lo esperan en este proceso."""
+    if cache.shared:
+        try:
+            cache.delete(FLIGHT_LOCK_PREFIX + key)
+        except Exception as e:
+            print(f"⚠️ Error liberando el lock de la caché de respuestas: {e}")
+    with _flights_lock:
+        event = _flights.pop(key, None)
+    if event is not None:
+        event.set()
+
+def flight_in_progress(cache, key):
+    """True si algún hilo de este proceso u otro proceso está calculando key."""
+    with _flights_lock:
+        if key in _flights:
+            return True
+    return cache.shared and cache.peek(FLIGHT_LOCK_PREFIX + key) is not None
+
+def wait_for_flight(cache, key, wait_seconds):
+    """
+    Espera a que quien calcula key la deje en la caché y devuelve el cuerpo, o None si el
+    cálculo termina sin guardarla (p. ej. un error) o tarda más de wait_seconds.
+    """
+    deadline = time.monotonic() + wait_seconds
+    while time.monotonic() < deadline:
+        with _flights_lock:
+            event = _flights.get(key)
+        if event is not None:
+            # En el mismo proceso se despierta en cuanto termina el cálculo
+            event.wait(min(FLIGHT_POLL_SECONDS * 10, max(0.0, deadline - time.monotonic())))
+        else:
+            time.sleep(FLIGHT_POLL_SECONDS)
+        in_progress = flight_in_progress(cache, key)
+        body = cache.peek(key)
+        if body is not None or not in_progress:
+            return body
+    return None
+
+def cached_route(name, arg_specs=None, ttl=None):
+    """
+    Decorador para rutas JSON: guarda el cuerpo de las respuestas 200 en la caché
+    configurada y lo devuelve directamente mientras no expire ni cambien los datos.
+    Si varias peticiones iguales llegan a la vez sin respuesta en la caché, solo una la
+    calcula y las demás la esperan (hasta CACHE_SINGLE_FLIGHT_WAIT_SECONDS; 0 = desactivado).
+    Un fallo de la caché nunca rompe la ruta: simplemente se calcula la respuesta.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return view(*args, **kwargs)
+
+            # El calentamiento de una versión sin publicar siempre calcula y guarda: una entrada
+            # con esa clave solo puede venir de una carga anterior que no llegó a publicarse
+            if is_pending_dataset_state():
+                return _compute_and_store(cache, make_cache_key(name, arg_specs), ttl, view, args, kwargs)
+
+            try:
+                key = make_cache_key(name, arg_specs)
+                cached_body = cache.get(key)
+            except Exception as e:
+                print(f"⚠️ Error leyendo la caché de respuestas: {e}")
+                return view(*args, **kwargs)
+            if cached_body is not None:
+                return Response(cached_body, status=200, mimetype='application/json')
+
+            wait_seconds = current_app.config['CACHE_SINGLE_FLIGHT_WAIT_SECONDS']
+            if not wait_seconds:
+                return _compute_and_store(cache, key, ttl, view, args, kwargs)
+            try:
+                leader = start_flight(cache, key, wait_seconds)
+                if not leader:
+                    cached_body = wait_for_flight(cache, key, wait_seconds)
+            except Exception as e:
+                print(f"⚠️ Error esperando otra petición igual: {e}")
+                leader, cached_body = False, None
+            if not leader:
+                if cached_body is not None:
+                    return Response(cached_body, status=200, mimetype='application/json')
+                # Quien calculaba falló o tardó demasiado: esta petición la calcula por su cuenta
+                return _compute_and_store(cache, key, ttl, view, args, kwargs)
+
+            try:
+                # Otra petición pudo guardarla entre la lectura y el lock
+                try:
+                    cached_body = cache.peek(key)
+                except Exception as e:
+                    print(f"⚠️ Error leyendo la caché de respuestas: {e}")
+                if cached_body is not None:
+                    return Response(cached_body, status=200, mimetype='application/json')
+                return _compute_and_store(cache, key, ttl, view, args, kwargs)
+            finally:
+                finish_flight(cache, key)
+        return wrapper
+    return decorator
+
+def _compute_and_store(cache, key, ttl, view, args, kwargs):
+    """Ejecuta la ruta y guarda el cuerpo en la caché si es una respuesta 200 completa."""
+    response = current_app.make_response(view(*args, **kwargs))
+    if response.status_code == 200 and not response.is_streamed:
+        try:
+            cache.set(key, response.get_data(), ttl)
+        except Exception as e:
+            print(f"⚠️ Error guardando en la caché de respuestas: {e}")
+    return response
+
+def _is_not_modified(etag, last_modified):
+    """
+    True si el cliente ya tiene la versión actual. If-None-Match tiene prioridad
+    sobre If-Modified-Since, como indica la RFC 9110.
+    """
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+def conditional_route(view):
+    """
+    Decorador para rutas GET cuyo contenido depende solo de los datos publicados.
+    Añade ETag (derivado de la versión de los datos) y Last-Modified (fecha de la última
+    carga), y responde 304 sin cuerpo y sin ejecutar la ruta si el cliente ya tiene
+    esa versión. La versión está memorizada en el proceso, así que un 304 no consulta la base de datos.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            etag = f'sales-v{current_dataset_version()}'
+            updated_at = dataset_updated_at()
+        except Exception as e:
+            print(f"⚠️ Error leyendo la versión de los datos: {e}")
+            return view(*args, **kwargs)
+        # HTTP solo tiene resolución de segundos
+        last_modified = (
+            updated_at.replace(tzinfo=timezone.utc, microsecond=0) if updated_at is not None else None
+        )
+
+        if _is_not_modified(etag, last_modified):
+            response = Response(status=304)
+        else:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        # Débil: el mismo ETag vale para la respuesta comprimida y sin comprimir
+        response.set_etag(etag, weak=True)
+        if last_modified is not None:
+            response.last_modified = last_modified
+        # Los clientes pueden guardar la respuesta, pero deben revalidarla en cada uso
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
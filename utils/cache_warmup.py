@@ -0,0 +1,90 @@
+# utils/cache_warmup.py
+# Calentamiento de la caché de respuestas durante la carga de datos: se ejecutan las rutas de
+# analítica sobre los datos nuevos y sus respuestas quedan en la caché con la clave de esa versión.
+# Así, cuando todos los dashboards piden los datos nuevos a la vez, nadie repite las consultas.
+# Solo tiene sentido con una caché compartida entre workers ('sqlite' o 'redis').
+import time
+from contextlib import nullcontext
+from flask import current_app
+from models import db
+from models.dataset_version import DatasetVersion
+from utils.cache import get_cache
+from utils.dataset_version import pending_dataset_state, forget_dataset_version
+
+# Rutas que se calientan siempre; customers y products se añaden con cada CACHE_WARM_LIMITS
+WARM_URLS = (
+    '/api/analytics/summary',
+    '/api/analytics/categories',
+    '/api/analytics/regions',
+    '/api/analytics/timeseries',
+)
+WARM_LIMIT_URLS = (
+    '/api/analytics/customers?limit={limit}',
+    '/api/analytics/products?limit={limit}',
+)
+
+def warm_urls(config):
+    """URLs que calienta cada carga."""
+    return list(WARM_URLS) + [
+        url.format(limit=limit) for limit in config['CACHE_WARM_LIMITS'] for url in WARM_LIMIT_URLS
+    ]
+
+def _warm_url(app, adapter, url):
+    """
+    Ejecuta la ruta (con sus decoradores, que guardan la respuesta en la caché) dentro de un
+    SAVEPOINT: si una consulta falla, se deshace solo lo suyo y la carga sigue adelante.
+    Devuelve el código de estado.
+    """
+    path, _, query_string = url.partition('?')
+    endpoint, view_args = adapter.match(path, method='GET')
+    savepoint = db.session.begin_nested()
+    try:
+        # Reutiliza el contexto de aplicación de la carga: misma sesión y misma transacción
+        with app.test_request_context(path, query_string=query_string):
+            response = app.make_response(app.view_functions[endpoint](**view_args))
+    except Exception:
+        savepoint.rollback()
+        raise
+    if response.status_code == 200:
+        savepoint.commit()
+    else:
+        savepoint.rollback()
+    return response.status_code
+
+def warm_cache(published=False):
+    """
+    Calcula y guarda en la caché las respuestas de warm_urls.
+    - published=False: para la versión que la transacción actual de db.session está a punto de
+      publicar (después de DatasetVersion.bump); las rutas leen los datos aún sin commit.
+    - published=True: para la versión recién publicada. Las peticiones iguales que lleguen
+      mientras tanto esperan a este cálculo (single-flight) en lugar de repetirlo.
+    Devuelve el número de respuestas guardadas (0 si la caché no es compartida entre workers).
+    """
+    cache = get_cache()
+    if cache is None or not cache.shared:
+        return 0
+    app = current_app._get_current_object()
+    if published:
+        forget_dataset_version() # Este proceso aún puede tener memorizada la versión anterior
+    version, rollups_version, updated_at = db.session.execute(
+        db.select(DatasetVersion.version, DatasetVersion.rollups_version, DatasetVersion.updated_at)
+        .where(DatasetVersion.id == DatasetVersion.SINGLETON_ID)
+    ).one()
+    adapter = app.url_map.bind('localhost')
+    started = time.perf_counter()
+    warmed = 0
+    state = nullcontext() if published else pending_dataset_state(version, rollups_version, updated_at)
+    with state:
+        for url in warm_urls(app.config):
+            try:
+                status = _warm_url(app, adapter, url)
+            except Exception as e:
+                print(f"⚠️ No se pudo calentar {url}: {e}")
+                continue
+            if status == 200:
+                warmed += 1
+            else:
+                print(f"⚠️ No se pudo calentar {url}: respondió {status}")
+    print(f"🔥 Caché calentada para la versión {version}: {warmed} respuestas "
+          f"en {time.perf_counter() - started:.2f}s")
+    return warmed
@@ -0,0 +1,371 @@
+# utils/columnar.py
+# Motor de analítica en memoria: instantánea columnar de 'sales' (arrays de NumPy con las columnas
+# categóricas codificadas por diccionario) guardada en archivos .npy que todos los workers abren
+# con mmap, de modo que el sistema operativo comparte una sola copia en memoria.
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select, func
+from models import db
+from models.sales import Sales
+from models.dataset_version import DatasetVersion
+from utils.dataset_version import current_dataset_version, is_pending_dataset_state
+
+try:
+    import fcntl # Lock entre procesos al construir la instantánea (solo POSIX)
+except ImportError:
+    fcntl = None
+
+# Columnas categóricas codificadas por diccionario (un código int32 por fila)
+DICTIONARY_COLUMNS = ('category', 'region', 'segment', 'state', 'order_id')
+# Clientes y productos se agrupan por (id, nombre), igual que las consultas SQL
+PAIR_COLUMNS = {
+    'customer': ('customer_id', 'customer_name'),
+    'product': ('product_id', 'product_name'),
+}
+# Importes guardados como enteros en unidades de la escala de su Numeric (céntimos para
+# Numeric(10, 2)): las sumas son exactas y coinciden con las de PostgreSQL
+AMOUNT_COLUMNS = ('sales', 'profit')
+
+SNAPSHOT_FORMAT = 1
+META_FILE = 'meta.json'
+DICTIONARIES_FILE = 'dictionaries.json'
+
+# Instantánea abierta por este proceso y construcción en segundo plano en curso
+_snapshot = None
+_lock = threading.Lock()
+_building = set()
+
+class _VersionChanged(Exception):
+    """La tabla cambió mientras se leía para la instantánea."""
+
+def _normalize(value):
+    """Clave de diccionario de un valor: los nulos (None, NaN) se unifican en None, también dentro de parejas."""
+    if isinstance(value, tuple):
+        return tuple(_normalize(item) for item in value)
+    return None if pd.isna(value) else value
+
+class _DictionaryEncoder:
+    """Asigna códigos consecutivos a los valores según aparecen, bloque a bloque."""
+    def __init__(self):
+        self.codes = {}
+
+    def encode(self, values):
+        local_codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        mapping = np.array(
+            [self.codes.setdefault(_normalize(value), len(self.codes)) for value in uniques],
+            dtype='int32'
+        )
+        return mapping[local_codes] if len(mapping) else np.zeros(len(values), dtype='int32')
+
+    @property
+    def values(self):
+        return list(self.codes)
+
+def _amount_scale(column):
+    return Sales.__table__.c[column].type.scale
+
+def _to_units(values, scale):
+    """Importes (Decimal o float, None como 0) a enteros en unidades de 10^-scale."""
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0).to_numpy(dtype='float64')
+    return np.rint(numbers * 10 ** scale).astype('int64')
+
+def _snapshot_dir(base_dir, version):
+    return os.path.join(base_dir, f'v{version}')
+
+def _stored_version():
+    """
+    Versión leída de nuevo de la base de datos. DatasetVersion.current() devolvería el objeto
+    ya cargado en la sesión (identity map) y nunca vería una carga publicada mientras tanto.
+    """
+    return db.session.execute(
+        select(DatasetVersion.version).where(DatasetVersion.id == DatasetVersion.SINGLETON_ID)
+    ).scalar()
+
+def build_snapshot(base_dir, batch_size=100000):
+    """
+    Construye la instantánea de la versión actual de 'sales' en base_dir/v<versión>.
+    Los arrays se escriben directamente en sus .npy (open_memmap), así que la memoria no crece
+    con el tamaño de la tabla. Si la versión cambia mientras se lee (otra carga publicó datos),
+    la instantánea se descarta. Devuelve la versión construida, o None.
+    """
+    row = DatasetVersion.current()
+    version = row.version if row is not None else 0
+    if not version:
+        return None
+    target = _snapshot_dir(base_dir, version)
+    if os.path.exists(os.path.join(target, META_FILE)):
+        return version
+
+    started = time.perf_counter()
+    os.makedirs(base_dir, exist_ok=True)
+    building = f'{target}.tmp-{os.getpid()}-{threading.get_ident()}'
+    shutil.rmtree(building, ignore_errors=True)
+    os.makedirs(building)
+    try:
+        rows = db.session.execute(select(func.count()).select_from(Sales)).scalar()
+        arrays = {}
+        def array(name, dtype):
+            arrays[name] = np.lib.format.open_memmap(
+                os.path.join(building, f'{name}.npy'), mode='w+', dtype=dtype, shape=(rows,)
+            )
+            return arrays[name]
+        for name in DICTIONARY_COLUMNS:
+            array(name, 'int32')
+        for name in PAIR_COLUMNS:
+            array(name, 'int32')
+        for name in AMOUNT_COLUMNS:
+            array(name, 'int64')
+        array('quantity', 'int64')
+        array('order_date', 'datetime64[D]')
+
+        encoders = {name: _DictionaryEncoder() for name in list(DICTIONARY_COLUMNS) + list(PAIR_COLUMNS)}
+        columns = list(DICTIONARY_COLUMNS) + [c for pair in PAIR_COLUMNS.values() for c in pair] \
+            + list(AMOUNT_COLUMNS) + ['quantity', 'order_date']
+        result = db.session.execute(
+            select(*[Sales.__table__.c[c] for c in columns]).execution_options(yield_per=batch_size)
+        )
+        position = 0
+        for partition in result.partitions():
+            end = position + len(partition)
+            if end > rows:
+                raise _VersionChanged()
+            frame = pd.DataFrame.from_records(partition, columns=columns)
+            for name in DICTIONARY_COLUMNS:
+                arrays[name][position:end] = encoders[name].encode(frame[name])
+            for name, (id_column, name_column) in PAIR_COLUMNS.items():
+                # Un código por pareja (id, nombre), como el GROUP BY de las consultas SQL
+                pairs = pd.MultiIndex.from_arrays([frame[id_column], frame[name_column]])
+                arrays[name][position:end] = encoders[name].encode(pairs)
+            for name in AMOUNT_COLUMNS:
+                arrays[name][position:end] = _to_units(frame[name], _amount_scale(name))
+            arrays['quantity'][position:end] = pd.to_numeric(frame['quantity']).fillna(0).to_numpy(dtype='int64')
+            arrays['order_date'][position:end] = pd.to_datetime(frame['order_date']).to_numpy(dtype='datetime64[D]')
+            position = end
+        if position != rows or _stored_version() != version:
+            raise _VersionChanged()
+
+        # COUNT(DISTINCT order_id) por cliente no se puede sumar entre grupos: se precalcula aquí
+        customer_count = len(encoders['customer'].codes)
+        order_count = len(encoders['order_id'].codes)
+        keys = np.unique(arrays['customer'].astype('int64') * max(order_count, 1) + arrays['order_id'])
+        customer_orders = np.bincount(keys // max(order_count, 1), minlength=customer_count)
+        np.save(os.path.join(building, 'customer_orders.npy'), customer_orders.astype('int64'))
+
+        dictionaries = {name: encoders[name].values for name in DICTIONARY_COLUMNS}
+        for name in PAIR_COLUMNS:
+            dictionaries[name] = [list(pair) for pair in encoders[name].values]
+        with open(os.path.join(building, DICTIONARIES_FILE), 'w') as handle:
+            json.dump(dictionaries, handle, default=str)
+        for values in arrays.values():
+            values.flush()
+        arrays.clear()
+
+        meta = {
+            'format': SNAPSHOT_FORMAT,
+            'version': version,
+            'rows': rows,
+            'scales': {name: _amount_scale(name) for name in AMOUNT_COLUMNS},
+            'unique_orders': sum(1 for value in dictionaries['order_id'] if value is not None),
+            'unique_customers': len({pair[0] for pair in dictionaries['customer'] if pair[0] is not None}),
+            'built_at': datetime.utcnow().isoformat(),
+        }
+        # meta.json se escribe al final: un directorio sin él está incompleto
+        with open(os.path.join(building, META_FILE), 'w') as handle:
+            json.dump(meta, handle)
+        try:
+            os.rename(building, target)
+        except OSError:
+            # Otro proceso publicó la misma versión mientras tanto
+            shutil.rmtree(building, ignore_errors=True)
+    except _VersionChanged:
+        shutil.rmtree(building, ignore_errors=True)
+        print(f"⚠️ Los datos cambiaron mientras se construía la instantánea columnar v{version}; se descarta.")
+        return None
+    except BaseException:
+        shutil.rmtree(building, ignore_errors=True)
+        raise
+    finally:
+        db.session.rollback() # Cierra la transacción de lectura
+
+    _remove_old_snapshots(base_dir, version)
+    print(f"🧮 Instantánea columnar v{version} construida ({rows} filas) en {time.perf_counter() - started:.2f}s")
+    return version
+
+def _remove_old_snapshots(base_dir, version):
+    """
+    Borra las instantáneas de versiones anteriores. Los workers que aún las tengan mapeadas
+    siguen leyéndolas sin problema: en POSIX el archivo se libera al cerrar el último mapeo.
+    """
+    for name in os.listdir(base_dir):
+        if name.startswith('v') and name[1:].isdigit() and int(name[1:]) < version:
+            shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+
+class ColumnarSnapshot:
+    """
+    Instantánea abierta en modo solo lectura. Las agregaciones son group-by vectorizados
+    (np.bincount sobre los códigos) y devuelven lo mismo que las rutas SQL de analítica.
+    """
+    def __init__(self, directory):
+        with open(os.path.join(directory, META_FILE)) as handle:
+            self.meta = json.load(handle)
+        with open(os.path.join(directory, DICTIONARIES_FILE)) as handle:
+            self.dictionaries = json.load(handle)
+        self.version = self.meta['version']
+        self.rows = self.meta['rows']
+        self.columns = {
+            name[:-len('.npy')]: np.load(os.path.join(directory, name), mmap_mode='r')
+            for name in os.listdir(directory) if name.endswith('.npy')
+        }
+
+    def _sum_by(self, key, column):
+        """Suma exacta de una columna entera por código (bincount es exacto por debajo de 2^53)."""
+        size = len(self.dictionaries[key])
+        return np.rint(np.bincount(self.columns[key], weights=self.columns[column], minlength=size)).astype('int64')
+
+    def _amount(self, units, column):
+        return units / 10 ** self.meta['scales'][column]
+
+    @staticmethod
+    def _top(totals, limit):
+        """Índices de los limit mayores totales, de mayor a menor."""
+        limit = max(limit, 0)
+        if limit < len(totals):
+            candidates = np.argpartition(-totals, limit)[:limit] if limit else np.array([], dtype='int64')
+        else:
+            candidates = np.arange(len(totals))
+        return candidates[np.argsort(-totals[candidates], kind='stable')]
+
+    def summary(self):
+        return {
+            'total_sales': float(self._amount(int(self.columns['sales'].sum()), 'sales')),
+            'total_profit': float(self._amount(int(self.columns['profit'].sum()), 'profit')),
+            'total_quantity_sold': int(self.columns['quantity'].sum()),
+            'total_unique_orders': self.meta['unique_orders'],
+            'total_unique_customers': self.meta['unique_customers'],
+        }
+
+    def categories(self):
+        sales = self._sum_by('category', 'sales')
+        profit = self._sum_by('category', 'profit')
+        quantity = self._sum_by('category', 'quantity')
+        return [{
+            'category': self.dictionaries['category'][code],
+            'total_sales': float(self._amount(sales[code], 'sales')),
+            'total_profit': float(self._amount(profit[code], 'profit')),
+            'total_quantity_sold': int(quantity[code])
+        } for code in self._top(sales, len(sales))]
+
+    def regions(self):
+        sales = self._sum_by('region', 'sales')
+        profit = self._sum_by('region', 'profit')
+        return [{
+            'region': self.dictionaries['region'][code],
+            'total_sales': float(self._amount(sales[code], 'sales')),
+            'total_profit': float(self._amount(profit[code], 'profit'))
+        } for code in self._top(sales, len(sales))]
+
+    def customers(self, limit):
+        sales = self._sum_by('customer', 'sales')
+        orders = self.columns['customer_orders']
+        results = []
+        for code in self._top(sales, limit):
+            customer_id, customer_name = self.dictionaries['customer'][code]
+            results.append({
+                'customer_id': customer_id,
+                'customer_name': customer_name,
+                'total_spent': float(self._amount(sales[code], 'sales')),
+                'total_orders': int(orders[code])
+            })
+        return results
+
+    def products(self, limit):
+        sales = self._sum_by('product', 'sales')
+        quantity = self._sum_by('product', 'quantity')
+        results = []
+        for code in self._top(sales, limit):
+            product_id, product_name = self.dictionaries['product'][code]
+            results.append({
+                'product_id': product_id,
+                'product_name': product_name,
+                'total_sales': float(self._amount(sales[code], 'sales')),
+                'total_quantity_sold': int(quantity[code])
+            })
+        return results
+
+def _build_locked(base_dir):
+    """Construye la instantánea si ningún otro proceso la está construyendo ya."""
+    os.makedirs(base_dir, exist_ok=True)
+    with open(os.path.join(base_dir, '.build.lock'), 'w') as lock_file:
+        if fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+        return build_snapshot(base_dir)
+
+def _build_in_background(app, version):
+    """Construye la instantánea en un hilo (una sola a la vez por proceso y versión)."""
+    with _lock:
+        if version in _building:
+            return
+        _building.add(version)
+
+    def run():
+        with app.app_context():
+            try:
+                _build_locked(app.config['COLUMNAR_SNAPSHOT_DIR'])
+            except Exception as e:
+                print(f"⚠️ No se pudo construir la instantánea columnar: {e}")
+            finally:
+                db.session.remove()
+                with _lock:
+                    _building.discard(version)
+
+    threading.Thread(target=run, name='columnar-snapshot', daemon=True).start()
+
+def refresh_snapshot():
+    """
+    Construye la instantánea de la versión recién publicada (se llama al terminar una carga).
+    Los fallos no hacen fallar la carga: las rutas siguen usando SQL hasta que exista.
+    """
+    if current_app.config['ANALYTICS_ENGINE'] != 'columnar':
+        return
+    try:
+        _build_locked(current_app.config['COLUMNAR_SNAPSHOT_DIR'])
+    except Exception as e:
+        print(f"⚠️ No se pudo construir la instantánea columnar: {e}")
+
+def get_snapshot():
+    """
+    Instantánea de la versión actual de los datos si ANALYTICS_ENGINE='columnar', o None para
+    que la ruta use SQL. Si aún no existe (p. ej. otro servidor hizo la carga) se construye en
+    segundo plano y mientras tanto las rutas responden con SQL.
+    """
+    global _snapshot
+    if current_app.config['ANALYTICS_ENGINE'] != 'columnar':
+        return None
+    # Una versión sin publicar (calentamiento de la caché) aún no tiene instantánea: responde SQL
+    if is_pending_dataset_state():
+        return None
+    version = current_dataset_version()
+    if not version:
+        return None
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    directory = _snapshot_dir(current_app.config['COLUMNAR_SNAPSHOT_DIR'], version)
+    if not os.path.exists(os.path.join(directory, META_FILE)):
+        _build_in_background(current_app._get_current_object(), version)
+        return None
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = ColumnarSnapshot(directory)
+        return _snapshot
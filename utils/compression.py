@@ -0,0 +1,101 @@
+# utils/compression.py
+# Compresión gzip/brotli de las respuestas según Accept-Encoding, compatible con streaming.
+import gzip
+import zlib
+from flask import current_app, request
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli # Compresión brotli (opcional)
+except ImportError:
+    brotli = None
+
+# Tipos de contenido que vale la pena comprimir (Parquet ya viene comprimido)
+COMPRESSIBLE_MIMETYPES = (
+    'application/json',
+    'application/x-ndjson',
+    'application/vnd.apache.arrow.stream',
+    'text/csv',
+    'text/plain',
+)
+
+def supported_encodings():
+    """Codificaciones disponibles en este proceso, por orden de preferencia."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def _choose_encoding():
+    """Elige la mejor codificación que acepta el cliente, o None si no acepta ninguna."""
+    return request.accept_encodings.best_match(supported_encodings())
+
+def _compress(data, encoding, config):
+    """Comprime un cuerpo completo."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=config['COMPRESS_BROTLI_QUALITY'])
+    return gzip.compress(data, compresslevel=config['COMPRESS_LEVEL'], mtime=0)
+
+def _compress_stream(chunks, encoding, config):
+    """
+    Comprime una respuesta en streaming bloque a bloque. Tras cada bloque se vacía el
+    compresor (sync flush) para que el cliente reciba los datos sin esperar al final.
+    """
+    chunks = (chunk.encode('utf-8') if isinstance(chunk, str) else chunk for chunk in chunks)
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=config['COMPRESS_BROTLI_QUALITY'])
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib
+        compressor = zlib.compressobj(config['COMPRESS_LEVEL'], zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+def compress_body(data, accept_encoding, config):
+    """
+    Comprime un cuerpo completo fuera de Flask (rutas asíncronas del modo ASGI) con las mismas
+    reglas que compress_response. Devuelve (cuerpo, codificación o None si va sin comprimir).
+    """
+    if not config['COMPRESS_ENABLED'] or len(data) < config['COMPRESS_MIN_SIZE']:
+        return data, None
+    encoding = parse_accept_header(accept_encoding).best_match(supported_encodings())
+    if encoding is None:
+        return data, None
+    return _compress(data, encoding, config), encoding
+
+def compress_response(response):
+    """
+    Hook after_request: comprime la respuesta si el cliente lo acepta, el tipo de contenido
+    es comprimible y (para respuestas completas) supera COMPRESS_MIN_SIZE bytes.
+    Las respuestas en streaming se comprimen siempre, sin acumularlas en memoria.
+    """
+    config = current_app.config
+    if not config['COMPRESS_ENABLED']:
+        return response
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers or response.direct_passthrough):
+        return response
+
+    encoding = _choose_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding, config)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(_compress(data, encoding, config))
+
+    response.headers['Content-Encoding'] = encoding
+    return response
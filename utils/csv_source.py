@@ -0,0 +1,127 @@
+# utils/csv_source.py
+# Apertura del CSV de origen como flujo de bytes, sin cargarlo entero en memoria:
+# URLs (descarga en streaming), rutas locales y archivos subidos, sin comprimir, gzip o zip.
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+from contextlib import contextmanager, ExitStack
+from urllib.parse import urlparse
+
+# Tiempo máximo (segundos) para conectar y entre bloques recibidos durante la descarga
+DOWNLOAD_TIMEOUT = (10, 60)
+# Tamaño de cada bloque leído de la red o del disco
+READ_BLOCK_SIZE = 1024 * 1024
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZIP_MAGIC = b'PK\x03\x04'
+
+class CSVSourceError(ValueError):
+    """El origen no se puede leer como CSV (p. ej. un zip sin ningún .csv dentro)."""
+
+class _ResponseStream(io.RawIOBase):
+    """
+    Adapta una respuesta de requests en streaming a un archivo de solo lectura.
+    Se lee con iter_content, que descomprime el Content-Encoding del servidor y convierte
+    los errores de red en excepciones de requests.
+    """
+    def __init__(self, response):
+        super().__init__()
+        self._chunks = response.iter_content(chunk_size=READ_BLOCK_SIZE)
+        self._pending = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            try:
+                self._pending = next(self._chunks)
+            except StopIteration:
+                return 0
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+def _is_url(source):
+    return isinstance(source, str) and urlparse(source).scheme in ('http', 'https')
+
+def _local_path(source):
+    """Ruta local del origen (admite 'file://'), o None si no es una ruta."""
+    if isinstance(source, os.PathLike):
+        return os.fspath(source)
+    if isinstance(source, str):
+        parsed = urlparse(source)
+        if parsed.scheme == 'file':
+            return parsed.path
+        if not parsed.scheme or len(parsed.scheme) == 1: # 'C:\...' en Windows
+            return source
+    return None
+
+def describe_source(source):
+    """Texto corto que identifica el origen en logs y en el trabajo de carga."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return f"upload:{getattr(source, 'filename', None) or getattr(source, 'name', 'stream')}"
+
+def _open_zip_member(seekable):
+    """Abre el primer .csv de un zip (zipfile necesita un archivo con seek)."""
+    archive = zipfile.ZipFile(seekable)
+    members = [name for name in archive.namelist() if name.lower().endswith('.csv')]
+    if not members:
+        raise CSVSourceError('El archivo zip no contiene ningún .csv')
+    if len(members) > 1:
+        print(f"⚠️ El zip contiene {len(members)} archivos .csv; se carga '{members[0]}'")
+    return archive.open(members[0])
+
+def _peek_magic(stream):
+    """Lee los primeros bytes sin consumirlos. Devuelve (bytes, flujo desde el que seguir leyendo)."""
+    if hasattr(stream, 'peek'):
+        return stream.peek(4)[:4], stream
+    if hasattr(stream, 'seekable') and stream.seekable():
+        position = stream.tell()
+        magic = stream.read(4)
+        stream.seek(position)
+        return magic, stream
+    buffered = io.BufferedReader(stream, buffer_size=READ_BLOCK_SIZE)
+    return buffered.peek(4)[:4], buffered
+
+@contextmanager
+def open_csv_source(source):
+    """
+    Abre el origen y entrega un flujo binario con el CSV ya descomprimido.
+    - URL http(s): se descarga en streaming (la descarga avanza a medida que se lee).
+    - Ruta local o 'file://'.
+    - Objeto con read() (p. ej. un FileStorage de Flask).
+    La compresión se detecta por el contenido (gzip o zip), no por la extensión. Un zip
+    que llega por la red se guarda antes en un archivo temporal porque necesita seek.
+    """
+    with ExitStack() as stack:
+        if _is_url(source):
+            import requests # Solo al descargar: las rutas que usan READ_BLOCK_SIZE no lo necesitan
+            response = requests.get(source, stream=True, timeout=DOWNLOAD_TIMEOUT)
+            stack.callback(response.close)
+            response.raise_for_status() # Lanza un error si la solicitud no fue exitosa
+            raw = io.BufferedReader(_ResponseStream(response), buffer_size=READ_BLOCK_SIZE)
+        elif _local_path(source) is not None:
+            raw = stack.enter_context(open(_local_path(source), 'rb', buffering=READ_BLOCK_SIZE))
+        elif hasattr(source, 'read'):
+            raw = getattr(source, 'stream', source) # FileStorage expone el archivo en .stream
+        else:
+            raise CSVSourceError(f'Origen de datos no soportado: {source!r}')
+
+        magic, raw = _peek_magic(raw)
+        if magic.startswith(GZIP_MAGIC):
+            yield stack.enter_context(gzip.GzipFile(fileobj=raw, mode='rb'))
+        elif magic.startswith(ZIP_MAGIC):
+            seekable = raw
+            if not (hasattr(raw, 'seekable') and raw.seekable()):
+                seekable = stack.enter_context(tempfile.TemporaryFile())
+                shutil.copyfileobj(raw, seekable, READ_BLOCK_SIZE)
+                seekable.seek(0)
+            yield stack.enter_context(_open_zip_member(seekable))
+        else:
+            yield raw
@@ -1,130 +1,1013 @@
 # utils/data_loader.py
 import requests
 import pandas as pd
+import numpy as np
+import collections
 import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
 from datetime import datetime
 from models.sales import Sales # Importa el modelo Sales que acabas de crear
 from models import db # Importa la instancia de SQLAlchemy desde models/__init__.py
-from decimal import Decimal # Para manejar números con precisión decimal
-from sqlalchemy import text # Para ejecutar comandos SQL planos
+from models.dataset_version import DatasetVersion
+from models.load_job import LoadJob
+from utils.cache import invalidate_cache
+from utils.cache_warmup import warm_cache
+from utils.rollups import refresh_rollups, RollupChanges
+from utils.csv_source import open_csv_source, describe_source
+from utils.columnar import refresh_snapshot
+from utils.sketches import refresh_sketches, SketchDelta
+from flask import current_app
+from sqlalchemy import text, select, func # Para ejecutar comandos SQL planos
+from sqlalchemy.dialects import postgresql, sqlite
+
+# Mapeo de las columnas del CSV a las columnas de la tabla 'sales'
+CSV_COLUMN_MAP = {
+    'No': 'no',
+    'RowID': 'row_id',
+    'OrderID': 'order_id',
+    'OrderDate': 'order_date',
+    'ShipDate': 'ship_date',
+    'ShipMode': 'ship_mode',
+    'CustomerID': 'customer_id',
+    'CustomerName': 'customer_name',
+    'Segment': 'segment',
+    'Country': 'country',
+    'City': 'city',
+    'State': 'state',
+    'Postal Code': 'postal_code', # ¡Cuidado con el espacio en "Postal Code"!
+    'Region': 'region',
+    'ProductID': 'product_id',
+    'Category': 'category',
+    'Sub-Category': 'sub_category', # ¡Cuidado con el guion en "Sub-Category"!
+    'ProductName': 'product_name',
+    'Sales': 'sales',
+    'Quantity': 'quantity',
+    'Discount': 'discount',
+    'Profit': 'profit',
+}
+
+# Tipos de cada columna de la tabla, usados para limpiar el DataFrame columna por columna
+NULLABLE_INT_COLUMNS = ['no', 'row_id'] # NaN -> NULL
+INT_COLUMNS = ['quantity'] # Obligatorias: un valor vacío rechaza la fila
+DATE_COLUMNS = ['order_date', 'ship_date'] # Formato '%m/%d/%Y', NaN -> NULL
+NUMERIC_COLUMNS = ['sales', 'discount', 'profit'] # NaN -> 0
+TEXT_COLUMNS = [
+    'order_id', 'ship_mode', 'customer_id', 'customer_name', 'segment', 'country',
+    'city', 'state', 'postal_code', 'region', 'product_id', 'category',
+    'sub_category', 'product_name'
+] # NaN -> ''
+
+CSV_DATE_FORMAT = '%m/%d/%Y'
+
+# Límites de validación tomados del modelo: longitud de los String(n), valor absoluto máximo
+# de los Numeric(p, s) y rango de los Integer (32 bits)
+TEXT_MAX_LENGTHS = {
+    column: Sales.__table__.c[column].type.length
+    for column in TEXT_COLUMNS if getattr(Sales.__table__.c[column].type, 'length', None)
+}
+NUMERIC_LIMITS = {
+    column: (10 ** (Sales.__table__.c[column].type.precision - Sales.__table__.c[column].type.scale),
+             Sales.__table__.c[column].type.scale)
+    for column in NUMERIC_COLUMNS
+}
+INTEGER_MAX = 2 ** 31 - 1
+
+# Filas rechazadas que se incluyen como muestra en el resumen de la carga
+REJECTS_SAMPLE_SIZE = 20
+
+# Columnas cuyo contenido forma el hash de cada fila
+CONTENT_COLUMNS = list(CSV_COLUMN_MAP.values())
+
+# Orden de las columnas tal como se envían a la tabla 'sales'
+TABLE_COLUMNS = ['id'] + CONTENT_COLUMNS + ['row_hash', 'created_at', 'updated_at']
+
+# Columnas que no se modifican al actualizar una fila existente en una carga incremental
+UPSERT_KEEP_COLUMNS = ('id', 'row_id', 'created_at')
+
+# Sentencias INSERT con soporte de ON CONFLICT para cada dialecto
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Modos de carga (definidos en LoadJob para validarlos sin importar este módulo)
+LOAD_MODES = LoadJob.MODES
+
+SALES_TABLE = Sales.__tablename__
+# Tabla donde se carga la nueva versión de los datos antes de sustituir a 'sales'
+STAGING_TABLE = f'{SALES_TABLE}_staging'
+# Nombre temporal de la tabla anterior durante el intercambio
+PREVIOUS_TABLE = f'{SALES_TABLE}_previous'
+# Tiempo máximo de espera por los locks del intercambio, para no encolar lecturas detrás de él
+SWAP_LOCK_TIMEOUT = '10s'
+
+# Bloques del CSV que se leen y preparan por adelantado mientras se escribe el actual.
+# La memoria de la carga queda acotada a unos (PREFETCH_CHUNKS + 2) bloques de batch_size filas.
+PREFETCH_CHUNKS = 2
+
+# Los procesos de la carga en paralelo se crean con 'spawn': hacer fork de un worker con hilos
+# y conexiones abiertas puede dejar locks heredados bloqueados en el proceso hijo
+PROCESS_START_METHOD = 'spawn'
+
+def _staging_name(name):
+    """Traduce el nombre de un índice/restricción de 'sales' a su equivalente en la tabla de staging."""
+    return name.replace(SALES_TABLE, STAGING_TABLE, 1)
+
+def _sales_constraints():
+    """
+    Devuelve (nombre, definición SQL) de la clave primaria y las restricciones únicas de 'sales',
+    con los nombres que PostgreSQL les asigna por defecto (sales_pkey, sales_row_id_key).
+    """
+    table = Sales.__table__
+    constraints = [(f'{SALES_TABLE}_pkey',
+                    f"PRIMARY KEY ({', '.join(c.name for c in table.primary_key.columns)})")]
+    for column in table.columns:
+        if column.unique:
+            constraints.append((f'{SALES_TABLE}_{column.name}_key', f'UNIQUE ({column.name})'))
+    return constraints
+
+def _sales_indexes():
+    """Devuelve (nombre, sentencia CREATE INDEX para staging) de cada índice declarado en el modelo Sales."""
+    indexes = []
+    for index in sorted(Sales.__table__.indexes, key=lambda i: i.name):
+        columns = ', '.join(column.name for column in index.columns)
+        unique = 'UNIQUE ' if index.unique else ''
+        # Columnas no clave de los índices de cobertura (postgresql_include)
+        include = index.dialect_options['postgresql']['include']
+        include = f" INCLUDE ({', '.join(include)})" if include else ''
+        indexes.append((index.name,
+                        f'CREATE {unique}INDEX {_staging_name(index.name)} ON {STAGING_TABLE} ({columns}){include}'))
+    return indexes
+
+def _reasons(problems, rejected):
+    """Motivos de rechazo de cada fila rechazada, separados por ';' (p. ej. 'invalid_order_date;too_long_city')."""
+    reasons = pd.Series('', index=np.flatnonzero(rejected))
+    for reason, mask in problems.items():
+        reasons += np.where(mask[rejected], reason + ';', '')
+    return reasons.str.rstrip(';').to_numpy()
+
+def _row_hashes(clean):
+    """
+    Hash de 64 bits del contenido de cada fila, calculado de forma vectorizada sobre los valores
+    tal como quedan en la tabla (importes redondeados a la escala de su Numeric) y con un tipo fijo
+    por columna: pandas infiere int64 o float64 según los valores de cada bloque, y el mismo dato
+    con otro tipo daría otro hash.
+    """
+    canonical = clean[CONTENT_COLUMNS].copy()
+    for column in NULLABLE_INT_COLUMNS:
+        canonical[column] = canonical[column].astype('Int64')
+    for column in INT_COLUMNS:
+        canonical[column] = canonical[column].astype('int64')
+    for column in NUMERIC_COLUMNS:
+        # + 0.0 convierte -0.0 en 0.0, que como float tiene otros bytes
+        canonical[column] = canonical[column].astype('float64').round(NUMERIC_LIMITS[column][1]) + 0.0
+    for column in DATE_COLUMNS:
+        canonical[column] = canonical[column].astype('datetime64[ns]')
+    for column in TEXT_COLUMNS:
+        canonical[column] = canonical[column].astype(object)
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy().view('int64')
+
+def _rejects_frame(raw_rows, reasons):
+    """Filas rechazadas tal como venían en el CSV, con su número de fila de datos (desde 1) y el motivo."""
+    rejects = raw_rows.copy()
+    rejects.insert(0, 'reason', reasons)
+    rejects.insert(0, 'csv_row', raw_rows.index + 1)
+    return rejects
+
+def _copy_payload(batch):
+    """
+    Serializa un bloque ya preparado en el CSV que recibe COPY FROM STDIN.
+    Se usa '\\N' como NULL para distinguir valores nulos de cadenas vacías.
+    """
+    batch = batch.copy()
+    for column in DATE_COLUMNS:
+        batch[column] = batch[column].dt.strftime('%Y-%m-%d')
+    return batch.to_csv(index=False, header=False, na_rep='\\N')
+
+def _copy_text(cursor, payload, table_name):
+    """Envía a PostgreSQL un bloque serializado con _copy_payload."""
+    cursor.copy_expert(
+        f"COPY {table_name} ({', '.join(TABLE_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        io.StringIO(payload)
+    )
+
+def _prefetch(iterable, depth):
+    """
+    Recorre iterable en un hilo aparte y entrega sus elementos a través de una cola de
+    tamaño depth: mientras quien consume escribe un bloque en la base de datos, el hilo ya
+    está descargando y preparando los siguientes. Las excepciones del hilo se relanzan aquí.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(entry):
+        # Si quien consume abandonó (p. ej. por un error al escribir), el hilo no se queda bloqueado
+        while not stop.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(('item', item)):
+                    return
+            put(('done', None))
+        except BaseException as e:
+            put(('error', e))
+
+    thread = threading.Thread(target=produce, name='csv-reader', daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == 'item':
+                yield value
+            elif kind == 'error':
+                raise value
+            else:
+                return
+    finally:
+        stop.set()
+        thread.join()
 
 class DataLoader:
-    def __init__(self, csv_url):
-        self.csv_url = csv_url
+    def __init__(self, source, batch_size=50000, progress_callback=None, build_rollups=None,
+                 workers=None, db_writers=None, rejects_dir=None):
+        # URL http(s), ruta local o archivo subido; puede venir comprimido en gzip o zip
+        self.source = source
+        # Si es None se usa ROLLUPS_ENABLED de la configuración de la aplicación
+        self.build_rollups = build_rollups
+        # Procesos que limpian y tipan los bloques, y conexiones que los escriben con COPY.
+        # Si son None se usan LOAD_WORKERS y LOAD_DB_WRITERS; con 1 proceso la carga es secuencial
+        self.workers = workers
+        self.db_writers = db_writers
+        # Directorio del CSV de filas rechazadas; si es None se usa LOAD_REJECTS_DIR
+        self.rejects_dir = rejects_dir
+        self.batch_size = batch_size # Filas por bloque enviado a la base de datos
+        self.progress_callback = progress_callback # Recibe (fase, filas procesadas) durante la carga
+        self.stats = {} # Estadísticas de la última carga (filas, segundos, filas/seg)
+        self.error = None # Mensaje del último error, si la carga falló
+        self._rows_read = 0 # Filas leídas del CSV en la carga actual
+        self._phase = None # Fase actual y cuándo empezó, para el desglose de tiempos en stats
+        self._phase_started = None
+        self._phase_seconds = {}
+        self._cache_warmed = False # La carga actual guardó en la caché respuestas de su versión
+        self._reset_rejects()
+
+    def _report_progress(self, phase, rows_processed=None):
+        """Notifica la fase actual de la carga a quien la esté siguiendo (p. ej. un trabajo en segundo plano)."""
+        now = time.perf_counter()
+        if phase != self._phase:
+            if self._phase is not None:
+                self._phase_seconds[self._phase] = (
+                    self._phase_seconds.get(self._phase, 0.0) + now - self._phase_started
+                )
+            self._phase, self._phase_started = phase, now
+        if self.progress_callback is not None:
+            self.progress_callback(phase, rows_processed)
+
+    def _read_raw_chunks(self, stream):
+        """Lee el CSV por bloques de batch_size filas, tal como vienen en el archivo."""
+        # 'Postal Code' se lee como texto para no perder ceros a la izquierda
+        with pd.read_csv(stream, dtype={'Postal Code': str}, chunksize=self.batch_size) as reader:
+            for chunk in reader:
+                self._rows_read += len(chunk)
+                yield chunk
+
+    def _reset_rejects(self):
+        """Reinicia el seguimiento de duplicados y filas rechazadas al empezar una carga."""
+        self._seen_row_ids = np.array([], dtype='int64') # row_id ya vistos en el archivo, ordenados
+        self._rejects_path = None
+        self._rejects_total = 0
+        self._rejects_by_reason = {}
+        self._rejects_sample = []
+        # row_id de las filas rechazadas (siguen en el CSV aunque no se carguen) y cuántas
+        # se rechazaron sin un RowID legible; delete_missing no debe borrar ninguna de ellas
+        self._rejected_row_ids = []
+        self._rejects_without_row_id = 0
+
+    def _duplicate_rows(self, row_ids):
+        """
+        Máscara de las filas cuyo row_id ya apareció antes en el archivo (en este bloque o en
+        uno anterior); se conserva la primera aparición. Los row_id vistos se guardan en un
+        array ordenado, así que la búsqueda es vectorizada y la memoria es de 8 bytes por fila.
+        """
+        keyed = row_ids.notna().to_numpy()
+        ids = row_ids[keyed].to_numpy(dtype='int64')
+        duplicated = pd.Series(ids).duplicated().to_numpy().copy()
+        if len(self._seen_row_ids):
+            positions = np.searchsorted(self._seen_row_ids, ids)
+            found = positions < len(self._seen_row_ids)
+            found[found] = self._seen_row_ids[positions[found]] == ids[found]
+            duplicated |= found
+        # Unir dos tramos ordenados con un sort estable (timsort) es prácticamente lineal
+        self._seen_row_ids = np.sort(
+            np.concatenate([self._seen_row_ids, np.unique(ids)]), kind='stable'
+        )
+        mask = np.zeros(len(row_ids), dtype=bool)
+        mask[np.flatnonzero(keyed)[duplicated]] = True
+        return mask
+
+    def _record_rejects(self, rejects):
+        """Añade las filas rechazadas al CSV de rechazos y al resumen de la carga."""
+        if rejects.empty:
+            return
+        if self._rejects_path is None:
+            os.makedirs(self.rejects_dir, exist_ok=True)
+            stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S')
+            self._rejects_path = os.path.join(self.rejects_dir, f'rejects_{stamp}_{uuid.uuid4().hex[:8]}.csv')
+        rejects.to_csv(self._rejects_path, mode='a', index=False, header=(self._rejects_total == 0))
+        self._rejects_total += len(rejects)
+        row_ids = pd.to_numeric(rejects['RowID'], errors='coerce')
+        readable = row_ids.notna() & (row_ids % 1 == 0) & (row_ids.abs() <= INTEGER_MAX)
+        self._rejected_row_ids.append(row_ids[readable].to_numpy(dtype='int64'))
+        self._rejects_without_row_id += int((~readable).sum())
+        for reason, count in rejects['reason'].str.split(';').explode().value_counts().items():
+            self._rejects_by_reason[reason] = self._rejects_by_reason.get(reason, 0) + int(count)
+        missing = REJECTS_SAMPLE_SIZE - len(self._rejects_sample)
+        if missing > 0:
+            sample = rejects.head(missing)
+            self._rejects_sample.extend(sample.astype(object).where(sample.notna(), None).to_dict('records'))
+
+    def _rejects_summary(self):
+        """Resumen de las filas rechazadas para las estadísticas de la carga."""
+        return {
+            'total': self._rejects_total,
+            'by_reason': dict(sorted(self._rejects_by_reason.items())),
+            'file': self._rejects_path,
+            'sample': self._rejects_sample
+        }
+
+    def _finish_chunk(self, chunk, result, row_ids, rejects, for_copy=False):
+        """
+        Paso final de cada bloque, en orden y en un solo hilo: rechaza los row_id repetidos
+        respecto a todo lo leído antes y registra los rechazos. Devuelve el bloque a escribir.
+        """
+        duplicated = self._duplicate_rows(row_ids)
+        if duplicated.any():
+            duplicate_index = row_ids.index[duplicated]
+            rejects = pd.concat([rejects, _rejects_frame(
+                chunk.loc[duplicate_index], np.full(len(duplicate_index), 'duplicate_row_id', dtype=object)
+            )]).sort_values('csv_row')
+            if for_copy:
+                # Caso raro: el bloque ya viene serializado, así que se vuelve a preparar sin los repetidos
+                prepared = self.validate_and_prepare(chunk.drop(index=duplicate_index))[0]
+                result = (len(prepared), _copy_payload(prepared))
+            else:
+                result = result.drop(index=duplicate_index)
+        self._record_rejects(rejects)
+        return result
+
+    def _read_chunks(self, stream):
+        """Lee el CSV por bloques de batch_size filas y los devuelve ya validados y preparados."""
+        for chunk in self._read_raw_chunks(stream):
+            yield self._finish_chunk(chunk, *_prepare_partition(chunk, for_copy=False))
+
+    def _read_chunks_parallel(self, stream, executor, workers, for_copy):
+        """
+        Como _read_chunks, pero cada bloque se valida, limpia y tipa en un proceso del executor
+        (con for_copy=True también se serializa para COPY y se entrega como (filas, texto)).
+        Los resultados se devuelven en el mismo orden que los bloques del archivo, así que la
+        carga produce exactamente las mismas filas que la secuencial; como mucho hay
+        workers + PREFETCH_CHUNKS bloques en vuelo.
+        """
+        pending = collections.deque()
+        for chunk in self._read_raw_chunks(stream):
+            pending.append((chunk, executor.submit(_prepare_partition, chunk, for_copy)))
+            if len(pending) >= workers + PREFETCH_CHUNKS:
+                chunk, future = pending.popleft()
+                yield self._finish_chunk(chunk, *future.result(), for_copy=for_copy)
+        while pending:
+            chunk, future = pending.popleft()
+            yield self._finish_chunk(chunk, *future.result(), for_copy=for_copy)
+
+    def _split(self, records):
+        """Divide un DataFrame ya preparado en bloques de batch_size filas."""
+        for start in range(0, len(records), self.batch_size):
+            yield records.iloc[start:start + self.batch_size]
+
+    @staticmethod
+    def validate_and_prepare(df):
+        """
+        Limpia, tipa y valida el DataFrame del CSV de forma vectorizada (una operación por columna,
+        sin excepciones por fila). Devuelve (filas válidas con los nombres y el orden de columnas de
+        la tabla 'sales', filas rechazadas tal como venían en el CSV con 'csv_row' y 'reason').
+        Una fila se rechaza si tiene una fecha o un número que no se puede interpretar, un número
+        fuera del rango de su columna, un decimal en una columna entera, Quantity vacía o un texto
+        más largo que su String(n). El resto de valores vacíos no son un error: quedan como NULL,
+        0 o '' igual que antes.
+        Ambos DataFrames conservan el índice del bloque (número de fila de datos del CSV - 1).
+        """
+        raw = df
+        df = df.rename(columns=CSV_COLUMN_MAP)
+        clean = pd.DataFrame(index=df.index)
+        problems = {} # motivo -> máscara de filas afectadas
+
+        def check(reason, mask):
+            if mask.any():
+                problems[reason] = mask.to_numpy()
+
+        for column in NULLABLE_INT_COLUMNS + INT_COLUMNS:
+            parsed = pd.to_numeric(df[column], errors='coerce')
+            check(f'invalid_{column}', parsed.isna() & df[column].notna())
+            check(f'out_of_range_{column}', parsed.abs() > INTEGER_MAX)
+            # Un decimal (3.5) no se trunca: la fila se rechaza antes de convertir a entero
+            check(f'non_integer_{column}', parsed.notna() & (parsed % 1 != 0))
+            if column in INT_COLUMNS:
+                check(f'missing_{column}', df[column].isna())
+            # Las filas rechazadas se descartan después; sus valores se anulan para que el cast no falle
+            valid = (parsed.abs() <= INTEGER_MAX) & (parsed % 1 == 0)
+            if column in NULLABLE_INT_COLUMNS:
+                clean[column] = parsed.where(valid).astype('Int64')
+            else:
+                clean[column] = parsed.where(valid).fillna(0).astype('int64')
+        for column in NUMERIC_COLUMNS:
+            parsed = pd.to_numeric(df[column], errors='coerce')
+            limit, scale = NUMERIC_LIMITS[column]
+            check(f'invalid_{column}', parsed.isna() & df[column].notna())
+            check(f'out_of_range_{column}', parsed.round(scale).abs() >= limit)
+            clean[column] = parsed.fillna(0.0).astype('float64')
+
+        for column in DATE_COLUMNS:
+            parsed = pd.to_datetime(df[column], format=CSV_DATE_FORMAT, errors='coerce')
+            # Una fecha presente que no se pudo convertir invalida la fila
+            check(f'invalid_{column}', parsed.isna() & df[column].notna())
+            clean[column] = parsed
+
+        for column in TEXT_COLUMNS:
+            clean[column] = df[column].fillna('').astype(str)
+            if column in TEXT_MAX_LENGTHS:
+                check(f'too_long_{column}', clean[column].str.len() > TEXT_MAX_LENGTHS[column])
+
+        rejected = np.zeros(len(df), dtype=bool)
+        for mask in problems.values():
+            rejected |= mask
+        rejects = _rejects_frame(raw[rejected], _reasons(problems, rejected))
+        clean = clean[~rejected]
+
+        # Las cargas incrementales comparan este hash con el guardado para saber qué filas cambiaron
+        clean['row_hash'] = _row_hashes(clean)
+
+        # Columnas que el modelo rellena con valores por defecto en Python
+        now = datetime.utcnow()
+        clean['id'] = [uuid.uuid4() for _ in range(len(clean))]
+        clean['created_at'] = now
+        clean['updated_at'] = now
+
+        return clean[TABLE_COLUMNS], rejects
+
+    @staticmethod
+    def prepare_dataframe(df):
+        """Como validate_and_prepare, pero devuelve solo las filas válidas."""
+        return DataLoader.validate_and_prepare(df)[0]
+
+    @staticmethod
+    def _dialect_name():
+        """Nombre del dialecto de la base de datos en uso ('postgresql', 'sqlite', ...)."""
+        return db.session.get_bind().dialect.name
+
+    def _copy_batch(self, cursor, batch, table_name):
+        """Envía un bloque del DataFrame a PostgreSQL con COPY FROM STDIN."""
+        _copy_text(cursor, _copy_payload(batch), table_name)
+
+    @staticmethod
+    def _batch_to_records(batch):
+        """Convierte un bloque del DataFrame en diccionarios con tipos de Python (None para nulos)."""
+        batch = batch.copy()
+        for column in DATE_COLUMNS:
+            batch[column] = batch[column].dt.date
+        return batch.astype(object).where(batch.notna(), None).to_dict('records')
+
+    def _insert_batch(self, batch):
+        """Inserta un bloque con executemany (para dialectos sin COPY, p. ej. SQLite)."""
+        db.session.execute(Sales.__table__.insert(), self._batch_to_records(batch))
 
-    def load_csv_to_database(self):
+    def _upsert_batch(self, batch):
         """
-        Descarga un archivo CSV desde una URL y carga sus datos en la tabla 'sales'
-        de PostgreSQL. Limpia la tabla antes de cargar nuevos datos y los inserta en lotes.
+        Inserta o actualiza un bloque con INSERT ... ON CONFLICT (row_id) DO UPDATE.
+        Las filas existentes conservan su id y created_at.
         """
+        dialect_name = self._dialect_name()
+        if dialect_name not in UPSERT_INSERTS:
+            raise ValueError(f"La carga incremental no está soportada en '{dialect_name}'")
+        insert_statement = UPSERT_INSERTS[dialect_name](Sales.__table__)
+        statement = insert_statement.on_conflict_do_update(
+            index_elements=['row_id'],
+            set_={
+                column: insert_statement.excluded[column]
+                for column in TABLE_COLUMNS if column not in UPSERT_KEEP_COLUMNS
+            }
+        )
+        db.session.execute(statement, self._batch_to_records(batch))
+
+    def _rollups_enabled(self):
+        if self.build_rollups is None:
+            return current_app.config['ROLLUPS_ENABLED']
+        return self.build_rollups
+
+    def _publish(self, source_table_name=SALES_TABLE, rollup_changes=None, sketch_delta=None):
+        """
+        Recalcula los rollups (si están activados), incrementa la versión de los datos y
+        recalcula los sketches de approx=true (si están activados) para esa versión, dentro de
+        la transacción actual, justo antes del commit que publica la carga.
+        En una carga incremental, rollup_changes (RollupChanges) limita los rollups a los grupos
+        que cambiaron y sketch_delta (SketchDelta) combina los sketches en lugar de recalcularlos.
+        """
+        build_rollups = self._rollups_enabled()
+        if build_rollups:
+            self._report_progress('rollups')
+            # Solo se actualizan por partes si los rollups de la versión anterior están al día
+            current = DatasetVersion.current()
+            if (rollup_changes is not None and not rollup_changes.overflowed and current is not None
+                    and current.rollups_version == current.version):
+                rollup_changes.refresh(source_table_name)
+            else:
+                refresh_rollups(source_table_name)
+        version = DatasetVersion.bump(rollups_built=build_rollups)
+        if current_app.config['SKETCHES_ENABLED']:
+            self._report_progress('sketches')
+            if sketch_delta is None:
+                refresh_sketches(source_table_name, version)
+            else:
+                sketch_delta.save(version)
+
+    def _warm_cache(self, published=False):
+        """
+        Calienta la caché con la nueva versión (ver utils/cache_warmup.py): justo antes del commit,
+        con los datos nuevos ya en 'sales' dentro de la transacción, o con published=True justo
+        después (carga con staging, para no alargar los locks del RENAME).
+        """
+        if not current_app.config['CACHE_WARM_ENABLED']:
+            return
+        self._report_progress('warming')
+        if not published:
+            self._cache_warmed = warm_cache() > 0
+            return
+        # La carga ya está publicada: un fallo al calentar no la hace fallar, y después se sigue
+        # invalidando la caché de la versión anterior como en cualquier carga terminada
         try:
-            print("🔄 Descargando datos del CSV...")
-            # Realiza una solicitud HTTP para obtener el contenido del CSV
-            response = requests.get(self.csv_url)
-            response.raise_for_status() # Lanza un error si la solicitud no fue exitosa
+            self._cache_warmed = warm_cache(published=True) > 0
+            db.session.commit() # Cierra la transacción de lectura del calentamiento
+        except Exception as e:
+            db.session.rollback()
+            self._cache_warmed = False
+            print(f"⚠️ Error calentando la caché tras publicar la carga (los datos ya están publicados): {e}")
+
+    def bulk_insert(self, chunks, table_name=SALES_TABLE):
+        """
+        Inserta los datos ya preparados (un DataFrame o un iterable de bloques) en la tabla indicada
+        dentro de la transacción actual (quien llama decide cuándo confirmar). En PostgreSQL usa
+        COPY (psycopg2 copy_expert); en otros dialectos, inserciones masivas sobre 'sales'.
+        Devuelve el número de registros insertados.
+        """
+        if isinstance(chunks, pd.DataFrame):
+            chunks = self._split(chunks)
+        use_copy = self._dialect_name() == 'postgresql'
+        cursor = None
+        if use_copy:
+            # Conexión DBAPI de la sesión actual, para que el COPY participe en la misma transacción
+            cursor = db.session.connection().connection.cursor()
 
-            # Lee el CSV directamente desde el contenido de la respuesta usando pandas
-            csv_data = io.StringIO(response.text)
-            df = pd.read_csv(csv_data)
+        records_inserted = 0
+        for batch in chunks:
+            if use_copy:
+                self._copy_batch(cursor, batch, table_name)
+            else:
+                self._insert_batch(batch)
+            records_inserted += len(batch)
+            print(f"💾 Insertados {records_inserted} registros...")
+            self._report_progress('inserting', records_inserted)
 
-            print(f"📊 CSV cargado en memoria con {len(df)} registros")
+        if cursor is not None:
+            cursor.close()
+        return records_inserted
+
+    def _copy_parallel(self, payloads, table_name, db_writers):
+        """
+        Escribe con COPY los bloques serializados (filas, texto) usando db_writers conexiones
+        del pool en paralelo, cada una en su propia transacción. Solo se usa para la tabla de
+        staging, que nadie lee hasta el intercambio, así que no importa que las conexiones
+        confirmen por separado: si una falla, la carga falla y staging no se publica.
+        Devuelve el número de registros insertados.
+        """
+        engine = db.engine
+        work = queue.Queue(maxsize=db_writers)
+        failed = threading.Event()
+        errors = []
+        written = [0]
+        written_lock = threading.Lock()
 
-            # Limpiar datos existentes en la tabla 'sales'
-            # Usamos TRUNCATE para PostgreSQL, que es más eficiente que DELETE ALL y reinicia los IDs.
+        def write():
+            connection = cursor = None
             try:
-                # 'CASCADE' es importante si hay otras tablas que dependen de 'sales'
-                db.session.execute(text('TRUNCATE TABLE sales RESTART IDENTITY CASCADE'))
-                db.session.commit()
-                print("🗑️ Datos existentes eliminados de la tabla 'sales'")
+                connection = engine.raw_connection()
+                cursor = connection.cursor()
             except Exception as e:
-                # Este error puede ocurrir la primera vez si la tabla está vacía o no existe aún
-                print(f"⚠️ Error limpiando tabla (puede ser normal si la tabla está vacía): {e}")
-                db.session.rollback() # Deshace cualquier cambio si hubo un error
+                errors.append(e)
+                failed.set()
+            while True:
+                payload = work.get()
+                if payload is None:
+                    break
+                if failed.is_set():
+                    continue # Se vacía la cola para que el hilo principal no se quede bloqueado
+                try:
+                    rows, text_block = payload
+                    _copy_text(cursor, text_block, table_name)
+                    with written_lock:
+                        written[0] += rows
+                except Exception as e:
+                    errors.append(e)
+                    failed.set()
+            if connection is None:
+                return
+            try:
+                cursor.close()
+                if failed.is_set():
+                    connection.rollback()
+                else:
+                    connection.commit()
+            except Exception as e:
+                errors.append(e)
+                failed.set()
+            finally:
+                connection.close()
 
-            # Insertar nuevos datos en lotes para mejorar el rendimiento
-            records_inserted = 0
-            batch_size = 500  # Número de registros a insertar en cada lote
-            batch_records = []
+        threads = [
+            threading.Thread(target=write, name=f'copy-writer-{index}', daemon=True)
+            for index in range(db_writers)
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for payload in payloads:
+                if failed.is_set():
+                    break
+                work.put(payload)
+                print(f"💾 Insertados {written[0]} registros...")
+                self._report_progress('inserting', written[0])
+        except BaseException:
+            failed.set()
+            raise
+        finally:
+            for _ in threads:
+                work.put(None)
+            for thread in threads:
+                thread.join()
 
-            print("📦 Preparando datos para la inserción...")
-            for index, row in df.iterrows():
-                try:
-                    # Convertir fechas de string a objetos date de Python
-                    order_date = None
-                    ship_date = None
-
-                    if pd.notna(row['OrderDate']):
-                        order_date = datetime.strptime(str(row['OrderDate']), '%m/%d/%Y').date()
-
-                    if pd.notna(row['ShipDate']):
-                        ship_date = datetime.strptime(str(row['ShipDate']), '%m/%d/%Y').date()
-
-                    # Crear una instancia del modelo Sales con los datos de la fila actual
-                    sales_record = Sales(
-                        no=int(row['No']) if pd.notna(row['No']) else None,
-                        row_id=int(row['RowID']) if pd.notna(row['RowID']) else None,
-                        order_id=str(row['OrderID']) if pd.notna(row['OrderID']) else '',
-                        order_date=order_date,
-                        ship_date=ship_date,
-                        ship_mode=str(row['ShipMode']) if pd.notna(row['ShipMode']) else '',
-                        customer_id=str(row['CustomerID']) if pd.notna(row['CustomerID']) else '',
-                        customer_name=str(row['CustomerName']) if pd.notna(row['CustomerName']) else '',
-                        segment=str(row['Segment']) if pd.notna(row['Segment']) else '',
-                        country=str(row['Country']) if pd.notna(row['Country']) else '',
-                        city=str(row['City']) if pd.notna(row['City']) else '',
-                        state=str(row['State']) if pd.notna(row['State']) else '',
-                        postal_code=str(row['Postal Code']) if pd.notna(row['Postal Code']) else '', # ¡Cuidado con el espacio en "Postal Code"!
-                        region=str(row['Region']) if pd.notna(row['Region']) else '',
-                        product_id=str(row['ProductID']) if pd.notna(row['ProductID']) else '',
-                        category=str(row['Category']) if pd.notna(row['Category']) else '',
-                        sub_category=str(row['Sub-Category']) if pd.notna(row['Sub-Category']) else '', # ¡Cuidado con el guion en "Sub-Category"!
-                        product_name=str(row['ProductName']) if pd.notna(row['ProductName']) else '',
-                        # Convertir a Decimal para los tipos Numeric de la DB
-                        sales=Decimal(str(row['Sales'])) if pd.notna(row['Sales']) else Decimal('0'),
-                        quantity=int(row['Quantity']) if pd.notna(row['Quantity']) else 0,
-                        discount=Decimal(str(row['Discount'])) if pd.notna(row['Discount']) else Decimal('0'),
-                        profit=Decimal(str(row['Profit'])) if pd.notna(row['Profit']) else Decimal('0')
-                    )
+        if errors:
+            raise errors[0]
+        print(f"💾 Insertados {written[0]} registros ({db_writers} conexiones)")
+        self._report_progress('inserting', written[0])
+        return written[0]
 
-                    batch_records.append(sales_record)
-                    records_inserted += 1
+    def _load_via_staging(self, chunks, db_writers=None):
+        """
+        Carga en PostgreSQL sin dejar la tabla 'sales' vacía ni a medias:
+        1. Crea 'sales_staging' con las mismas columnas, sin índices.
+        2. Inserta todo con COPY, bloque a bloque según se lee el CSV. Con db_writers, chunks son
+           bloques ya serializados que se escriben por varias conexiones en paralelo.
+        3. Crea la clave primaria, las restricciones únicas y los índices del modelo de una sola vez
+           (mucho más rápido que mantenerlos fila a fila) y ejecuta VACUUM ANALYZE.
+        4. Intercambia las tablas con RENAME en una única transacción.
+        5. Calienta la caché con la nueva versión ya publicada.
+        Mientras tanto, los endpoints siguen leyendo la versión anterior completa.
+        """
+        self._report_progress('staging')
+        db.session.execute(text(f'DROP TABLE IF EXISTS {STAGING_TABLE}'))
+        db.session.execute(text(f'CREATE TABLE {STAGING_TABLE} (LIKE {SALES_TABLE} INCLUDING DEFAULTS)'))
+        db.session.commit()
+        print(f"🧱 Tabla '{STAGING_TABLE}' creada")
 
-                    # Si el lote alcanza el tamaño definido, inserta los registros y reinicia el lote
-                    if len(batch_records) >= batch_size:
-                        db.session.bulk_save_objects(batch_records) # Inserción masiva
-                        db.session.commit() # Confirma la transacción
-                        print(f"💾 Insertados {records_inserted} registros...")
-                        batch_records = [] # Limpia el lote
+        if db_writers:
+            records_inserted = self._copy_parallel(chunks, STAGING_TABLE, db_writers)
+        else:
+            records_inserted = self.bulk_insert(chunks, STAGING_TABLE)
+        db.session.commit()
 
-                except Exception as e:
-                    # Si hay un error en un registro, lo salta e imprime un mensaje
-                    print(f"❌ Error procesando registro en la fila {index}: {e}. Saltando registro.")
-                    continue # Continúa con el siguiente registro
+        self._report_progress('indexing', records_inserted)
+        for name, definition in _sales_constraints():
+            db.session.execute(text(
+                f'ALTER TABLE {STAGING_TABLE} ADD CONSTRAINT {_staging_name(name)} {definition}'
+            ))
+        for _, statement in _sales_indexes():
+            db.session.execute(text(statement))
+        db.session.commit()
+        print(f"🗂️ Índices creados en '{STAGING_TABLE}'")
+
+        # Actualiza las estadísticas antes de publicar la tabla (importante para el optimizador de consultas).
+        # VACUUM marca todas las páginas como visibles en el visibility map: sin eso los Index Only Scan
+        # de los índices de cobertura tendrían que leer la tabla para cada fila. No admite transacción.
+        self._report_progress('analyzing', records_inserted)
+        with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+            connection.execute(text(f'VACUUM ANALYZE {STAGING_TABLE}'))
+        print(f"✨ Estadísticas de la tabla '{STAGING_TABLE}' actualizadas.")
+
+        # Intercambio atómico: los lectores ven la tabla anterior o la nueva, nunca un estado intermedio.
+        # Los rollups se recalculan desde staging en la misma transacción, antes de tomar los locks del RENAME.
+        self._publish(STAGING_TABLE)
+        self._report_progress('swapping', records_inserted)
+        db.session.execute(text(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}'"))
+        db.session.execute(text(f'ALTER TABLE {SALES_TABLE} RENAME TO {PREVIOUS_TABLE}'))
+        db.session.execute(text(f'ALTER TABLE {STAGING_TABLE} RENAME TO {SALES_TABLE}'))
+        db.session.execute(text(f'DROP TABLE {PREVIOUS_TABLE} CASCADE'))
+        for name, _ in _sales_constraints():
+            db.session.execute(text(
+                f'ALTER TABLE {SALES_TABLE} RENAME CONSTRAINT {_staging_name(name)} TO {name}'
+            ))
+        for name, _ in _sales_indexes():
+            db.session.execute(text(f'ALTER INDEX {_staging_name(name)} RENAME TO {name}'))
+        db.session.commit()
+        print(f"🔁 Tabla '{STAGING_TABLE}' publicada como '{SALES_TABLE}'")
 
-            # Inserta cualquier registro restante en el último lote
-            if batch_records:
-                db.session.bulk_save_objects(batch_records)
-                db.session.commit()
-                print(f"💾 Insertados los últimos {len(batch_records)} registros.")
+        # Después del commit: calentar con los locks del RENAME tomados bloquearía todas las lecturas
+        # de 'sales'. Las peticiones que lleguen mientras tanto esperan por single-flight.
+        self._warm_cache(published=True)
 
-            print(f"✅ Carga completada: {records_inserted} registros insertados en PostgreSQL")
+        return records_inserted
+
+    def _load_in_place(self, chunks):
+        """
+        Carga para dialectos distintos de PostgreSQL (p. ej. SQLite en desarrollo):
+        borra e inserta en una única transacción, por lo que el cambio también es atómico.
+        """
+        db.session.execute(text(f'DELETE FROM {SALES_TABLE}'))
+        records_inserted = self.bulk_insert(chunks)
+        self._publish()
+        self._warm_cache()
+        db.session.commit()
 
-            # Actualiza las estadísticas de la tabla en PostgreSQL (importante para el optimizador de consultas)
-            db.session.execute(text('ANALYZE sales'))
-            db.session.commit()
-            print("✨ Estadísticas de la tabla 'sales' actualizadas.")
+        self._report_progress('analyzing', records_inserted)
+        db.session.execute(text(f'ANALYZE {SALES_TABLE}'))
+        db.session.commit()
+        print(f"✨ Estadísticas de la tabla '{SALES_TABLE}' actualizadas.")
+
+        return records_inserted
+
+    def _stored_hashes(self):
+        """
+        Lee (row_id, row_hash) de todas las filas guardadas por bloques (cursor del servidor)
+        directamente en arrays de NumPy reservados con COUNT(*): 17 bytes por fila, sin listas
+        intermedias de enteros de Python.
+        Devuelve el índice de row_id, sus hashes (0 si es nulo) y una máscara de hash presente.
+        """
+        keyed = Sales.row_id.isnot(None)
+        rows = db.session.execute(select(func.count()).select_from(Sales).where(keyed)).scalar()
+        row_ids = np.empty(rows, dtype='int64')
+        hashes = np.zeros(rows, dtype='int64')
+        has_hash = np.zeros(rows, dtype=bool)
+        result = db.session.execute(
+            select(Sales.row_id, Sales.row_hash).where(keyed).execution_options(yield_per=self.batch_size)
+        )
+        position = 0
+        for partition in result.partitions():
+            end = position + len(partition)
+            if end > len(row_ids):
+                # Filas añadidas entre el COUNT y la lectura (no debería pasar con el lock de cargas)
+                size = max(end, 2 * len(row_ids))
+                row_ids, hashes, has_hash = (np.resize(row_ids, size), np.resize(hashes, size),
+                                             np.resize(has_hash, size))
+            values = [value for _, value in partition]
+            row_ids[position:end] = np.fromiter((row_id for row_id, _ in partition), 'int64', len(partition))
+            has_hash[position:end] = np.fromiter((value is not None for value in values), bool, len(values))
+            hashes[position:end] = np.fromiter((value or 0 for value in values), 'int64', len(values))
+            position = end
+        return pd.Index(row_ids[:position]), hashes[:position], has_hash[:position]
+
+    def _load_delta(self, chunks, delete_missing=False):
+        """
+        Carga incremental usando row_id como clave: compara el hash de cada fila del CSV
+        con el guardado en la base de datos y solo envía las filas nuevas o modificadas
+        (INSERT ... ON CONFLICT (row_id) DO UPDATE). Con delete_missing=True también borra
+        las filas cuyo row_id ya no aparece en el CSV; una fila rechazada al validar sigue
+        apareciendo (no se borra), y si alguna se rechazó sin un RowID legible no se borra nada.
+        Los bloques se comparan y escriben según se leen; los row_id repetidos en el CSV ya se
+        rechazaron al validar (se conserva su primera aparición).
+        Devuelve un diccionario con los conteos de insertadas/actualizadas/sin cambios/eliminadas.
+        """
+        self._report_progress('comparing')
+        stored_ids, stored_hashes, stored_has_hash = self._stored_hashes()
+        # Rollups y sketches se actualizan solo con lo que cambia, sin recorrer 'sales' completa
+        rollup_changes = RollupChanges() if self._rollups_enabled() else None
+        sketch_delta = None
+        if current_app.config['SKETCHES_ENABLED']:
+            current = DatasetVersion.current()
+            sketch_delta = SketchDelta(current.version if current is not None else None)
+
+        counts = {
+            'inserted': 0,
+            'updated': 0,
+            'unchanged': 0,
+            'deleted': 0,
+            'skipped_without_row_id': 0,
+            'delete_skipped': False
+        }
+        seen_ids = []
+        processed = 0
+        for chunk in chunks:
+            # Sin row_id no hay forma de emparejar la fila con la guardada
+            keyed = chunk[chunk['row_id'].notna()]
+            counts['skipped_without_row_id'] += len(chunk) - len(keyed)
+            row_ids = keyed['row_id'].astype('int64').to_numpy()
+            seen_ids.append(row_ids)
+
+            positions = stored_ids.get_indexer(row_ids)
+            is_new = positions < 0
+            existing = positions[~is_new]
+            # Un hash guardado nulo (filas anteriores a esta funcionalidad) cuenta como cambio
+            is_same = np.zeros(len(keyed), dtype=bool)
+            is_same[~is_new] = stored_has_hash[existing] & (
+                stored_hashes[existing] == keyed['row_hash'].to_numpy()[~is_new]
+            )
+            is_changed = ~is_new & ~is_same
+
+            counts['inserted'] += int(is_new.sum())
+            counts['updated'] += int(is_changed.sum())
+            counts['unchanged'] += int(is_same.sum())
+
+            pending = keyed.loc[is_new | is_changed, TABLE_COLUMNS]
+            if rollup_changes is not None:
+                rollup_changes.add_stored(row_ids[is_changed].tolist())
+                rollup_changes.add(pending['order_date'].tolist(), pending['customer_id'].tolist(),
+                                   pending['product_id'].tolist())
+            if sketch_delta is not None:
+                if is_changed.any():
+                    sketch_delta.discard()
+                sketch_delta.add(pending)
+            if len(pending):
+                self._upsert_batch(pending)
+                processed += len(pending)
+                print(f"💾 Insertados/actualizados {processed} registros...")
+            self._report_progress('upserting', processed)
+
+        if counts['skipped_without_row_id']:
+            print(f"⚠️ {counts['skipped_without_row_id']} registros sin RowID. Se omiten en la carga incremental.")
+
+        if delete_missing and self._rejects_without_row_id:
+            # No se sabe a qué fila guardada corresponde una fila rechazada sin RowID legible
+            counts['delete_skipped'] = True
+            print(f"⚠️ {self._rejects_without_row_id} registros rechazados sin RowID legible: "
+                  "no se borra ninguna fila en esta carga.")
+        elif delete_missing:
+            self._report_progress('deleting', processed)
+            all_seen = np.concatenate([np.array([], dtype='int64')] + seen_ids + self._rejected_row_ids)
+            vanished = stored_ids[~stored_ids.isin(all_seen)].tolist()
+            if vanished:
+                if rollup_changes is not None:
+                    rollup_changes.add_stored(vanished)
+                if sketch_delta is not None:
+                    sketch_delta.discard()
+            for start in range(0, len(vanished), self.batch_size):
+                batch_ids = vanished[start:start + self.batch_size]
+                db.session.execute(Sales.__table__.delete().where(Sales.row_id.in_(batch_ids)))
+            counts['deleted'] = len(vanished)
+
+        # Una sola transacción: la carga incremental se aplica completa o no se aplica
+        if counts['inserted'] or counts['updated'] or counts['deleted']:
+            self._publish(rollup_changes=rollup_changes, sketch_delta=sketch_delta)
+            self._warm_cache()
+        db.session.commit()
+        print(f"🔀 Carga incremental: {counts['inserted']} nuevos, {counts['updated']} actualizados, "
+              f"{counts['unchanged']} sin cambios, {counts['deleted']} eliminados")
+        return counts
+
+    def load_csv_to_database(self, mode='full', delete_missing=False):
+        """
+        Lee el CSV del origen (URL, ruta local o archivo subido; sin comprimir, gzip o zip)
+        y carga sus datos en la tabla 'sales' de PostgreSQL.
+        El archivo nunca se carga entero: se descarga en streaming y se procesa por bloques de
+        batch_size filas, leyendo el siguiente bloque mientras se escribe el actual, así que la
+        memoria no depende del tamaño del archivo.
+        - mode='full': reemplaza todos los datos. Se cargan con COPY en una tabla de staging que
+          sustituye a 'sales' de forma atómica, así que las consultas nunca ven la tabla vacía.
+        - mode='delta': solo inserta/actualiza las filas nuevas o modificadas según row_id
+          (y borra las desaparecidas si delete_missing=True).
+        """
+        if mode not in LOAD_MODES:
+            raise ValueError(f"Modo de carga no soportado: '{mode}'. Usa {', '.join(LOAD_MODES)}.")
+        workers = self.workers or current_app.config['LOAD_WORKERS']
+        db_writers = self.db_writers or current_app.config['LOAD_DB_WRITERS']
+        self.rejects_dir = self.rejects_dir or current_app.config['LOAD_REJECTS_DIR']
+        try:
+            print(f"🔄 Leyendo datos del CSV ({describe_source(self.source)})...")
+            self._rows_read = 0
+            self._phase, self._phase_seconds = None, {}
+            self._cache_warmed = False
+            self._reset_rejects()
+            self._report_progress('reading')
+            started = time.perf_counter()
+
+            with ExitStack() as stack:
+                stream = stack.enter_context(open_csv_source(self.source))
+                use_staging = mode == 'full' and self._dialect_name() == 'postgresql'
+                if workers > 1:
+                    # Los procesos limpian, tipan (y serializan para COPY) los bloques mientras
+                    # el hilo principal lee el CSV y las conexiones escriben
+                    executor = stack.enter_context(ProcessPoolExecutor(
+                        max_workers=workers,
+                        mp_context=multiprocessing.get_context(PROCESS_START_METHOD)
+                    ))
+                    chunks = _prefetch(
+                        self._read_chunks_parallel(stream, executor, workers, for_copy=use_staging),
+                        PREFETCH_CHUNKS
+                    )
+                    # Se cierra antes que el executor y el archivo, para detener el hilo lector
+                    stack.callback(chunks.close)
+                    print(f"⚙️ Carga en paralelo: {workers} procesos"
+                          + (f", {db_writers} conexiones de escritura" if use_staging else ''))
+                else:
+                    chunks = _prefetch(self._read_chunks(stream), PREFETCH_CHUNKS)
+                    stack.callback(chunks.close)
+                counts = {}
+                if mode == 'delta':
+                    counts = self._load_delta(chunks, delete_missing)
+                    records_inserted = counts['inserted'] + counts['updated']
+                elif use_staging:
+                    records_inserted = self._load_via_staging(
+                        chunks, db_writers if workers > 1 else None
+                    )
+                else:
+                    records_inserted = self._load_in_place(chunks)
+            self._report_progress('done', records_inserted)
+
+            elapsed = time.perf_counter() - started
+            rows_per_second = self._rows_read / elapsed if elapsed > 0 else 0.0
+            self.stats = {
+                'mode': mode,
+                'source': describe_source(self.source),
+                'rows_read': self._rows_read,
+                'records_inserted': records_inserted,
+                'seconds': round(elapsed, 3),
+                'rows_per_second': round(rows_per_second, 1),
+                'workers': workers,
+                'rejected': self._rejects_total,
+                'phase_seconds': {phase: round(seconds, 3) for phase, seconds in self._phase_seconds.items()},
+                **counts
+            }
+            if self._rejects_total:
+                self.stats['rejects'] = self._rejects_summary()
+                print(f"⚠️ {self._rejects_total} registros rechazados ({self._rejects_by_reason}). "
+                      f"Detalle en {self._rejects_path}")
+
+            print(f"✅ Carga completada: {records_inserted} registros insertados "
+                  f"en {elapsed:.2f}s ({rows_per_second:,.0f} filas/seg)")
+
+            # Los datos cambiaron: las respuestas cacheadas de la versión anterior ya no sirven
+            # (si la carga calentó la caché, se conservan las de la nueva versión)
+            invalidate_cache(clear=not self._cache_warmed)
+            # Con el motor columnar, la instantánea de la nueva versión queda lista antes de terminar
+            refresh_snapshot()
 
             return True, records_inserted # Retorna éxito y el número de registros
 
         except requests.exceptions.RequestException as e:
             db.session.rollback() # Deshace cualquier cambio si hubo un error de red
+            self._discard_warmed_cache()
+            self.error = f"Error al descargar el CSV: {e}"
             print(f"❌ Error al descargar el CSV: {e}. Verifica la URL y tu conexión a internet.")
             return False, 0
         except pd.errors.EmptyDataError:
             db.session.rollback()
+            self._discard_warmed_cache()
+            self.error = "El archivo CSV está vacío o no tiene el formato esperado."
             print("❌ Error: El archivo CSV está vacío o no tiene el formato esperado.")
             return False, 0
         except Exception as e:
             db.session.rollback() # Deshace cualquier cambio si hubo un error general
+            self._discard_warmed_cache()
+            self.error = f"Error inesperado durante la carga de datos: {e}"
             print(f"❌ Error inesperado durante la carga de datos: {e}")
-            return False, 0
\ No newline at end of file
+            return False, 0
+
+    def _discard_warmed_cache(self):
+        """
+        Si la carga falla después de calentar la caché, sus respuestas son de una versión que no se
+        publicó (y que la próxima carga volverá a usar): se vacía la caché.
+        """
+        if self._cache_warmed:
+            invalidate_cache()
+            self._cache_warmed = False
+
+def _prepare_partition(chunk, for_copy):
+    """
+    Limpia, tipa y valida un bloque del CSV (en un proceso del pool en la carga en paralelo).
+    Devuelve (resultado, row_id de las filas válidas, filas rechazadas). Con for_copy el
+    resultado se devuelve ya serializado para COPY como (filas, texto), que vuelve al proceso
+    principal mucho más rápido que el DataFrame.
+    """
+    prepared, rejects = DataLoader.validate_and_prepare(chunk)
+    if for_copy:
+        return (len(prepared), _copy_payload(prepared)), prepared['row_id'], rejects
+    return prepared, prepared['row_id'], rejects
@@ -0,0 +1,94 @@
+# utils/dataset_version.py
+# Estado de los datos publicados (versión y disponibilidad de rollups) visto por cada proceso.
+import threading
+import time
+from contextlib import contextmanager
+from flask import current_app
+from models import db
+from models.dataset_version import DatasetVersion
+
+# Último estado leído por este proceso y cuándo se consultó
+_state = {'version': None, 'rollups_ready': False, 'updated_at': None, 'checked_at': 0.0}
+_lock = threading.Lock()
+# Estado de una versión aún sin publicar, visible solo para el hilo que la calienta
+_pending = threading.local()
+
+def _refresh_state():
+    """Lee la fila de versión de la base de datos y la memoriza en este proceso."""
+    row = DatasetVersion.current()
+    if row is None:
+        return store_state(0, None, None)
+    return store_state(row.version, row.rollups_version, row.updated_at)
+
+def store_state(version, rollups_version, updated_at):
+    """Memoriza en este proceso el estado leído de la fila de versión y lo devuelve."""
+    with _lock:
+        _state['version'] = version
+        _state['rollups_ready'] = rollups_version is not None and rollups_version == version
+        _state['updated_at'] = updated_at
+        _state['checked_at'] = time.monotonic()
+        return dict(_state)
+
+def memoized_state(interval):
+    """
+    Estado memorizado si se leyó hace menos de interval segundos, o None. Lo usan las rutas
+    asíncronas del modo ASGI, que leen la fila con asyncpg y la guardan con store_state.
+    """
+    with _lock:
+        if _state['version'] is not None and time.monotonic() - _state['checked_at'] < interval:
+            return dict(_state)
+    return None
+
+def _get_state():
+    """
+    Devuelve el estado de los datos. Para no consultar la base de datos en cada petición,
+    el valor se reutiliza durante DATASET_VERSION_CHECK_SECONDS segundos.
+    """
+    pending_state = getattr(_pending, 'state', None)
+    if pending_state is not None:
+        return dict(pending_state)
+    state = memoized_state(current_app.config['DATASET_VERSION_CHECK_SECONDS'])
+    if state is not None:
+        return state
+    return _refresh_state()
+
+@contextmanager
+def pending_dataset_state(version, rollups_version, updated_at):
+    """
+    Dentro del bloque, el hilo actual ve como estado de los datos una versión que su
+    transacción aún no ha publicado (la usa el calentamiento de la caché durante la carga).
+    Los demás hilos siguen viendo la versión publicada.
+    """
+    _pending.state = {
+        'version': version,
+        'rollups_ready': rollups_version is not None and rollups_version == version,
+        'updated_at': updated_at,
+        'checked_at': time.monotonic(),
+    }
+    try:
+        yield
+    finally:
+        _pending.state = None
+
+def is_pending_dataset_state():
+    """True si el hilo actual está dentro de pending_dataset_state."""
+    return getattr(_pending, 'state', None) is not None
+
+def current_dataset_version():
+    """Versión actual de los datos publicados (0 si nunca se cargaron)."""
+    return _get_state()['version']
+
+def dataset_updated_at():
+    """Fecha (UTC, sin zona horaria) de la última publicación de datos, o None si nunca se cargaron."""
+    return _get_state()['updated_at']
+
+def rollups_ready():
+    """True si las tablas de agregados corresponden a la versión actual de los datos."""
+    if not current_app.config['ROLLUPS_ENABLED']:
+        return False
+    return _get_state()['rollups_ready']
+
+def forget_dataset_version():
+    """Olvida el estado memorizado para que la próxima consulta lo lea de la base de datos."""
+    with _lock:
+        _state['version'] = None
@@ -0,0 +1,40 @@
+# utils/date_buckets.py
+# Expresiones SQL para truncar fechas a día/semana/mes/trimestre/año según el dialecto.
+from sqlalchemy import func, cast, Date, Integer
+
+DATE_BUCKETS = ('day', 'week', 'month', 'quarter', 'year')
+
+def date_bucket(date_column, unit, dialect_name):
+    """
+    Devuelve una expresión con el primer día del periodo (unit) que contiene la fecha.
+    Las semanas empiezan en lunes, igual que date_trunc('week', ...) en PostgreSQL.
+    """
+    if unit not in DATE_BUCKETS:
+        raise ValueError(f"Periodo no soportado: '{unit}'. Usa {', '.join(DATE_BUCKETS)}.")
+
+    if dialect_name == 'postgresql':
+        return cast(func.date_trunc(unit, date_column), Date)
+
+    if dialect_name == 'sqlite':
+        if unit == 'day':
+            return func.date(date_column)
+        if unit == 'week':
+            # 'weekday 0' avanza hasta el domingo; restando 6 días queda el lunes de esa semana
+            return func.date(date_column, 'weekday 0', '-6 days')
+        if unit == 'month':
+            return func.date(date_column, 'start of month')
+        if unit == 'year':
+            return func.date(date_column, 'start of year')
+        # Trimestre: primer mes del trimestre ((mes - 1) // 3) * 3 + 1
+        month = cast(func.strftime('%m', date_column), Integer)
+        return func.printf(
+            '%s-%02d-01',
+            func.strftime('%Y', date_column),
+            ((month - 1) // 3) * 3 + 1
+        )
+
+    raise ValueError(f"Agrupación por fechas no soportada en '{dialect_name}'")
+
+def month_start(date_column, dialect_name):
+    """Expresión SQL con el primer día del mes de una columna de fecha."""
+    return date_bucket(date_column, 'month', dialect_name)
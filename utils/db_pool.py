@@ -0,0 +1,199 @@
+# utils/db_pool.py
+# Configuración del engine de SQLAlchemy: pool de conexiones, modo pooler externo (pgbouncer),
+# statement_timeout por ruta, métricas del pool y pools limpios tras un fork (gunicorn --preload).
+import os
+import threading
+import time
+import weakref
+from functools import wraps
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, NullPool
+from models import db
+
+# Métricas del pool en este proceso (cada worker de Gunicorn lleva las suyas)
+_pool_stats = {
+    'checkouts': 0,
+    'checkout_wait_ms_total': 0.0,
+    'checkout_wait_ms_max': 0.0,
+    'checkout_timeouts': 0,
+    'connections_created': 0,
+    'connections_invalidated': 0,
+}
+_stats_lock = threading.Lock()
+
+# Engines creados en este proceso (para descartar sus conexiones en los procesos hijos)
+_engines = weakref.WeakSet()
+
+class _MeteredPoolMixin:
+    """Mide cuánto tarda el pool en entregar una conexión (espera por una libre + conexión nueva)."""
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except PoolTimeoutError:
+            with _stats_lock:
+                _pool_stats['checkout_timeouts'] += 1
+            raise
+        waited_ms = (time.perf_counter() - started) * 1000
+        with _stats_lock:
+            _pool_stats['checkouts'] += 1
+            _pool_stats['checkout_wait_ms_total'] += waited_ms
+            _pool_stats['checkout_wait_ms_max'] = max(_pool_stats['checkout_wait_ms_max'], waited_ms)
+        return record
+
+class MeteredQueuePool(_MeteredPoolMixin, QueuePool):
+    """QueuePool con métricas de checkout."""
+
+class MeteredNullPool(_MeteredPoolMixin, NullPool):
+    """NullPool (una conexión nueva por checkout, para usar detrás de pgbouncer) con métricas."""
+
+def normalize_database_url(url):
+    """
+    Fuerza el driver psycopg2 (el de requirements.txt) en las URLs de PostgreSQL.
+    Render y Heroku entregan 'postgres://', que SQLAlchemy ya no acepta, y en SQLAlchemy 2.1
+    'postgresql://' sin driver usa psycopg 3.
+    """
+    if not url:
+        return url
+    for prefix in ('postgres://', 'postgresql://'):
+        if url.startswith(prefix):
+            return 'postgresql+psycopg2://' + url[len(prefix):]
+    return url
+
+def build_engine_options(config):
+    """
+    Opciones del engine según la configuración. Solo se ajusta PostgreSQL; el resto de
+    dialectos (p. ej. SQLite en local) se quedan con los valores por defecto de SQLAlchemy.
+    Las opciones explícitas de SQLALCHEMY_ENGINE_OPTIONS tienen prioridad.
+    """
+    options = {}
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql'):
+        options['connect_args'] = {
+            'connect_timeout': config['DB_CONNECT_TIMEOUT'],
+            'application_name': config['DB_APPLICATION_NAME'],
+            # Keepalives TCP: detectan antes las conexiones que un proxy o firewall cortó por inactividad
+            'keepalives': 1,
+            'keepalives_idle': 60,
+            'keepalives_interval': 10,
+            'keepalives_count': 3,
+        }
+        if config['DB_EXTERNAL_POOLER']:
+            # pgbouncer (modo transaction) ya reparte las conexiones: no se guarda ninguna en el
+            # proceso, y el estado de sesión (SET, statement_timeout) se aplica solo con SET LOCAL.
+            # psycopg2 no usa prepared statements del servidor, así que no hay nada más que desactivar.
+            options['poolclass'] = MeteredNullPool
+        else:
+            options.update({
+                'poolclass': MeteredQueuePool,
+                'pool_size': config['DB_POOL_SIZE'],
+                'max_overflow': config['DB_MAX_OVERFLOW'],
+                'pool_timeout': config['DB_POOL_TIMEOUT'],
+                'pool_recycle': config['DB_POOL_RECYCLE'],
+                'pool_pre_ping': config['DB_POOL_PRE_PING'],
+                # LIFO: las conexiones sobrantes quedan ociosas y se reciclan en lugar de rotarse todas
+                'pool_use_lifo': True,
+            })
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+def _count_connect(dbapi_connection, connection_record):
+    with _stats_lock:
+        _pool_stats['connections_created'] += 1
+
+def _count_invalidate(dbapi_connection, connection_record, exception):
+    with _stats_lock:
+        _pool_stats['connections_invalidated'] += 1
+
+def _set_local_statement_timeout(connection, timeout_ms):
+    """Aplica statement_timeout solo a la transacción actual (compatible con pgbouncer)."""
+    if connection.dialect.name == 'postgresql':
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout_ms)}')
+
+def _apply_request_statement_timeout(session, transaction, connection):
+    """
+    Al empezar cada transacción de db.session durante una petición HTTP, limita la duración
+    de sus consultas. Las cargas en segundo plano no tienen contexto de petición y no se limitan.
+    """
+    if not has_request_context():
+        return
+    timeout_ms = g.get('statement_timeout_ms', current_app.config['DB_STATEMENT_TIMEOUT_MS'])
+    if timeout_ms:
+        _set_local_statement_timeout(connection, timeout_ms)
+
+def _dispose_pools_after_fork():
+    """
+    En el hijo de un fork (los workers de gunicorn --preload, o los procesos de la carga en
+    paralelo) las conexiones heredadas siguen siendo del padre: se olvidan sin cerrarlas
+    (dispose(close=False)) y el hijo abre las suyas. Las métricas del pool empiezan de cero.
+    """
+    global _stats_lock
+    for engine in list(_engines):
+        engine.dispose(close=False)
+    # Lock nuevo: otro hilo del padre podía tenerlo tomado en el momento del fork
+    _stats_lock = threading.Lock()
+    _pool_stats.update(dict.fromkeys(_pool_stats, 0))
+
+if hasattr(os, 'register_at_fork'): # Solo POSIX
+    os.register_at_fork(after_in_child=_dispose_pools_after_fork)
+
+def init_db_engine(app):
+    """
+    Prepara la URL y las opciones del engine antes de db.init_app(app), y registra
+    los listeners de statement_timeout y de métricas del pool.
+    """
+    app.config['SQLALCHEMY_DATABASE_URI'] = normalize_database_url(app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
+    db.init_app(app)
+
+    if not event.contains(db.session, 'after_begin', _apply_request_statement_timeout):
+        event.listen(db.session, 'after_begin', _apply_request_statement_timeout)
+    with app.app_context():
+        _engines.add(db.engine)
+        # Se registran en el engine para que sobrevivan a dispose() (que recrea el pool)
+        if not event.contains(db.engine, 'connect', _count_connect):
+            event.listen(db.engine, 'connect', _count_connect)
+            event.listen(db.engine, 'invalidate', _count_invalidate)
+
+def statement_timeout(config_key):
+    """
+    Decorador para rutas que necesitan un statement_timeout distinto del general
+    (DB_STATEMENT_TIMEOUT_MS), tomado de la clave de configuración indicada (0 = sin límite).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            timeout_ms = current_app.config[config_key]
+            g.statement_timeout_ms = timeout_ms
+            # Si la transacción ya empezó (p. ej. al leer la versión de los datos), se ajusta ahora
+            session = db.session()
+            if session.in_transaction():
+                _set_local_statement_timeout(session.connection(), timeout_ms)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def pool_status():
+    """Estado del pool de este proceso y métricas acumuladas de checkout."""
+    pool = db.engine.pool
+    with _stats_lock:
+        stats = dict(_pool_stats)
+    checkouts = stats['checkouts']
+    status = {
+        'pool_class': type(pool).__name__,
+        'checkouts': checkouts,
+        'checkout_wait_ms_avg': round(stats['checkout_wait_ms_total'] / checkouts, 3) if checkouts else None,
+        'checkout_wait_ms_max': round(stats['checkout_wait_ms_max'], 3),
+        'checkout_timeouts': stats['checkout_timeouts'],
+        'connections_created': stats['connections_created'],
+        'connections_invalidated': stats['connections_invalidated'],
+    }
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+        })
+    return status
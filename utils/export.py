@@ -0,0 +1,136 @@
+# utils/export.py
+# Exportación masiva de la tabla 'sales' en formatos tipados (Arrow IPC, Parquet) o CSV,
+# generada por lotes desde un cursor del lado del servidor.
+import csv
+import io
+from sqlalchemy import select
+from models import db
+from models.sales import Sales
+from utils.analytics_query import apply_filters
+
+# Columnas exportadas, con los nombres de la tabla
+EXPORT_COLUMNS = (
+    'no', 'row_id', 'order_id', 'order_date', 'ship_date', 'ship_mode', 'customer_id',
+    'customer_name', 'segment', 'country', 'city', 'state', 'postal_code', 'region',
+    'product_id', 'category', 'sub_category', 'product_name', 'sales', 'quantity',
+    'discount', 'profit'
+)
+
+# Formato -> (tipo MIME, extensión del archivo)
+EXPORT_FORMATS = {
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'csv': ('text/csv', 'csv'),
+}
+
+class ExportUnavailableError(RuntimeError):
+    """El formato pedido necesita una dependencia opcional que no está instalada (pyarrow)."""
+
+def _import_pyarrow():
+    """Importa pyarrow solo cuando se exporta en Arrow/Parquet (dependencia pesada y opcional)."""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        return pyarrow
+    except ImportError:
+        raise ExportUnavailableError("Los formatos 'arrow' y 'parquet' requieren el paquete pyarrow")
+
+def arrow_schema(pa):
+    """
+    Esquema Arrow equivalente a las columnas de 'sales': fechas como date32 y
+    montos como decimal128 con la misma precisión y escala que la tabla.
+    """
+    fields = []
+    for name in EXPORT_COLUMNS:
+        column_type = Sales.__table__.c[name].type
+        python_type = column_type.python_type
+        if name in ('order_date', 'ship_date'):
+            arrow_type = pa.date32()
+        elif python_type is int:
+            arrow_type = pa.int64()
+        elif hasattr(column_type, 'precision') and hasattr(column_type, 'scale') and column_type.scale is not None:
+            arrow_type = pa.decimal128(column_type.precision, column_type.scale)
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(name, arrow_type))
+    return pa.schema(fields)
+
+def _iter_batches(filters, start_date, end_date, batch_size):
+    """Recorre las filas filtradas en bloques de batch_size tuplas, con un cursor del servidor."""
+    query = apply_filters(
+        select(*[Sales.__table__.c[name] for name in EXPORT_COLUMNS]),
+        filters, start_date, end_date
+    ).order_by(Sales.row_id)
+    result = db.session.execute(query.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield partition
+
+class _ChunkSink(io.RawIOBase):
+    """Destino de escritura que acumula bytes para ir entregándolos en la respuesta en streaming."""
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        """Devuelve lo escrito desde la última llamada y vacía el buffer."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _stream_arrow(export_format, filters, start_date, end_date, batch_size):
+    """Genera el archivo Arrow IPC (stream) o Parquet, un lote/row group a la vez."""
+    pa = _import_pyarrow()
+    schema = arrow_schema(pa)
+    sink = _ChunkSink()
+    if export_format == 'parquet':
+        writer = pa.parquet.ParquetWriter(sink, schema, compression='snappy')
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    try:
+        for rows in _iter_batches(filters, start_date, end_date, batch_size):
+            columns = list(zip(*rows))
+            batch = pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema
+            )
+            if export_format == 'parquet':
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def _stream_csv(filters, start_date, end_date, batch_size):
+    """Genera el CSV con cabecera, un bloque de filas a la vez."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in _iter_batches(filters, start_date, end_date, batch_size):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def stream_export(export_format, filters, start_date, end_date, batch_size):
+    """
+    Devuelve un generador con el contenido del archivo exportado.
+    Lanza ExportUnavailableError antes de empezar si falta pyarrow para el formato pedido.
+    """
+    if export_format == 'csv':
+        return _stream_csv(filters, start_date, end_date, batch_size)
+    _import_pyarrow()
+    return _stream_arrow(export_format, filters, start_date, end_date, batch_size)
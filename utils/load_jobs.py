@@ -0,0 +1,150 @@
+# utils/load_jobs.py
+# Ejecución de cargas de datos en segundo plano con seguimiento de progreso.
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import text, update
+from models import db
+from models.load_job import LoadJob
+
+# Clave del advisory lock de PostgreSQL que impide dos cargas simultáneas entre workers
+LOAD_ADVISORY_LOCK_KEY = 7240531
+
+# Un solo hilo por proceso: las cargas se ejecutan de una en una
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='data-load')
+# Protege la creación de trabajos dentro del mismo proceso
+_enqueue_lock = threading.Lock()
+
+class LoadInProgressError(Exception):
+    """Se lanza cuando se intenta iniciar una carga mientras otra sigue en curso."""
+    def __init__(self, job):
+        super().__init__(f'Ya hay una carga en curso ({job.id})')
+        self.job = job
+
+def _update_job(job_id, **values):
+    """
+    Actualiza el trabajo en su propia transacción (autocommit), de modo que el progreso
+    sea visible para otros workers aunque la transacción de la carga siga abierta.
+    """
+    values['updated_at'] = datetime.utcnow()
+    with db.engine.begin() as connection:
+        connection.execute(update(LoadJob.__table__).where(LoadJob.id == job_id).values(**values))
+
+def _find_active_job(stale_after_seconds):
+    """Devuelve el trabajo activo más reciente, ignorando los que dejaron de reportar progreso."""
+    cutoff = datetime.utcnow() - timedelta(seconds=stale_after_seconds)
+    return LoadJob.query.filter(
+        LoadJob.status.in_(LoadJob.ACTIVE_STATUSES),
+        LoadJob.updated_at >= cutoff
+    ).order_by(LoadJob.created_at.desc()).first()
+
+def _acquire_advisory_lock():
+    """
+    En PostgreSQL toma un advisory lock en una conexión dedicada y la devuelve.
+    Devuelve None si otro proceso ya tiene el lock. En otros dialectos no hay lock entre procesos.
+    """
+    connection = db.engine.connect()
+    if connection.dialect.name != 'postgresql':
+        return connection
+    acquired = connection.execute(
+        text('SELECT pg_try_advisory_lock(:key)'), {'key': LOAD_ADVISORY_LOCK_KEY}
+    ).scalar()
+    if not acquired:
+        connection.close()
+        return None
+    return connection
+
+def _release_advisory_lock(connection):
+    """Libera el advisory lock tomado por _acquire_advisory_lock y cierra la conexión."""
+    try:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': LOAD_ADVISORY_LOCK_KEY})
+    finally:
+        connection.close()
+
+def _remove_file(path):
+    """Borra un archivo temporal de carga; si ya no existe no pasa nada."""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+def _run_job(app, job_id, source, mode, delete_missing, remove_source=False):
+    """
+    Ejecuta la carga dentro de un contexto de aplicación propio del hilo.
+    Con remove_source=True el archivo de origen (p. ej. un CSV subido) se borra al terminar.
+    """
+    with app.app_context():
+        started = time.perf_counter()
+        lock_connection = _acquire_advisory_lock()
+        if lock_connection is None:
+            _update_job(job_id, status=LoadJob.FAILED, phase='rejected',
+                        error='Otra carga está en curso en otro proceso.',
+                        finished_at=datetime.utcnow())
+            if remove_source:
+                _remove_file(source)
+            return
+
+        def report_progress(phase, rows_processed):
+            values = {'phase': phase}
+            if rows_processed is not None:
+                elapsed = time.perf_counter() - started
+                values['rows_processed'] = rows_processed
+                values['rows_per_second'] = round(rows_processed / elapsed, 1) if elapsed > 0 else None
+            try:
+                _update_job(job_id, **values)
+            except Exception as e:
+                # El progreso es informativo: un fallo al guardarlo no debe abortar la carga
+                # (p. ej. en SQLite, donde la carga bloquea la base de datos para escritura)
+                print(f"⚠️ No se pudo actualizar el progreso del trabajo {job_id}: {e}")
+
+        try:
+            _update_job(job_id, status=LoadJob.RUNNING, started_at=datetime.utcnow())
+            # pandas, NumPy y requests solo se importan en el worker que ejecuta una carga
+            from utils.data_loader import DataLoader
+            data_loader = DataLoader(source, progress_callback=report_progress)
+            success, records_inserted = data_loader.load_csv_to_database(mode, delete_missing)
+            if success:
+                _update_job(job_id, status=LoadJob.SUCCEEDED, phase='done',
+                            rows_processed=records_inserted,
+                            rows_per_second=data_loader.stats.get('rows_per_second'),
+                            result=data_loader.stats,
+                            finished_at=datetime.utcnow())
+            else:
+                _update_job(job_id, status=LoadJob.FAILED, error=data_loader.error,
+                            finished_at=datetime.utcnow())
+        except Exception as e:
+            print(f"❌ Error en el trabajo de carga {job_id}: {e}")
+            _update_job(job_id, status=LoadJob.FAILED, error=str(e), finished_at=datetime.utcnow())
+        finally:
+            db.session.remove()
+            _release_advisory_lock(lock_connection)
+            if remove_source:
+                _remove_file(source)
+
+def enqueue_load(app, source, mode='full', delete_missing=False, remove_source=False, source_label=None):
+    """
+    Registra un nuevo trabajo de carga y lo envía al ejecutor en segundo plano.
+    source es una URL o una ruta local (ver utils.csv_source); source_label es el texto
+    que se guarda en el trabajo (por defecto el propio source). Con remove_source=True
+    el archivo se borra cuando termina la carga.
+    Lanza LoadInProgressError si ya hay una carga activa.
+    """
+    with _enqueue_lock:
+        active_job = _find_active_job(app.config['LOAD_JOB_STALE_SECONDS'])
+        if active_job is not None:
+            raise LoadInProgressError(active_job)
+
+        job = LoadJob(source=source_label or source, mode=mode, status=LoadJob.QUEUED, phase='queued')
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+
+    _executor.submit(_run_job, app, job_id, source, mode, delete_missing, remove_source)
+    return job
+
+def get_job(job_id):
+    """Devuelve el trabajo con el id indicado, o None si no existe."""
+    return db.session.get(LoadJob, job_id)
@@ -0,0 +1,260 @@
+# utils/metrics.py
+# Instrumentación por petición: latencia por endpoint, consultas SQL y tiempo en la base de datos,
+# bytes enviados, consultas lentas y exposición en formato de texto de Prometheus.
+import os
+import threading
+import time
+from flask import current_app, g, request, Response, has_app_context
+from sqlalchemy import event
+from models import db
+from utils.cache import get_cache
+from utils.db_pool import pool_status
+
+# Límites (segundos) de los buckets del histograma de latencia
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Longitud máxima del SQL y de los parámetros en el log de consultas lentas
+SLOW_QUERY_LOG_MAX_CHARS = 2000
+
+# Umbral (ms) del log de consultas lentas; se toma de SLOW_QUERY_MS en init_metrics
+_slow_query_ms = 0
+
+class Histogram:
+    """Histograma acumulativo con etiquetas, al estilo de Prometheus."""
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.series = {} # etiquetas -> [conteos por bucket, suma, total]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        for index, upper in enumerate(self.buckets):
+            if value <= upper:
+                series[0][index] += 1
+        series[1] += value
+        series[2] += 1
+
+# Métricas de este proceso. Con varios workers de Gunicorn cada uno expone las suyas
+# (Prometheus distingue el origen por la instancia que responde el scrape).
+_lock = threading.Lock()
+_request_latency = Histogram(LATENCY_BUCKETS)
+_requests_total = {}       # (endpoint, method, status) -> peticiones
+_response_bytes_total = {} # endpoint -> bytes enviados
+_db_queries_total = {}     # endpoint -> consultas SQL ejecutadas durante peticiones
+_db_seconds_total = {}     # endpoint -> segundos en la base de datos durante peticiones
+_db_totals = {'queries': 0, 'seconds': 0.0, 'slow_queries': 0} # incluye cargas en segundo plano
+
+def _add(counter, key, value):
+    counter[key] = counter.get(key, 0) + value
+
+def _endpoint_label():
+    """Nombre del endpoint de Flask; las rutas inexistentes se agrupan para no crear series sin fin."""
+    return request.endpoint or 'unmatched'
+
+def _truncate(value):
+    text = repr(value) if not isinstance(value, str) else value
+    if len(text) > SLOW_QUERY_LOG_MAX_CHARS:
+        return text[:SLOW_QUERY_LOG_MAX_CHARS] + '...'
+    return text
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['query_started_at'].pop()
+    elapsed = time.perf_counter() - started
+
+    with _lock:
+        _db_totals['queries'] += 1
+        _db_totals['seconds'] += elapsed
+
+    request_metrics = g.get('request_metrics') if has_app_context() else None
+    if request_metrics is not None:
+        request_metrics['db_queries'] += 1
+        request_metrics['db_seconds'] += elapsed
+
+    if _slow_query_ms and elapsed * 1000 >= _slow_query_ms:
+        with _lock:
+            _db_totals['slow_queries'] += 1
+        where = request_metrics['endpoint'] if request_metrics is not None else 'segundo plano'
+        print(
+            f"🐢 Consulta lenta ({elapsed * 1000:.1f} ms) en {where}: {_truncate(statement)}"
+            f" | parámetros: {_truncate(parameters)}"
+        )
+
+def _handle_error(exception_context):
+    """Descarta el inicio de una consulta que falló (after_cursor_execute no se llama)."""
+    connection = exception_context.connection
+    if connection is not None and connection.info.get('query_started_at'):
+        connection.info['query_started_at'].pop()
+
+def _start_request():
+    g.request_metrics = {
+        'started_at': time.perf_counter(),
+        'endpoint': _endpoint_label(),
+        'db_queries': 0,
+        'db_seconds': 0.0,
+    }
+
+def _record(request_metrics, method, status_code, response_bytes):
+    """Acumula las métricas de una petición terminada."""
+    endpoint = request_metrics['endpoint']
+    duration = time.perf_counter() - request_metrics['started_at']
+    with _lock:
+        _request_latency.observe((endpoint, method), duration)
+        _add(_requests_total, (endpoint, method, str(status_code)), 1)
+        _add(_response_bytes_total, endpoint, response_bytes)
+        _add(_db_queries_total, endpoint, request_metrics['db_queries'])
+        _add(_db_seconds_total, endpoint, request_metrics['db_seconds'])
+
+def record_request(endpoint, method, status_code, response_bytes, started_at, db_queries=0, db_seconds=0.0):
+    """Registra una petición servida fuera de Flask (rutas asíncronas del modo ASGI)."""
+    _record({
+        'started_at': started_at,
+        'endpoint': endpoint,
+        'db_queries': db_queries,
+        'db_seconds': db_seconds,
+    }, method, status_code, response_bytes)
+
+def _count_streamed_bytes(chunks, request_metrics, method, status_code):
+    """
+    Envuelve el cuerpo de una respuesta en streaming: cuenta los bytes enviados y registra
+    la petición al terminar, para que la latencia y el tiempo en la base de datos incluyan todo el envío.
+    """
+    sent = 0
+    try:
+        for chunk in chunks:
+            sent += len(chunk)
+            yield chunk
+    finally:
+        _record(request_metrics, method, status_code, sent)
+
+def _finish_request(response):
+    request_metrics = g.get('request_metrics')
+    if request_metrics is None:
+        return response
+
+    if current_app.config['SERVER_TIMING_ENABLED']:
+        # En respuestas en streaming solo cubre el tiempo hasta enviar las cabeceras
+        elapsed_ms = (time.perf_counter() - request_metrics['started_at']) * 1000
+        response.headers['Server-Timing'] = (
+            f'db;dur={request_metrics["db_seconds"] * 1000:.1f};desc="{request_metrics["db_queries"]} queries", '
+            f'app;dur={elapsed_ms:.1f}'
+        )
+
+    if response.is_streamed:
+        response.response = _count_streamed_bytes(
+            response.response, request_metrics, request.method, response.status_code
+        )
+    else:
+        _record(request_metrics, request.method, response.status_code, response.calculate_content_length() or 0)
+    return response
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(**labels):
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+def _metric_block(name, metric_type, help_text, samples):
+    lines = [f'# HELP {name} {help_text}', f'# TYPE {name} {metric_type}']
+    lines.extend(samples)
+    return lines
+
+def render_metrics():
+    """Todas las métricas de este proceso en el formato de texto de Prometheus (0.0.4)."""
+    with _lock:
+        latency = {labels: (list(buckets), total, count)
+                   for labels, (buckets, total, count) in _request_latency.series.items()}
+        requests_total = dict(_requests_total)
+        response_bytes = dict(_response_bytes_total)
+        db_queries = dict(_db_queries_total)
+        db_seconds = dict(_db_seconds_total)
+        db_totals = dict(_db_totals)
+
+    lines = []
+    samples = []
+    for (endpoint, method), (buckets, total, count) in sorted(latency.items()):
+        for upper, bucket_count in zip(LATENCY_BUCKETS, buckets):
+            samples.append(f'http_request_duration_seconds_bucket{_labels(endpoint=endpoint, method=method, le=upper)} {bucket_count}')
+        samples.append(f'http_request_duration_seconds_bucket{_labels(endpoint=endpoint, method=method, le="+Inf")} {count}')
+        samples.append(f'http_request_duration_seconds_sum{_labels(endpoint=endpoint, method=method)} {total:.6f}')
+        samples.append(f'http_request_duration_seconds_count{_labels(endpoint=endpoint, method=method)} {count}')
+    lines += _metric_block('http_request_duration_seconds', 'histogram',
+                           'Latencia de las peticiones HTTP por endpoint.', samples)
+
+    lines += _metric_block('http_requests_total', 'counter', 'Peticiones HTTP por endpoint, método y estado.', [
+        f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {value}'
+        for (endpoint, method, status), value in sorted(requests_total.items())
+    ])
+    lines += _metric_block('http_response_bytes_total', 'counter', 'Bytes enviados en el cuerpo de las respuestas.', [
+        f'http_response_bytes_total{_labels(endpoint=endpoint)} {value}'
+        for endpoint, value in sorted(response_bytes.items())
+    ])
+    lines += _metric_block('http_request_db_queries_total', 'counter', 'Consultas SQL ejecutadas durante peticiones HTTP.', [
+        f'http_request_db_queries_total{_labels(endpoint=endpoint)} {value}'
+        for endpoint, value in sorted(db_queries.items())
+    ])
+    lines += _metric_block('http_request_db_seconds_total', 'counter', 'Tiempo en la base de datos durante peticiones HTTP.', [
+        f'http_request_db_seconds_total{_labels(endpoint=endpoint)} {value:.6f}'
+        for endpoint, value in sorted(db_seconds.items())
+    ])
+    lines += _metric_block('db_queries_total', 'counter', 'Consultas SQL ejecutadas por el proceso.',
+                           [f'db_queries_total {db_totals["queries"]}'])
+    lines += _metric_block('db_query_seconds_total', 'counter', 'Tiempo total de las consultas SQL del proceso.',
+                           [f'db_query_seconds_total {db_totals["seconds"]:.6f}'])
+    lines += _metric_block('db_slow_queries_total', 'counter', 'Consultas que superaron SLOW_QUERY_MS.',
+                           [f'db_slow_queries_total {db_totals["slow_queries"]}'])
+
+    cache = get_cache()
+    if cache is not None:
+        stats = cache.stats()
+        labels = _labels(backend=stats['backend'])
+        lines += _metric_block('response_cache_hits_total', 'counter', 'Aciertos de la caché de respuestas.',
+                               [f'response_cache_hits_total{labels} {stats["hits"]}'])
+        lines += _metric_block('response_cache_misses_total', 'counter', 'Fallos de la caché de respuestas.',
+                               [f'response_cache_misses_total{labels} {stats["misses"]}'])
+        lines += _metric_block('response_cache_hit_ratio', 'gauge', 'Proporción de aciertos de la caché de respuestas.',
+                               [f'response_cache_hit_ratio{labels} {stats["hit_ratio"] or 0}'])
+
+    pool = pool_status()
+    pool_gauges = {
+        'db_pool_checked_out': ('checked_out', 'Conexiones del pool en uso.'),
+        'db_pool_size': ('size', 'Tamaño configurado del pool.'),
+        'db_pool_overflow': ('overflow', 'Conexiones por encima del tamaño del pool.'),
+    }
+    for name, (key, help_text) in pool_gauges.items():
+        if key in pool:
+            lines += _metric_block(name, 'gauge', help_text, [f'{name} {pool[key]}'])
+    lines += _metric_block('db_pool_checkouts_total', 'counter', 'Conexiones entregadas por el pool.',
+                           [f'db_pool_checkouts_total {pool["checkouts"]}'])
+    lines += _metric_block('db_pool_checkout_timeouts_total', 'counter', 'Esperas por una conexión que agotaron DB_POOL_TIMEOUT.',
+                           [f'db_pool_checkout_timeouts_total {pool["checkout_timeouts"]}'])
+
+    lines += _metric_block('process_id', 'gauge', 'PID del worker que respondió.', [f'process_id {os.getpid()}'])
+    return '\n'.join(lines) + '\n'
+
+def metrics_endpoint():
+    """Endpoint /api/metrics en formato de texto de Prometheus."""
+    return Response(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def init_metrics(app):
+    """
+    Registra la instrumentación en la aplicación: hooks before/after_request, eventos
+    before/after_cursor_execute del engine y la ruta /api/metrics.
+    """
+    global _slow_query_ms
+    if not app.config['METRICS_ENABLED']:
+        return
+    _slow_query_ms = app.config['SLOW_QUERY_MS']
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.add_url_rule('/api/metrics', 'metrics', metrics_endpoint, methods=['GET'])
+
+    with app.app_context():
+        if not event.contains(db.engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(db.engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(db.engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(db.engine, 'handle_error', _handle_error)
@@ -0,0 +1,175 @@
+# utils/query_plans.py
+# Comprobación de los planes de consulta de las rutas de analítica (comando 'flask explain-check').
+# Llama a cada ruta, captura el SQL que ejecuta y lo vuelve a lanzar con
+# EXPLAIN (ANALYZE, BUFFERS) para detectar scans que leen demasiadas filas de 'sales'.
+from datetime import timedelta
+import click
+from flask import current_app
+from sqlalchemy import event, func, select
+from models import db
+from models.sales import Sales
+
+# Peticiones comprobadas; {start} y {end} se sustituyen por un rango de dos semanas dentro de
+# los datos, no alineado a meses para que query y timeseries lean 'sales' y no los rollups.
+# El segundo valor indica cuándo la ruta agrega toda la tabla y tiene que leer todas sus filas:
+# siempre (summary cuenta pedidos y clientes distintos, que no salen de los rollups) o solo sin
+# rollups. En esos casos se comprueba que lo haga con un Index Only Scan sin ir al heap.
+WHOLE_TABLE_ALWAYS = 'always'
+WHOLE_TABLE_WITHOUT_ROLLUPS = 'without_rollups'
+PLAN_CHECK_REQUESTS = (
+    ('/api/analytics/summary', WHOLE_TABLE_ALWAYS),
+    ('/api/analytics/categories', WHOLE_TABLE_WITHOUT_ROLLUPS),
+    ('/api/analytics/regions', WHOLE_TABLE_WITHOUT_ROLLUPS),
+    ('/api/analytics/customers?limit=10', WHOLE_TABLE_WITHOUT_ROLLUPS),
+    ('/api/analytics/products?limit=10', WHOLE_TABLE_WITHOUT_ROLLUPS),
+    ('/api/analytics/query?dimensions=category&measures=sales,profit&start_date={start}&end_date={end}', None),
+    ('/api/analytics/timeseries?bucket=day&start_date={start}&end_date={end}', None),
+)
+
+def _request_urls():
+    """PLAN_CHECK_REQUESTS con un rango de fechas que existe en la tabla."""
+    first_date = db.session.execute(select(func.min(Sales.order_date))).scalar()
+    db.session.rollback()
+    if first_date is None:
+        return None
+    start = first_date + timedelta(days=1)
+    end = start + timedelta(days=14)
+    return [(url.format(start=start.isoformat(), end=end.isoformat()), whole_table)
+            for url, whole_table in PLAN_CHECK_REQUESTS]
+
+def _capture_statements(client, url):
+    """Llama a la ruta y devuelve las SELECT (sentencia, parámetros) que ejecutó."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # Las consultas al catálogo (p. ej. comprobar si existe una tabla) no son de la ruta
+        if statement.lstrip().upper().startswith('SELECT') and 'pg_catalog' not in statement:
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+    if response.status_code != 200:
+        raise click.ClickException(f'{url} respondió {response.status_code}: {response.get_data(as_text=True)[:200]}')
+    return statements
+
+def _plan_nodes(node):
+    """Recorre el árbol del plan en JSON (nodo y todos sus hijos)."""
+    yield node
+    for child in node.get('Plans', []):
+        yield from _plan_nodes(child)
+
+def _scanned_rows(node):
+    """
+    Filas leídas por un nodo de scan: las devueltas más las descartadas por el filtro y, en un
+    Bitmap Heap Scan, por la recomprobación del índice, por el número de ejecuciones (en un scan
+    paralelo cada worker cuenta como una).
+    """
+    rows = (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)
+            + node.get('Rows Removed by Index Recheck', 0))
+    return rows * node.get('Actual Loops', 1)
+
+def _scan_violation(node, rows, max_rows, whole_table):
+    """
+    Motivo por el que un scan cuenta como regresión, o None:
+    - un Seq Scan de más de max_rows filas en cualquier tabla;
+    - cualquier scan de 'sales' de más de max_rows filas, salvo en las rutas que agregan toda la
+      tabla (ver PLAN_CHECK_REQUESTS), que deben leerla con un Index Only Scan de como mucho
+      max_rows heap fetches.
+    """
+    if node['Node Type'] == 'Seq Scan' and rows > max_rows:
+        return f"{rows:,} filas"
+    if node['Relation Name'] != Sales.__tablename__:
+        return None
+    if not whole_table:
+        return f"{rows:,} filas" if rows > max_rows else None
+    if node['Node Type'] != 'Index Only Scan':
+        return f"{rows:,} filas sin Index Only Scan" if rows > max_rows else None
+    if node.get('Heap Fetches', 0) > max_rows:
+        return f"{node['Heap Fetches']:,} heap fetches"
+    return None
+
+def explain(statement, parameters):
+    """Ejecuta EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) de la sentencia y devuelve el plan."""
+    with db.engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            f'EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}', parameters
+        ).scalar()
+        connection.rollback()
+    return plan[0]
+
+def check_plans(client, urls, max_rows, rollups_enabled):
+    """
+    Comprueba cada petición de _request_urls e imprime el tiempo y los scans de cada consulta.
+    Devuelve la lista de (url, scan, motivo) de los scans que leen más de max_rows filas
+    (ver _scan_violation).
+    """
+    violations = []
+    for url, whole_table_mode in urls:
+        whole_table = (whole_table_mode == WHOLE_TABLE_ALWAYS
+                       or (whole_table_mode == WHOLE_TABLE_WITHOUT_ROLLUPS and not rollups_enabled))
+        click.echo(url)
+        for statement, parameters in _capture_statements(client, url):
+            plan = explain(statement, parameters)
+            scans = []
+            for node in _plan_nodes(plan['Plan']):
+                if 'Relation Name' not in node:
+                    continue
+                rows = _scanned_rows(node)
+                target = node.get('Index Name', node['Relation Name'])
+                detail = f"{node['Node Type']} {target} ({rows:,} filas"
+                if 'Heap Fetches' in node:
+                    detail += f", heap fetches {node['Heap Fetches']:,}"
+                scans.append(detail + ')')
+                reason = _scan_violation(node, rows, max_rows, whole_table)
+                if reason:
+                    violations.append((url, f"{node['Node Type']} {target}", reason))
+            click.echo(f"  {plan['Execution Time']:>9.2f} ms  {'; '.join(scans) or 'sin tablas'}")
+    return violations
+
+def init_query_plan_check(app):
+    """Registra el comando 'flask explain-check'."""
+
+    @app.cli.command('explain-check')
+    @click.option('--max-scan-rows', '--max-seq-rows', 'max_rows', type=int, default=None,
+                  help="Filas a partir de las que un scan de 'sales' (o un Seq Scan de cualquier tabla) "
+                       'cuenta como regresión (por defecto EXPLAIN_MAX_SCAN_ROWS).')
+    def explain_check(max_rows):
+        """
+        Ejecuta EXPLAIN (ANALYZE, BUFFERS) de las consultas de cada ruta de analítica, con y sin
+        rollups, y termina con error si algún scan de 'sales' lee más de --max-scan-rows filas
+        (las rutas que agregan toda la tabla deben leerla con un Index Only Scan).
+        Necesita PostgreSQL con los datos ya cargados.
+        """
+        if max_rows is None:
+            max_rows = current_app.config['EXPLAIN_MAX_SCAN_ROWS']
+        if db.engine.dialect.name != 'postgresql':
+            raise click.ClickException('explain-check solo está disponible con PostgreSQL')
+        urls = _request_urls()
+        if urls is None:
+            raise click.ClickException("La tabla 'sales' está vacía; carga los datos antes de comprobar los planes")
+
+        # Sin caché de respuestas ni motor columnar: cada petición debe llegar a la base de datos
+        saved_config = {key: current_app.config[key] for key in ('ROLLUPS_ENABLED', 'ANALYTICS_ENGINE')}
+        saved_cache = current_app.extensions.get('response_cache')
+        current_app.extensions['response_cache'] = None
+        current_app.config['ANALYTICS_ENGINE'] = 'sql'
+        violations = []
+        try:
+            client = current_app.test_client()
+            for rollups_enabled in (True, False):
+                current_app.config['ROLLUPS_ENABLED'] = rollups_enabled
+                click.echo(f"\n🔎 Planes {'con' if rollups_enabled else 'sin'} rollups")
+                violations += check_plans(client, urls, max_rows, rollups_enabled)
+        finally:
+            current_app.config.update(saved_config)
+            current_app.extensions['response_cache'] = saved_cache
+
+        if violations:
+            click.echo(f"\n❌ Scans de más de {max_rows:,} filas:")
+            for url, scan, reason in violations:
+                click.echo(f"  {url}: {scan} ({reason})")
+            click.get_current_context().exit(1)
+        click.echo(f"\n✅ Ningún scan de 'sales' de más de {max_rows:,} filas")
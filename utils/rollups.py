@@ -0,0 +1,135 @@
+# utils/rollups.py
+# Reconstrucción de las tablas de agregados (rollups) a partir de la tabla de hechos, completa o
+# (en las cargas incrementales) solo de los meses, clientes y productos que cambiaron.
+from datetime import date
+from sqlalchemy import table, column, select, insert, delete, func, distinct, and_, or_, true
+from models import db
+from models.sales import Sales
+from models.rollups import SalesMonthlyRollup, CustomerRollup, ProductRollup
+from utils.date_buckets import month_start
+
+# Con más grupos afectados que esto (meses, clientes o productos), una carga incremental
+# recalcula los rollups completos
+INCREMENTAL_MAX_KEYS = 5000
+
+def _source_table(table_name):
+    """Tabla con las columnas de 'sales' pero con otro nombre (p. ej. 'sales_staging')."""
+    return table(table_name, *[column(c.name, c.type) for c in Sales.__table__.columns])
+
+def _in_or_null(column_expression, values):
+    """column IN values, incluyendo column IS NULL si None está entre los valores."""
+    values = set(values)
+    condition = column_expression.in_(sorted(value for value in values if value is not None))
+    if None in values:
+        condition = or_(condition, column_expression.is_(None))
+    return condition
+
+def _next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def _months_filter(order_date, months):
+    """Filas cuya fecha cae en alguno de los meses (por rangos, para usar el índice de order_date)."""
+    conditions = [and_(order_date >= month, order_date < _next_month(month)) for month in months if month]
+    if None in months:
+        conditions.append(order_date.is_(None))
+    return or_(*conditions)
+
+def _rebuild(source_table_name, changes=None):
+    """
+    Recalcula los rollups desde la tabla indicada: todos, o con changes (RollupChanges) solo
+    los grupos de los meses, clientes y productos afectados.
+    """
+    source = _source_table(source_table_name)
+    s = source.c
+    dialect_name = db.session.get_bind().dialect.name
+    order_month = month_start(s.order_date, dialect_name)
+    if changes is None:
+        monthly_rows, monthly_source = true(), true()
+        customer_rows, customer_source = true(), true()
+        product_rows, product_source = true(), true()
+    else:
+        monthly_rows = _in_or_null(SalesMonthlyRollup.order_month, changes.months)
+        monthly_source = _months_filter(s.order_date, changes.months)
+        customer_rows = _in_or_null(CustomerRollup.customer_id, changes.customer_ids)
+        customer_source = _in_or_null(s.customer_id, changes.customer_ids)
+        product_rows = _in_or_null(ProductRollup.product_id, changes.product_ids)
+        product_source = _in_or_null(s.product_id, changes.product_ids)
+
+    db.session.execute(delete(SalesMonthlyRollup.__table__).where(monthly_rows))
+    db.session.execute(insert(SalesMonthlyRollup.__table__).from_select(
+        ['category', 'sub_category', 'region', 'segment', 'order_month',
+         'total_sales', 'total_profit', 'total_quantity', 'row_count'],
+        select(
+            s.category, s.sub_category, s.region, s.segment, order_month,
+            func.sum(s.sales), func.sum(s.profit), func.sum(s.quantity), func.count()
+        ).where(monthly_source).group_by(s.category, s.sub_category, s.region, s.segment, order_month)
+    ))
+
+    db.session.execute(delete(CustomerRollup.__table__).where(customer_rows))
+    db.session.execute(insert(CustomerRollup.__table__).from_select(
+        ['customer_id', 'customer_name', 'total_spent', 'total_orders'],
+        select(
+            s.customer_id, s.customer_name, func.sum(s.sales), func.count(distinct(s.order_id))
+        ).where(customer_source).group_by(s.customer_id, s.customer_name)
+    ))
+
+    db.session.execute(delete(ProductRollup.__table__).where(product_rows))
+    db.session.execute(insert(ProductRollup.__table__).from_select(
+        ['product_id', 'product_name', 'total_sales', 'total_quantity_sold'],
+        select(
+            s.product_id, s.product_name, func.sum(s.sales), func.sum(s.quantity)
+        ).where(product_source).group_by(s.product_id, s.product_name)
+    ))
+
+def refresh_rollups(source_table_name=Sales.__tablename__):
+    """
+    Vacía y vuelve a calcular todos los rollups desde la tabla indicada, dentro de la
+    transacción actual de db.session (quien llama hace el commit). Así los rollups se
+    publican junto con los datos de los que salen y los lectores nunca ven una mezcla.
+    """
+    _rebuild(source_table_name)
+    print("📐 Tablas de agregados (rollups) recalculadas.")
+
+class RollupChanges:
+    """
+    Meses, clientes y productos que toca una carga incremental, con los valores de antes (filas
+    actualizadas o borradas) y de después (filas nuevas o actualizadas) de cada cambio.
+    refresh() recalcula solo esos grupos, en la transacción actual, en lugar de los rollups completos.
+    """
+    def __init__(self, max_keys=INCREMENTAL_MAX_KEYS):
+        self.max_keys = max_keys
+        self.months = set()
+        self.customer_ids = set()
+        self.product_ids = set()
+
+    @property
+    def overflowed(self):
+        """Demasiados grupos afectados: sale más a cuenta recalcular los rollups completos."""
+        return max(len(self.months), len(self.customer_ids), len(self.product_ids)) > self.max_keys
+
+    def add(self, order_dates, customer_ids, product_ids):
+        """Añade los grupos de unas filas (las fechas vacías, None o NaT, no tienen mes)."""
+        if self.overflowed:
+            return
+        for value in order_dates:
+            self.months.add(None if value is None or value != value else date(value.year, value.month, 1))
+        self.customer_ids.update(customer_ids)
+        self.product_ids.update(product_ids)
+
+    def add_stored(self, row_ids, batch_size=1000):
+        """Añade los grupos de las filas guardadas con esos row_id (antes de actualizarlas o borrarlas)."""
+        for start in range(0, len(row_ids), batch_size):
+            if self.overflowed:
+                return
+            rows = db.session.execute(
+                select(Sales.order_date, Sales.customer_id, Sales.product_id)
+                .where(Sales.row_id.in_(row_ids[start:start + batch_size]))
+            ).all()
+            self.add([row.order_date for row in rows], [row.customer_id for row in rows],
+                     [row.product_id for row in rows])
+
+    def refresh(self, source_table_name=Sales.__tablename__):
+        """Recalcula los rollups de los grupos afectados."""
+        _rebuild(source_table_name, self)
+        print(f"📐 Rollups actualizados: {len(self.months)} meses, {len(self.customer_ids)} clientes, "
+              f"{len(self.product_ids)} productos.")
@@ -0,0 +1,86 @@
+# utils/serialization.py
+# Serialización masiva de ventas: selecciona solo las columnas necesarias como tuplas
+# (sin objetos ORM), las formatea columna por columna y las codifica en JSON de una vez.
+import json
+from sqlalchemy import select
+from models.sales import Sales
+
+try:
+    import orjson # Codificador JSON rápido (opcional)
+except ImportError:
+    orjson = None
+
+# Columnas exportadas: (clave en la respuesta, columna, tipo de formato).
+# Mismas claves y formato que Sales.to_dict().
+SALES_COLUMNS = (
+    ('No', Sales.no, 'raw'),
+    ('RowID', Sales.row_id, 'raw'),
+    ('OrderID', Sales.order_id, 'raw'),
+    ('OrderDate', Sales.order_date, 'date'),
+    ('ShipDate', Sales.ship_date, 'date'),
+    ('ShipMode', Sales.ship_mode, 'raw'),
+    ('CustomerID', Sales.customer_id, 'raw'),
+    ('CustomerName', Sales.customer_name, 'raw'),
+    ('Segment', Sales.segment, 'raw'),
+    ('Country', Sales.country, 'raw'),
+    ('City', Sales.city, 'raw'),
+    ('State', Sales.state, 'raw'),
+    ('PostalCode', Sales.postal_code, 'raw'),
+    ('Region', Sales.region, 'raw'),
+    ('ProductID', Sales.product_id, 'raw'),
+    ('Category', Sales.category, 'raw'),
+    ('SubCategory', Sales.sub_category, 'raw'),
+    ('ProductName', Sales.product_name, 'raw'),
+    ('Sales', Sales.sales, 'number'),
+    ('Quantity', Sales.quantity, 'raw'),
+    ('Discount', Sales.discount, 'number'),
+    ('Profit', Sales.profit, 'number'),
+)
+
+SALES_KEYS = [key for key, _, _ in SALES_COLUMNS]
+RESPONSE_SHAPES = ('records', 'columnar')
+
+OUTPUT_DATE_FORMAT = '%m/%d/%Y'
+
+def dumps(value):
+    """Codifica a JSON (bytes) con orjson si está instalado, o con la librería estándar."""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+def sales_select():
+    """SELECT de las columnas exportadas de 'sales', ordenado por row_id."""
+    return select(*[column for _, column, _ in SALES_COLUMNS]).order_by(Sales.row_id)
+
+def _format_column(values, kind):
+    """Formatea todos los valores de una columna de una vez."""
+    if kind == 'date':
+        return [value.strftime(OUTPUT_DATE_FORMAT) if value else None for value in values]
+    if kind == 'number':
+        return [float(value) if value else 0 for value in values]
+    return list(values)
+
+def format_rows(rows):
+    """
+    Convierte un bloque de tuplas de la base de datos en listas de valores serializables.
+    Se transpone el bloque para formatear por columna y se vuelve a transponer a filas.
+    """
+    if not rows:
+        return []
+    columns = zip(*rows)
+    formatted = [_format_column(values, kind) for values, (_, _, kind) in zip(columns, SALES_COLUMNS)]
+    return [list(row) for row in zip(*formatted)]
+
+def rows_to_records(rows):
+    """Convierte filas ya formateadas en diccionarios {clave: valor} como Sales.to_dict()."""
+    return [dict(zip(SALES_KEYS, row)) for row in rows]
+
+def encode_chunk(rows, shape):
+    """
+    Codifica un bloque de filas formateadas como elementos de un array JSON separados por comas
+    (sin los corchetes), listo para concatenarse en una respuesta en streaming.
+    """
+    if not rows:
+        return b''
+    items = rows if shape == 'columnar' else rows_to_records(rows)
+    return dumps(items)[1:-1]
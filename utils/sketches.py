@@ -0,0 +1,334 @@
+# utils/sketches.py
+# Resúmenes aproximados de 'sales' para el modo approx=true de las rutas de analítica:
+# HyperLogLog para contar órdenes y clientes distintos y Space-Saving (heavy hitters) para el
+# top de clientes y productos por ventas. DataLoader los recalcula al publicar cada carga y se
+# guardan en 'dataset_sketches', de modo que todos los workers leen los mismos.
+import json
+import math
+import threading
+import time
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import table, column, select, delete, insert
+from models import db
+from models.sales import Sales
+from models.dataset_sketch import DatasetSketch
+from utils.dataset_version import current_dataset_version, is_pending_dataset_state
+
+# Separador entre id y nombre en las claves de clientes y productos (se agrupan por la pareja,
+# igual que las consultas SQL). Un nombre nulo se guarda como cadena vacía.
+KEY_SEPARATOR = '\x1f'
+# Intervalo de confianza del 95 % de las estimaciones de HyperLogLog (en errores estándar)
+CONFIDENCE_Z = 1.96
+
+SKETCH_COLUMNS = ('order_id', 'customer_id', 'customer_name', 'product_id', 'product_name',
+                  'sales', 'profit', 'quantity')
+AMOUNT_COLUMNS = ('sales', 'profit')
+
+# Sketches leídos por este proceso y versión de los datos a la que corresponden
+_state = {'version': None, 'sketches': None}
+_lock = threading.Lock()
+
+class HyperLogLog:
+    """
+    Estimador de cardinalidad con 2^precision registros de un byte (16 KB con precision=14).
+    Error estándar relativo ≈ 1.04 / sqrt(2^precision): 0.81 % con precision=14.
+    """
+    def __init__(self, precision=14, registers=None):
+        # Los 64 - precision bits que quedan del hash se pasan a float64 sin pérdida (<= 53 bits)
+        if not 11 <= precision <= 18:
+            raise ValueError('La precisión de HyperLogLog debe estar entre 11 y 18')
+        self.precision = precision
+        self.registers = registers if registers is not None else np.zeros(1 << precision, dtype='uint8')
+
+    def add(self, values):
+        """Añade los valores no nulos de una Series."""
+        values = values.dropna()
+        if values.empty:
+            return
+        hashes = pd.util.hash_array(values.to_numpy(dtype=object))
+        rest_bits = 64 - self.precision
+        index = (hashes >> np.uint64(rest_bits)).astype('int64')
+        rest = hashes & np.uint64((1 << rest_bits) - 1)
+        # Posición del primer bit a 1 de los bits restantes: frexp da su número de bits (0 si son todos 0)
+        _, bit_length = np.frexp(rest.astype('float64'))
+        np.maximum.at(self.registers, index, (rest_bits - bit_length + 1).astype('uint8'))
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype('int64'))))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros) # Corrección para cardinalidades pequeñas (linear counting)
+        return raw
+
+    def to_bytes(self):
+        return bytes([self.precision]) + self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, payload):
+        return cls(payload[0], np.frombuffer(payload[1:], dtype='uint8').copy())
+
+class SpaceSaving:
+    """
+    Top aproximado por suma de pesos (heavy hitters) con capacity contadores. Cada bloque se agrega
+    de forma exacta y se combina con el resumen (resúmenes combinables de Space-Saving): una clave
+    nueva parte del contador mínimo, y solo se conservan los capacity contadores mayores.
+    Para cada clave guardada: count - error <= total real <= count; una clave que no está en el
+    resumen suma como mucho floor. Los pesos deben ser no negativos.
+    """
+    def __init__(self, capacity, counts=None, errors=None):
+        self.capacity = capacity
+        self.counts = counts if counts is not None else pd.Series(dtype='int64')
+        self.errors = errors if errors is not None else pd.Series(dtype='int64')
+
+    @property
+    def floor(self):
+        """Máximo que puede sumar una clave que no está en el resumen."""
+        return int(self.counts.min()) if len(self.counts) >= self.capacity else 0
+
+    def add(self, keys, weights):
+        """Añade un bloque de claves (array de str) con sus pesos enteros."""
+        chunk = pd.Series(weights, index=keys).groupby(level=0, sort=False).sum()
+        floor = self.floor
+        index = self.counts.index.union(chunk.index)
+        counts = self.counts.reindex(index, fill_value=floor) + chunk.reindex(index, fill_value=0)
+        errors = self.errors.reindex(index, fill_value=floor)
+        keep = counts.nlargest(self.capacity, keep='first').index
+        self.counts, self.errors = counts[keep], errors[keep]
+
+    def top(self, limit):
+        """
+        Las limit claves de mayor estimación: [(clave, estimación, error, garantizada)].
+        Una clave está garantizada en el top real si su mínimo (count - error) no es menor que el
+        máximo posible de cualquier clave fuera de la lista.
+        """
+        ranked = self.counts.nlargest(limit + 1, keep='first')
+        outside = max(int(ranked.iloc[limit]) if len(ranked) > limit else 0, self.floor)
+        return [
+            (key, int(count), int(self.errors[key]), int(count) - int(self.errors[key]) >= outside)
+            for key, count in ranked.iloc[:limit].items()
+        ], outside
+
+    def to_bytes(self):
+        return json.dumps({
+            'capacity': self.capacity,
+            'keys': self.counts.index.tolist(),
+            'counts': self.counts.tolist(),
+            'errors': self.errors.tolist(),
+        }).encode('utf-8')
+
+    @classmethod
+    def from_bytes(cls, payload):
+        data = json.loads(payload)
+        index = pd.Index(data['keys'], dtype=object)
+        return cls(data['capacity'],
+                   pd.Series(data['counts'], index=index, dtype='int64'),
+                   pd.Series(data['errors'], index=index, dtype='int64'))
+
+def _amount_scale(column_name):
+    return Sales.__table__.c[column_name].type.scale
+
+def _to_units(values, scale):
+    """Importes (Decimal o float, None como 0) a enteros en unidades de 10^-scale."""
+    numbers = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').fillna(0).to_numpy(dtype='float64')
+    return np.rint(numbers * 10 ** scale).astype('int64')
+
+def _pair_keys(frame, id_column, name_column):
+    return (frame[id_column].fillna('').astype(str) + KEY_SEPARATOR
+            + frame[name_column].fillna('').astype(str)).to_numpy(dtype=object)
+
+def _empty_sketches(precision, capacity):
+    return {
+        'unique_orders': HyperLogLog(precision),
+        'unique_customers': HyperLogLog(precision),
+        'top_customers': SpaceSaving(capacity),
+        'top_products': SpaceSaving(capacity),
+        'totals': {'rows': 0, 'quantity': 0, **{name: 0 for name in AMOUNT_COLUMNS},
+                   'scales': {name: _amount_scale(name) for name in AMOUNT_COLUMNS}},
+    }
+
+def _add_rows(sketches, frame):
+    """
+    Añade un bloque de filas (DataFrame con SKETCH_COLUMNS) a los sketches y a sus totales.
+    El top por ventas cuenta como 0 las líneas con ventas negativas (p. ej. devoluciones).
+    """
+    sketches['unique_orders'].add(frame['order_id'])
+    sketches['unique_customers'].add(frame['customer_id'])
+    units = {name: _to_units(frame[name], _amount_scale(name)) for name in AMOUNT_COLUMNS}
+    ranking_weights = np.maximum(units['sales'], 0)
+    sketches['top_customers'].add(_pair_keys(frame, 'customer_id', 'customer_name'), ranking_weights)
+    sketches['top_products'].add(_pair_keys(frame, 'product_id', 'product_name'), ranking_weights)
+    totals = sketches['totals']
+    totals['rows'] += len(frame)
+    totals['quantity'] += int(pd.to_numeric(frame['quantity']).fillna(0).sum())
+    for name in AMOUNT_COLUMNS:
+        totals[name] += int(units[name].sum())
+
+def _payloads(sketches):
+    return {
+        'unique_orders': sketches['unique_orders'].to_bytes(),
+        'unique_customers': sketches['unique_customers'].to_bytes(),
+        'top_customers': sketches['top_customers'].to_bytes(),
+        'top_products': sketches['top_products'].to_bytes(),
+        'totals': json.dumps(sketches['totals']).encode('utf-8'),
+    }
+
+def build_sketches(source_table_name, precision, capacity, batch_size=100000):
+    """
+    Recorre la tabla indicada por bloques (cursor del servidor) y devuelve {nombre: payload}.
+    Los totales de importes y cantidades son exactos; solo los distintos y los tops son aproximados.
+    """
+    source = table(source_table_name, *[column(name) for name in SKETCH_COLUMNS])
+    sketches = _empty_sketches(precision, capacity)
+    result = db.session.execute(select(*source.c).execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        _add_rows(sketches, pd.DataFrame.from_records(partition, columns=SKETCH_COLUMNS))
+    return _payloads(sketches)
+
+def _store_sketches(payloads, version):
+    """Sustituye los sketches guardados por los de la versión dada (en la transacción actual)."""
+    db.session.execute(delete(DatasetSketch.__table__))
+    db.session.execute(insert(DatasetSketch.__table__), [
+        {'name': name, 'version': version, 'payload': payload} for name, payload in payloads.items()
+    ])
+
+def refresh_sketches(source_table_name, version):
+    """
+    Recalcula los sketches desde la tabla indicada y los guarda para la versión dada, dentro de
+    la transacción actual de db.session (quien llama hace el commit), igual que los rollups.
+    """
+    config = current_app.config
+    started = time.perf_counter()
+    payloads = build_sketches(source_table_name, config['SKETCH_HLL_PRECISION'],
+                              config['SKETCH_TOP_CAPACITY'])
+    _store_sketches(payloads, version)
+    print(f"🧮 Sketches aproximados recalculados en {time.perf_counter() - started:.2f}s")
+
+class SketchDelta:
+    """
+    Sketches de una carga incremental. HyperLogLog y Space-Saving son combinables, así que si la
+    carga solo inserta filas basta con añadirlas a los sketches de la versión anterior (sin
+    recorrer 'sales'). Una fila actualizada o borrada no se puede restar: entonces discard() y los
+    sketches quedan obsoletos, y approx=true responde en modo exacto hasta la próxima carga completa.
+    """
+    def __init__(self, previous_version):
+        self.sketches = _load_sketches(previous_version) if previous_version else None
+
+    @property
+    def mergeable(self):
+        return self.sketches is not None
+
+    def add(self, frame):
+        """Añade las filas nuevas de un bloque (DataFrame con al menos SKETCH_COLUMNS)."""
+        if self.sketches is not None and len(frame):
+            _add_rows(self.sketches, frame)
+
+    def discard(self):
+        self.sketches = None
+
+    def save(self, version):
+        """Guarda los sketches combinados para la nueva versión, o avisa de que quedan obsoletos."""
+        if self.sketches is None:
+            print("⚠️ Sketches aproximados sin actualizar (la carga modificó o borró filas): "
+                  "approx=true responderá en modo exacto hasta la próxima carga completa.")
+            return
+        _store_sketches(_payloads(self.sketches), version)
+        print(f"🧮 Sketches aproximados combinados con {self.sketches['totals']['rows']:,} filas en total")
+
+def _load_sketches(version):
+    """Lee y deserializa los sketches de la versión indicada, o None si no existen."""
+    rows = db.session.execute(
+        select(DatasetSketch.name, DatasetSketch.payload).where(DatasetSketch.version == version)
+    ).all()
+    payloads = {name: bytes(payload) for name, payload in rows}
+    if set(payloads) != {'unique_orders', 'unique_customers', 'top_customers', 'top_products', 'totals'}:
+        return None
+    return {
+        'unique_orders': HyperLogLog.from_bytes(payloads['unique_orders']),
+        'unique_customers': HyperLogLog.from_bytes(payloads['unique_customers']),
+        'top_customers': SpaceSaving.from_bytes(payloads['top_customers']),
+        'top_products': SpaceSaving.from_bytes(payloads['top_products']),
+        'totals': json.loads(payloads['totals']),
+    }
+
+def get_sketches():
+    """
+    Sketches de la versión actual de los datos, o None si están desactivados o no existen
+    (p. ej. datos cargados antes de que existieran); entonces la ruta responde en modo exacto.
+    """
+    if not current_app.config['SKETCHES_ENABLED']:
+        return None
+    version = current_dataset_version()
+    if not version:
+        return None
+    if is_pending_dataset_state():
+        # Sketches de una versión sin publicar: no se memorizan por si la carga no llega al commit
+        return _load_sketches(version)
+    with _lock:
+        if _state['version'] == version:
+            return _state['sketches']
+    sketches = _load_sketches(version)
+    with _lock:
+        _state['version'], _state['sketches'] = version, sketches
+    return sketches
+
+def _distinct_estimate(sketch):
+    """Estimación redondeada y su intervalo de confianza del 95 %."""
+    estimate = sketch.estimate()
+    margin = estimate * sketch.relative_error * CONFIDENCE_Z
+    return round(estimate), {
+        'relative_standard_error': round(sketch.relative_error, 6),
+        'low': max(0, math.floor(estimate - margin)),
+        'high': math.ceil(estimate + margin),
+    }
+
+def approx_summary(sketches):
+    """Cuerpo de /api/analytics/summary con approx=true: totales exactos y distintos estimados."""
+    totals = sketches['totals']
+    unique_orders, orders_bounds = _distinct_estimate(sketches['unique_orders'])
+    unique_customers, customers_bounds = _distinct_estimate(sketches['unique_customers'])
+    return {
+        'summary': {
+            'total_sales': totals['sales'] / 10 ** totals['scales']['sales'],
+            'total_profit': totals['profit'] / 10 ** totals['scales']['profit'],
+            'total_quantity_sold': totals['quantity'],
+            'total_unique_orders': unique_orders,
+            'total_unique_customers': unique_customers,
+        },
+        'error_bounds': {
+            'total_unique_orders': orders_bounds,
+            'total_unique_customers': customers_bounds,
+        },
+    }
+
+def approx_top(sketches, name, limit, id_key, name_key, total_key):
+    """
+    Top de clientes o productos (name = 'top_customers' o 'top_products') desde su sketch.
+    Cada fila trae la estimación (cota superior), el error máximo (el total real está entre
+    estimación - error y estimación) y si su presencia en el top real está garantizada.
+    """
+    sketch = sketches[name]
+    scale = 10 ** sketches['totals']['scales']['sales']
+    rows, outside = sketch.top(min(limit, sketch.capacity))
+    results = []
+    for key, count, error, guaranteed in rows:
+        item_id, _, item_name = key.partition(KEY_SEPARATOR)
+        results.append({
+            id_key: item_id or None,
+            name_key: item_name or None,
+            total_key: count / scale,
+            f'{total_key}_error': error / scale,
+            'guaranteed': guaranteed,
+        })
+    return results, {
+        'capacity': sketch.capacity,
+        # Ninguna clave fuera de la lista puede sumar más que esto
+        'max_unlisted_total': outside / scale,
+    }
@@ -1,4 +1,7 @@
 # wsgi.py
-from app import create_app
+# Punto de entrada WSGI: gunicorn wsgi:app (o app:app, que devuelve esta misma instancia).
+# Con 'gunicorn --preload' se crea una sola vez en el proceso master y los workers la heredan;
+# utils/db_pool.py descarta tras el fork las conexiones que el master hubiera abierto.
+from app import create_served_app
 
-app = create_app()
\ No newline at end of file
+app = create_served_app()